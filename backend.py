@@ -1,20 +1,25 @@
-from flask import Flask, request, send_file, jsonify, session, send_from_directory
+from flask import Flask, Response, request, send_file, jsonify, session, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
+import io
 import os
-import tempfile
+import shutil
 import uuid
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import mimetypes
+import click
 from datetime import datetime
-from utils.image_utils import convert_image, images_to_pdf as imgs_to_pdf
-from utils.pdf_utils import pdf_to_images, merge_pdfs
+from psycopg2.extras import execute_values, Json
+from utils.image_utils import convert_image, convert_images
+from utils.pdf_utils import pdf_to_images, merge_pdfs, images_to_pdf
+from utils.pdf_compress import compress_pdf, PDF_PROFILES, DEFAULT_PDF_PROFILE
 from utils.office_utils import convert_office_document
-from utils.av_utils import convert_audio, convert_video, video_to_gif
-from utils.ocr_utils import image_to_text, pdf_to_text
+from utils.av_utils import convert_audio, convert_video, video_to_gif, VIDEO_PRESETS, DEFAULT_PRESET as DEFAULT_AV_PRESET
+from utils.ffmpeg_runner import Cancelled, cancel as cancel_ffmpeg
+from utils.ocr_utils import image_to_text, ocr_pages, OCR_MODES
 from utils.barcode_utils import make_qr, decode_codes
-from utils.archive_utils import zip_folder, unzip, extract_archive, create_archive
+from utils.archive_utils import unzip, extract_archive, create_archive
 from utils.image_manipulation import invert_image, text_to_image
 from utils.ebook_utils import convert_ebook
 from utils.presentation_utils import convert_presentation
@@ -22,62 +27,92 @@ from utils.spreadsheet_utils import convert_spreadsheet
 from utils.vector_utils import convert_vector
 from utils.font_utils import convert_font
 from utils.cad_utils import convert_cad
+from utils.lo_pool import get_pool as get_lo_pool
+from utils.db_pool import db_connection, pool_stats as db_pool_stats
+from utils.passwords import get_hasher, get_throttle, hasher_stats, HasherBusy
+from utils.youtube_utils import download_youtube
+from utils.jobs import submit as submit_job, get_job, job_status, cancel as cancel_job, new_job_id, job_dir, JobExists
+from utils.progress_store import get_store as get_progress_store, update_progress, cleanup_progress
+from utils.sse import progress_stream, connections as sse_connections, SSE_FINAL_ID
+from utils.result_cache import cached_result, get_cache as get_result_cache
+from utils.workspace import janitor as workspace_janitor
+from utils.zip_stream import stream_zip, walk_entries
+from utils.pagination import encode_cursor, decode_cursor, parse_limit, parse_fields
+from utils.citation_export import EXPORT_FORMATS as CITATION_EXPORT_FORMATS
+from utils.url_metadata import get_fetcher as get_url_metadata_fetcher, fetcher_stats as url_metadata_stats
+from utils.blob_store import get_blob_store, collect_garbage, decode_data_url, BlobNotFound
+from utils.uploads import IngestRequest, DEFAULT_UPLOAD_LIMIT, upload_limit, ingested, upload_sha256, upload_kind
+import requests
 import yt_dlp  # Import yt_dlp
 
 app = Flask(__name__, static_folder='dist', static_url_path='')
+# Multipart file parts are streamed straight to their final path (see utils/uploads.py)
+app.request_class = IngestRequest
+app.config['MAX_CONTENT_LENGTH'] = DEFAULT_UPLOAD_LIMIT
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+# Reverse proxies in front of the app. Without this, behind a proxy every
+# request comes from the proxy's address and shares one sign-in throttle
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', '0'))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES,
+                            x_host=TRUSTED_PROXIES)
 
 if os.environ.get('ENABLE_CORS', 'false').lower() == 'true':
-    CORS(app, supports_credentials=True)
-
-TMP = tempfile.gettempdir()
+    CORS(app, supports_credentials=True, expose_headers=['X-Original-Size', 'X-Compressed-Size', 'X-Size-Target-Met'])
 
 def get_db():
-    return psycopg2.connect(os.environ.get('DATABASE_URL'), cursor_factory=RealDictCursor)
+    """Borrow a pooled connection for a with block"""
+    return db_connection()
 
 def init_db():
-    conn = get_db()
-    cur = conn.cursor()
-
-    # Users table
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            email VARCHAR(255) UNIQUE NOT NULL,
-            password_hash VARCHAR(255) NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Download history table
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS download_history (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-            original_filename VARCHAR(255) NOT NULL,
-            output_filename VARCHAR(255) NOT NULL,
-            conversion_type VARCHAR(50) NOT NULL,
-            file_url TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Citations table
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS citations (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-            source_type VARCHAR(50) NOT NULL,
-            citation_style VARCHAR(50) NOT NULL,
-            metadata JSONB NOT NULL,
-            formatted_citation TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    with get_db() as conn, conn.cursor() as cur:
+        # Users table
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id SERIAL PRIMARY KEY,
+                email VARCHAR(255) UNIQUE NOT NULL,
+                password_hash VARCHAR(255) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Download history table
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS download_history (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+                original_filename VARCHAR(255) NOT NULL,
+                output_filename VARCHAR(255) NOT NULL,
+                conversion_type VARCHAR(50) NOT NULL,
+                file_url TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Citations table
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS citations (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+                source_type VARCHAR(50) NOT NULL,
+                citation_style VARCHAR(50) NOT NULL,
+                metadata JSONB NOT NULL,
+                formatted_citation TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Output files live in the blob store; file_url only holds legacy inline data
+        cur.execute('ALTER TABLE download_history ADD COLUMN IF NOT EXISTS blob_key VARCHAR(64)')
+        cur.execute('ALTER TABLE download_history ADD COLUMN IF NOT EXISTS size BIGINT')
+        cur.execute('ALTER TABLE download_history ADD COLUMN IF NOT EXISTS mime_type VARCHAR(255)')
+        cur.execute('CREATE INDEX IF NOT EXISTS download_history_blob_key ON download_history (blob_key)')
+
+        # Listing indexes for keyset pagination, newest first
+        cur.execute('CREATE INDEX IF NOT EXISTS download_history_user_created ON download_history (user_id, created_at DESC, id DESC)')
+        cur.execute('CREATE INDEX IF NOT EXISTS citations_user_created ON citations (user_id, created_at DESC, id DESC)')
 
-    conn.commit()
-    cur.close()
-    conn.close()
+        conn.commit()
 
 # Initialize database on startup
 try:
@@ -88,28 +123,133 @@ except Exception as e:
 def get_unique_filepath(original_filename):
     safe_name = secure_filename(original_filename)
     unique_name = f"{uuid.uuid4()}_{safe_name}"
-    return os.path.join(TMP, unique_name)
-
-def save_download_history(user_id, original_filename, output_filename, conversion_type, file_data=None):
+    return request.workspace.file(unique_name)
+
+@app.before_request
+def ingest_uploads():
+    """Apply the tool's upload limit and parse multipart bodies before the view runs"""
+    if request.mimetype != 'multipart/form-data':
+        return None
+    limit = upload_limit(request.path)
+    request.max_content_length = limit
+    try:
+        request.files
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'Upload exceeds the {limit} byte limit for this tool'}), 413
+    return None
+
+@app.after_request
+def close_workspace(response):
+    """Delete the request's files once the response no longer needs them"""
+    if not request.has_workspace:
+        return response
+    if response.direct_passthrough:
+        # send_file has already opened its file, and passthrough responses never
+        # run call_on_close; the open handle keeps the data readable
+        request.workspace.cleanup()
+    else:
+        response.call_on_close(request.workspace.cleanup)
+    return response
+
+@app.teardown_request
+def drop_workspace(exc):
+    if exc is not None and request.has_workspace:
+        request.workspace.cleanup()
+
+def save_upload(file, dest=None):
+    """Path of an uploaded file on disk; streamed uploads are already written, so
+    they are at most renamed into place"""
+    stream = ingested(file)
+    if stream is None:
+        dest = dest or get_unique_filepath(file.filename)
+        file.save(dest)
+        return dest
+    stream.flush()
+    if dest:
+        os.replace(stream.path, dest)
+        stream.path = dest
+    return stream.path
+
+def zip_response(entries, download_name):
+    """Stream a ZIP of (path or bytes, arcname) entries while it is being built"""
+    return Response(
+        stream_zip(entries),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+    )
+
+def expect_kind(file, *kinds):
+    """True unless the upload's magic bytes identify a different format"""
+    kind = upload_kind(file)
+    return kind is None or kind in kinds
+
+def wants_async():
+    value = request.values.get('async')
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('async')
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def queue_job(tool, kwargs, download_name=None, task_id=None):
+    """Hand a conversion to the job workers and return 202 with the job id.
+    task_id only names the progress stream; the job id is always our own."""
+    priority = request.values.get('priority', type=int)
+    if priority is not None:
+        priority = max(-10, min(10, priority))
+    job_id = new_job_id()
+    if request.has_workspace:
+        # The job outlives the request: its files move into the job's own directory
+        kwargs = request.workspace.transfer(job_dir(job_id, create=False), kwargs)
+    try:
+        submit_job(tool, kwargs, priority=priority, job_id=job_id, download_name=download_name,
+                   task_id=task_id, owner=job_owner())
+    except JobExists as e:
+        shutil.rmtree(job_dir(job_id, create=False), ignore_errors=True)
+        return jsonify({'error': str(e)}), 409
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}',
+        'result_url': f'/api/jobs/{job_id}/result'
+    }), 202
+
+def job_owner():
+    """Signed-in user a job belongs to; anonymous jobs are reachable by id alone."""
+    user_id = session.get('user_id')
+    return str(user_id) if user_id is not None else None
+
+def owned_job(job_id):
+    """The job if the caller may see it. Someone else's job looks missing."""
+    job = get_job(job_id)
+    if job and job['owner'] is not None and job['owner'] != job_owner():
+        return None
+    return job
+
+def task_progress(task_id):
+    """Progress callback publishing to task_id, or None when the client sent none."""
+    if not task_id:
+        return None
+    return lambda progress, status, message: update_progress(task_id, progress, status, message)
+
+def end_task(task_id, status, message):
+    if task_id:
+        update_progress(task_id, 100 if status == 'complete' else 0, status, message)
+        cleanup_progress(task_id)
+
+def save_download_history(user_id, original_filename, output_filename, conversion_type, file_path=None, mime_type=None):
     if not user_id:
         return
     try:
-        import base64
-        conn = get_db()
-        cur = conn.cursor()
-
-        file_url = None
-        if file_data:
-            # Store as base64 data URL
-            file_url = f"data:application/octet-stream;base64,{base64.b64encode(file_data).decode()}"
-
-        cur.execute(
-            'INSERT INTO download_history (user_id, original_filename, output_filename, conversion_type, file_url) VALUES (%s, %s, %s, %s, %s)',
-            (user_id, original_filename, output_filename, conversion_type, file_url)
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        blob_key = size = None
+        if file_path:
+            blob_key, size = get_blob_store().put_file(file_path)
+            mime_type = mimetypes.guess_type(output_filename)[0] or mime_type or 'application/octet-stream'
+
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(
+                'INSERT INTO download_history (user_id, original_filename, output_filename, conversion_type, blob_key, size, mime_type) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                (user_id, original_filename, output_filename, conversion_type, blob_key, size, mime_type)
+            )
+            conn.commit()
     except Exception as e:
         print(f"Error saving download history: {e}")
 
@@ -126,31 +266,32 @@ def signup():
         if len(password) < 6:
             return jsonify({'error': 'Password must be at least 6 characters'}), 400
 
-        conn = get_db()
-        cur = conn.cursor()
+        # Hash before borrowing a connection; it is deliberately slow
+        password_hash = get_hasher().hash(password)
 
-        # Check if user exists
-        cur.execute('SELECT id FROM users WHERE email = %s', (email,))
-        if cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'error': 'Email already registered'}), 400
+        with get_db() as conn, conn.cursor() as cur:
+            # Check if user exists
+            cur.execute('SELECT id FROM users WHERE email = %s', (email,))
+            if cur.fetchone():
+                return jsonify({'error': 'Email already registered'}), 400
 
-        # Create user
-        password_hash = generate_password_hash(password)
-        cur.execute(
-            'INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id',
-            (email, password_hash)
-        )
-        user_id = cur.fetchone()['id']
-        conn.commit()
-        cur.close()
-        conn.close()
+            # Create user
+            cur.execute(
+                'INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id',
+                (email, password_hash)
+            )
+            user_id = cur.fetchone()['id']
+            conn.commit()
 
         session['user_id'] = user_id
         session['email'] = email
 
         return jsonify({'success': True, 'email': email})
+    except HasherBusy as e:
+        response = jsonify({'error': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = '2'
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -164,20 +305,43 @@ def login():
         if not email or not password:
             return jsonify({'error': 'Email and password required'}), 400
 
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute('SELECT id, password_hash FROM users WHERE email = %s', (email,))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-
-        if not user or not check_password_hash(user['password_hash'], password):
+        # Refuse throttled clients before doing any hashing
+        throttle = get_throttle()
+        retry_after = throttle.retry_after(email, request.remote_addr)
+        if retry_after:
+            response = jsonify({'error': 'Too many failed sign-in attempts, try again later'})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute('SELECT id, password_hash FROM users WHERE email = %s', (email,))
+            user = cur.fetchone()
+
+        ok, new_hash = get_hasher().verify(user['password_hash'] if user else None, password)
+        if not ok:
+            throttle.record_failure(email, request.remote_addr)
             return jsonify({'error': 'Invalid email or password'}), 401
+        throttle.record_success(email)
+
+        if new_hash:
+            # Stored with old hashing parameters; upgrade while we have the password
+            with get_db() as conn, conn.cursor() as cur:
+                cur.execute(
+                    'UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s',
+                    (new_hash, user['id'], user['password_hash'])
+                )
+                conn.commit()
 
         session['user_id'] = user['id']
         session['email'] = email
 
         return jsonify({'success': True, 'email': email})
+    except HasherBusy as e:
+        response = jsonify({'error': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = '2'
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -192,23 +356,116 @@ def get_current_user():
         return jsonify({'email': session.get('email')})
     return jsonify({'email': None})
 
+# Listable fields and the columns each needs; id and created_at always come back
+HISTORY_FIELDS = {
+    'original_filename': ['original_filename'],
+    'output_filename': ['output_filename'],
+    'conversion_type': ['conversion_type'],
+    'file_url': ['blob_key', 'file_url IS NOT NULL AS inline'],
+    'size': ['size'],
+    'mime_type': ['mime_type'],
+}
+
+CITATION_FIELDS = {
+    'source_type': ['source_type'],
+    'citation_style': ['citation_style'],
+    'metadata': ['metadata'],
+    'formatted_citation': ['formatted_citation'],
+}
+
+def fetch_page(table, field_columns, default_limit):
+    """Newest-first page of the session user's rows, keyset-paginated on
+    (created_at, id) and limited to the fields named in ?fields="""
+    fields = parse_fields(request.args.get('fields'), list(field_columns))
+    limit = parse_limit(request.args.get('limit'), default_limit)
+    columns = ['id', 'created_at'] + [c for f in fields for c in field_columns[f]]
+
+    where = 'user_id = %s'
+    params = [session['user_id']]
+    cursor = request.args.get('cursor')
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        where += ' AND (created_at, id) < (%s, %s)'
+        params += [created_at, row_id]
+
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute(
+            f'SELECT {", ".join(columns)} FROM {table} WHERE {where} ORDER BY created_at DESC, id DESC LIMIT %s',
+            (*params, limit + 1)
+        )
+        rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    return rows, next_cursor
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
 
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute(
-            'SELECT id, original_filename, output_filename, conversion_type, file_url, created_at FROM download_history WHERE user_id = %s ORDER BY created_at DESC LIMIT 50',
-            (session['user_id'],)
-        )
-        history = cur.fetchall()
-        cur.close()
-        conn.close()
+        history, next_cursor = fetch_page('download_history', HISTORY_FIELDS, 50)
 
-        return jsonify({'history': history})
+        for item in history:
+            if 'blob_key' in item:
+                blob_key = item.pop('blob_key')
+                inline = item.pop('inline')
+                item['file_url'] = f"/api/history/{item['id']}/file" if blob_key or inline else None
+
+        return jsonify({'history': history, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/history/<int:history_id>/file', methods=['GET'])
+def get_history_file(history_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    try:
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(
+                'SELECT blob_key, mime_type, output_filename, created_at, '
+                'CASE WHEN blob_key IS NULL THEN file_url END AS file_url '
+                'FROM download_history WHERE id = %s AND user_id = %s',
+                (history_id, session['user_id'])
+            )
+            item = cur.fetchone()
+
+        if not item or not (item['blob_key'] or item['file_url']):
+            return jsonify({'error': 'File not found'}), 404
+
+        as_attachment = request.args.get('download', '').lower() in ('1', 'true', 'yes')
+        if item['blob_key']:
+            # The content-addressed key doubles as a strong ETag. send_file can
+            # only answer Range requests when given a path, so prefer one
+            store = get_blob_store()
+            data = store.local_path(item['blob_key']) or store.open(item['blob_key'])
+            etag = item['blob_key']
+            mime_type = item['mime_type']
+        else:
+            # Row not migrated yet: serve the inline data URL
+            mime_type, raw = decode_data_url(item['file_url'])
+            data = io.BytesIO(raw)
+            etag = True
+
+        response = send_file(
+            data,
+            mimetype=mime_type or 'application/octet-stream',
+            as_attachment=as_attachment,
+            download_name=item['output_filename'],
+            conditional=True,
+            etag=etag,
+            last_modified=item['created_at']
+        )
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except BlobNotFound:
+        return jsonify({'error': 'File not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -225,21 +482,21 @@ def save_to_history():
         if not all([original_filename, output_filename, conversion_type]):
             return jsonify({'error': 'Missing required fields'}), 400
 
-        file_data = None
+        file_path = mime_type = None
         if 'file' in request.files:
-            file_data = request.files['file'].read()
+            file = request.files['file']
+            file_path = save_upload(file)
+            mime_type = file.mimetype
         elif 'files' in request.files:
             # Handle multiple files - save as zip
-            files = request.files.getlist('files')
-            import zipfile
-            import io
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w') as zipf:
-                for f in files:
-                    zipf.writestr(f.filename, f.read())
-            file_data = zip_buffer.getvalue()
-
-        save_download_history(session['user_id'], original_filename, output_filename, conversion_type, file_data)
+            entries = [(save_upload(f), f.filename) for f in request.files.getlist('files')]
+            file_path = request.workspace.file(f'history_{uuid.uuid4()}.zip')
+            with open(file_path, 'wb') as out:
+                for chunk in stream_zip(entries):
+                    out.write(chunk)
+            mime_type = 'application/zip'
+
+        save_download_history(session['user_id'], original_filename, output_filename, conversion_type, file_path, mime_type)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -250,15 +507,12 @@ def delete_history(history_id):
         return jsonify({'error': 'Not authenticated'}), 401
 
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute(
-            'DELETE FROM download_history WHERE id = %s AND user_id = %s',
-            (history_id, session['user_id'])
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(
+                'DELETE FROM download_history WHERE id = %s AND user_id = %s',
+                (history_id, session['user_id'])
+            )
+            conn.commit()
 
         return jsonify({'success': True})
     except Exception as e:
@@ -295,60 +549,70 @@ def api_convert_image():
         if len(files) == 1:
             update_progress(task_id, 30, 'processing', 'Converting image...')
             file = files[0]
-            temp_input = get_unique_filepath(file.filename)
-            file.save(temp_input)
+            temp_input = save_upload(file)
 
             update_progress(task_id, 60, 'processing', 'Processing conversion...')
-            out_dir = tempfile.mkdtemp(dir=TMP, prefix='imgcvt_')
-            out_path = convert_image(temp_input, out_dir, out_format, resize, quality)
+            out_dir = request.workspace.mkdtemp('imgcvt_')
+            out_path = cached_result(
+                'image.convert', temp_input, {'format': out_format, 'resize': resize, 'quality': quality},
+                lambda: convert_image(temp_input, out_dir, out_format, resize, quality),
+                input_hash=upload_sha256(file)
+            )
 
             base_name = os.path.splitext(secure_filename(file.filename))[0]
             download_name = f"{base_name}.{out_format}"
 
             update_progress(task_id, 100, 'complete', 'Conversion complete')
-            threading.Thread(target=cleanup_progress, args=(task_id,)).start()
+            cleanup_progress(task_id)
 
             return send_file(out_path, as_attachment=True, download_name=download_name)
 
-        # If multiple files, convert all and return as zip
+        # If multiple files, convert them in parallel and zip results as they finish
         update_progress(task_id, 10, 'processing', f'Converting {total_files} images...')
-        out_dir = tempfile.mkdtemp(dir=TMP, prefix='imgcvt_multi_')
-        converted_files = []
-
-        for i, file in enumerate(files):
-            if file.filename == '':
-                continue
-
-            progress = 10 + int((i / total_files) * 70)
-            update_progress(task_id, progress, 'processing', f'Converting {i+1}/{total_files}...')
-
-            temp_input = get_unique_filepath(file.filename)
-            file.save(temp_input)
-
-            out_path = convert_image(temp_input, out_dir, out_format, resize, quality)
-            converted_files.append(out_path)
-
-        if not converted_files:
-            update_progress(task_id, 0, 'error', 'No valid files provided')
-            threading.Thread(target=cleanup_progress, args=(task_id,)).start()
-            return jsonify({'error': 'No valid files provided'}), 400
-
-        update_progress(task_id, 85, 'processing', 'Creating archive...')
-        import zipfile
-        zip_path = os.path.join(TMP, f'converted_images_{uuid.uuid4()}.zip')
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for img in converted_files:
-                zipf.write(img, os.path.basename(img))
-
-        update_progress(task_id, 100, 'complete', 'Conversion complete')
-        threading.Thread(target=cleanup_progress, args=(task_id,)).start()
+        out_dir = request.workspace.mkdtemp('imgcvt_multi_')
+        uploads = [f for f in files if f.filename != '']
+        inputs = [(save_upload(f), upload_sha256(f)) for f in uploads]
+
+        failures = []
+        done = 0
+
+        def converted():
+            nonlocal done
+            for index, out_path, error in convert_images(inputs, out_dir, out_format, resize, quality):
+                done += 1
+                name = uploads[index].filename
+                progress = 10 + int((done / len(inputs)) * 85)
+                update_progress(task_id, progress, 'processing', f'Converted {done}/{len(inputs)}...')
+                if error:
+                    failures.append(f'{name}: {error}')
+                    continue
+                base_name = os.path.splitext(secure_filename(name))[0]
+                yield out_path, base_name + os.path.splitext(out_path)[1]
+
+        # Hold the response until something has converted, so a batch in which
+        # every file fails still gets a JSON error instead of an empty archive
+        results = converted()
+        first = next(results, None)
+        if first is None:
+            error = failures[0] if failures else 'No valid files provided'
+            update_progress(task_id, 0, 'error', error)
+            cleanup_progress(task_id)
+            return jsonify({'error': error, 'failures': failures}), 400
+
+        def entries():
+            yield first
+            yield from results
+            if failures:
+                yield ('\n'.join(failures) + '\n').encode('utf-8'), 'errors.txt'
+            update_progress(task_id, 100, 'complete', 'Conversion complete')
+            cleanup_progress(task_id)
 
-        return send_file(zip_path, as_attachment=True, download_name=f'converted_images_{out_format}.zip')
+        return zip_response(entries(), f'converted_images_{out_format}.zip')
     except Exception as e:
         import traceback
         traceback.print_exc()
         update_progress(task_id, 0, 'error', str(e))
-        threading.Thread(target=cleanup_progress, args=(task_id,)).start()
+        cleanup_progress(task_id)
         print(f"Error in api_convert_image: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
@@ -367,15 +631,23 @@ def api_images_to_pdf():
         for file in files:
             if file.filename == '':
                 continue
-            temp_path = get_unique_filepath(file.filename)
-            file.save(temp_path)
+            temp_path = save_upload(file)
             temp_files.append(temp_path)
 
         if not temp_files:
             return jsonify({'error': 'No valid files provided'}), 400
 
-        out_pdf = os.path.join(TMP, f'images_to_pdf_{uuid.uuid4()}.pdf')
-        result = imgs_to_pdf(temp_files, out_pdf)
+        out_pdf = request.workspace.file(f'images_to_pdf_{uuid.uuid4()}.pdf')
+        try:
+            result = images_to_pdf(
+                temp_files, out_pdf,
+                page_size=request.form.get('page_size', 'image'),
+                orientation=request.form.get('orientation', 'auto'),
+                fit=request.form.get('fit', 'contain'),
+                margin=request.form.get('margin', 0, type=float)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         return send_file(result, as_attachment=True)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -390,27 +662,29 @@ def api_pdf_to_images():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
 
+        if not expect_kind(file, 'pdf'):
+            return jsonify({'error': 'File is not a PDF'}), 400
+
         dpi = int(request.form.get('dpi', 200))
         fmt = request.form.get('format', 'png')
+        pages = request.form.get('pages') or None
 
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
-        out_dir = tempfile.mkdtemp(dir=TMP, prefix='pdfimg_')
-        images = pdf_to_images(temp_input, out_dir, dpi=dpi, fmt=fmt)
-
-        import zipfile
-        zip_path = os.path.join(TMP, f'pdf_images_{uuid.uuid4()}.zip')
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for img in images:
-                zipf.write(img, os.path.basename(img))
+        out_dir = request.workspace.mkdtemp('pdfimg_')
+        try:
+            images = pdf_to_images(temp_input, out_dir, dpi=dpi, fmt=fmt, pages=pages)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        return send_file(zip_path, as_attachment=True)
+        # Pages are zipped as the renderers finish them
+        return zip_response(((img, os.path.basename(img)) for img in images), 'pdf_images.zip')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/pdf/merge', methods=['POST'])
 def api_merge_pdfs():
+    task_id = request.form.get('task_id')
     try:
         if 'files' not in request.files:
             return jsonify({'error': 'No files provided'}), 400
@@ -419,22 +693,33 @@ def api_merge_pdfs():
         if not files:
             return jsonify({'error': 'No files selected'}), 400
 
-        temp_files = []
+        # Optional page selection per file, in the same order as the files
+        page_ranges = request.form.getlist('pages')
+        outline = str(request.form.get('bookmarks', 'true')).lower() in ('1', 'true', 'yes')
+        sources = []
 
-        for file in files:
+        for index, file in enumerate(files):
             if file.filename == '':
                 continue
-            temp_path = get_unique_filepath(file.filename)
-            file.save(temp_path)
-            temp_files.append(temp_path)
+            if not expect_kind(file, 'pdf'):
+                return jsonify({'error': f'{file.filename} is not a PDF'}), 400
+            temp_path = save_upload(file)
+            pages = page_ranges[index].strip() if index < len(page_ranges) else ''
+            sources.append((temp_path, pages or None, os.path.splitext(file.filename)[0]))
 
-        if not temp_files:
+        if not sources:
             return jsonify({'error': 'No valid files provided'}), 400
 
-        out_pdf = os.path.join(TMP, f'merged_{uuid.uuid4()}.pdf')
-        result = merge_pdfs(temp_files, out_pdf)
+        out_pdf = request.workspace.file(f'merged_{uuid.uuid4()}.pdf')
+        try:
+            result = merge_pdfs(sources, out_pdf, outline=outline, progress=task_progress(task_id))
+        except ValueError as e:
+            end_task(task_id, 'error', str(e))
+            return jsonify({'error': str(e)}), 400
+        end_task(task_id, 'complete', 'Merge complete')
         return send_file(result, as_attachment=True)
     except Exception as e:
+        end_task(task_id, 'error', str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/office/convert', methods=['POST'])
@@ -454,42 +739,39 @@ def api_office_convert():
             return jsonify({'error': 'No file provided'}), 400
 
         out_format = request.form.get('format', 'pdf').lower()
-        out_dir = tempfile.mkdtemp(dir=TMP, prefix='office_convert_')
+        out_dir = request.workspace.mkdtemp('office_convert_')
+
+        if wants_async() and len(uploads) == 1:
+            temp_input = save_upload(uploads[0])
+            base = os.path.splitext(secure_filename(uploads[0].filename))[0]
+            return queue_job('office.convert', {'in_path': temp_input, 'out_dir': out_dir, 'out_format': out_format},
+                             download_name=f'{base}.{out_format}', task_id=request.form.get('task_id'))
 
         converted_paths = []
         for upload in uploads:
-            temp_input = get_unique_filepath(upload.filename)
-            upload.save(temp_input)
-            try:
-                converted = convert_office_document(temp_input, out_dir, out_format=out_format)
-                converted_paths.append(converted)
-            finally:
-                try:
-                    os.remove(temp_input)
-                except OSError:
-                    pass
+            temp_input = save_upload(upload)
+            converted = cached_result(
+                'office.convert', temp_input, {'format': out_format},
+                lambda: convert_office_document(temp_input, out_dir, out_format=out_format),
+                input_hash=upload_sha256(upload)
+            )
+            base = os.path.splitext(secure_filename(upload.filename))[0]
+            converted_paths.append((converted, base + os.path.splitext(converted)[1]))
 
         if not converted_paths:
             return jsonify({'error': 'Conversion failed'}), 500
 
         if len(converted_paths) == 1:
-            result = converted_paths[0]
-            return send_file(result, as_attachment=True, download_name=os.path.basename(result))
+            result, download_name = converted_paths[0]
+            return send_file(result, as_attachment=True, download_name=download_name)
 
-        import zipfile
-
-        zip_filename = f'converted_document_{out_format}.zip'
-        zip_path = os.path.join(TMP, f"{uuid.uuid4()}_{zip_filename}")
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for path in converted_paths:
-                zipf.write(path, arcname=os.path.basename(path))
-
-        return send_file(zip_path, as_attachment=True, download_name=zip_filename)
+        return zip_response(converted_paths, f'converted_document_{out_format}.zip')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/audio/convert', methods=['POST'])
 def api_convert_audio():
+    task_id = request.form.get('task_id')
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -499,20 +781,37 @@ def api_convert_audio():
             return jsonify({'error': 'No file selected'}), 400
 
         out_ext = request.form.get('format', 'mp3')
-        bitrate = request.form.get('bitrate', '192k')
+        bitrate = request.form.get('bitrate') or None
+        preset = request.form.get('preset', DEFAULT_AV_PRESET)
+        if preset not in VIDEO_PRESETS:
+            return jsonify({'error': f"Unknown preset '{preset}'. Choose from: {', '.join(VIDEO_PRESETS)}"}), 400
 
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         base = os.path.splitext(secure_filename(file.filename))[0]
-        out_path = os.path.join(TMP, f'{base}_{uuid.uuid4()}.{out_ext}')
-        result = convert_audio(temp_input, out_path, bitrate=bitrate)
-        return send_file(result, as_attachment=True)
+        out_path = request.workspace.file(f'{base}_{uuid.uuid4()}.{out_ext}')
+        if wants_async():
+            return queue_job('audio.convert', {'in_path': temp_input, 'out_path': out_path, 'bitrate': bitrate, 'preset': preset,
+                                               'input_hash': upload_sha256(file)},
+                             download_name=f'{base}.{out_ext}', task_id=task_id)
+        result = cached_result(
+            'audio.convert', temp_input, {'format': out_ext, 'bitrate': bitrate, 'preset': preset},
+            lambda: convert_audio(temp_input, out_path, bitrate=bitrate, preset=preset, input_hash=upload_sha256(file),
+                                  progress=task_progress(task_id), task_id=task_id),
+            input_hash=upload_sha256(file)
+        )
+        end_task(task_id, 'complete', 'Conversion complete')
+        return send_file(result, as_attachment=True, download_name=f'{base}.{out_ext}')
+    except Cancelled:
+        end_task(task_id, 'cancelled', 'Cancelled')
+        return jsonify({'error': 'Conversion was cancelled'}), 409
     except Exception as e:
+        end_task(task_id, 'error', str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/video/convert', methods=['POST'])
 def api_convert_video():
+    task_id = request.form.get('task_id')
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -522,19 +821,36 @@ def api_convert_video():
             return jsonify({'error': 'No file selected'}), 400
 
         out_ext = request.form.get('format', 'mp4')
+        preset = request.form.get('preset', DEFAULT_AV_PRESET)
+        if preset not in VIDEO_PRESETS:
+            return jsonify({'error': f"Unknown preset '{preset}'. Choose from: {', '.join(VIDEO_PRESETS)}"}), 400
 
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         base = os.path.splitext(secure_filename(file.filename))[0]
-        out_path = os.path.join(TMP, f'{base}_{uuid.uuid4()}.{out_ext}')
-        result = convert_video(temp_input, out_path)
-        return send_file(result, as_attachment=True)
+        out_path = request.workspace.file(f'{base}_{uuid.uuid4()}.{out_ext}')
+        if wants_async():
+            return queue_job('video.convert', {'in_path': temp_input, 'out_path': out_path, 'preset': preset,
+                                               'input_hash': upload_sha256(file)},
+                             download_name=f'{base}.{out_ext}', task_id=task_id)
+        result = cached_result(
+            'video.convert', temp_input, {'format': out_ext, 'preset': preset},
+            lambda: convert_video(temp_input, out_path, preset=preset, input_hash=upload_sha256(file),
+                                  progress=task_progress(task_id), task_id=task_id),
+            input_hash=upload_sha256(file)
+        )
+        end_task(task_id, 'complete', 'Conversion complete')
+        return send_file(result, as_attachment=True, download_name=f'{base}.{out_ext}')
+    except Cancelled:
+        end_task(task_id, 'cancelled', 'Cancelled')
+        return jsonify({'error': 'Conversion was cancelled'}), 409
     except Exception as e:
+        end_task(task_id, 'error', str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/video/to-gif', methods=['POST'])
 def api_video_to_gif():
+    task_id = request.form.get('task_id')
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -546,20 +862,44 @@ def api_video_to_gif():
         fps = int(request.form.get('fps', 12))
         width = request.form.get('width')
         height = request.form.get('height')
+        start = request.form.get('start', type=float)
+        duration = request.form.get('duration', type=float)
+        max_bytes = request.form.get('max_bytes', type=int)
+        out_ext = request.form.get('format', 'gif').lower()
+        if out_ext not in ('gif', 'webp'):
+            return jsonify({'error': 'Format must be gif or webp'}), 400
 
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         base = os.path.splitext(secure_filename(file.filename))[0]
-        out_path = os.path.join(TMP, f'{base}_{uuid.uuid4()}.gif')
+        out_path = request.workspace.file(f'{base}_{uuid.uuid4()}.{out_ext}')
 
+        # Either dimension may be left out to keep the aspect ratio
         scale = None
-        if width and height:
-            scale = (int(width), int(height))
-
-        result = video_to_gif(temp_input, out_path, fps=fps, scale=scale)
-        return send_file(result, as_attachment=True)
+        if width or height:
+            scale = (int(width) if width else -2, int(height) if height else -2)
+
+        options = {'fps': fps, 'scale': scale, 'start': start, 'duration': duration, 'max_bytes': max_bytes}
+        if wants_async():
+            return queue_job('video.to-gif', {'in_path': temp_input, 'out_path': out_path, **options},
+                             download_name=f'{base}.{out_ext}', task_id=task_id)
+        result = cached_result(
+            'video.to-gif', temp_input, dict(options, format=out_ext),
+            lambda: video_to_gif(temp_input, out_path, input_hash=upload_sha256(file),
+                                 progress=task_progress(task_id), task_id=task_id, **options),
+            input_hash=upload_sha256(file)
+        )
+        end_task(task_id, 'complete', 'Conversion complete')
+        response = send_file(result, as_attachment=True, download_name=f'{base}.{out_ext}')
+        if max_bytes:
+            # The smallest attempt is sent even when none fit
+            response.headers['X-Size-Target-Met'] = str(os.path.getsize(result) <= max_bytes).lower()
+        return response
+    except Cancelled:
+        end_task(task_id, 'cancelled', 'Cancelled')
+        return jsonify({'error': 'Conversion was cancelled'}), 409
     except Exception as e:
+        end_task(task_id, 'error', str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/ocr/image', methods=['POST'])
@@ -574,8 +914,7 @@ def api_image_ocr():
 
         lang = request.form.get('lang', 'eng')
 
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         text = image_to_text(temp_input, lang)
         return jsonify({'text': text})
@@ -584,6 +923,7 @@ def api_image_ocr():
 
 @app.route('/api/ocr/pdf', methods=['POST'])
 def api_pdf_ocr():
+    task_id = request.form.get('task_id')
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -592,14 +932,46 @@ def api_pdf_ocr():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
 
+        if not expect_kind(file, 'pdf'):
+            return jsonify({'error': 'File is not a PDF'}), 400
+
         lang = request.form.get('lang', 'eng')
+        pages = request.form.get('pages') or None
+        # auto reads pages that already carry text and OCRs only the rest
+        mode = request.form.get('mode', 'auto')
+        if mode not in OCR_MODES:
+            return jsonify({'error': f"Unknown mode '{mode}'. Choose from: {', '.join(OCR_MODES)}"}), 400
 
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
-        text = pdf_to_text(temp_input, lang)
-        return jsonify({'text': text})
+        if wants_async():
+            return queue_job('ocr.pdf', {'pdf_path': temp_input, 'lang': lang, 'pages': pages, 'mode': mode},
+                             task_id=task_id)
+        try:
+            results = ocr_pages(temp_input, lang, pages=pages, progress=task_progress(task_id), mode=mode)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if str(request.form.get('stream')).lower() in ('1', 'true', 'yes'):
+            # One JSON object per line as each page is recognised
+            def lines():
+                try:
+                    for result in results:
+                        yield json.dumps(result) + '\n'
+                    end_task(task_id, 'complete', 'OCR complete')
+                except Exception as e:
+                    end_task(task_id, 'error', str(e))
+                    yield json.dumps({'error': str(e)}) + '\n'
+            return Response(lines(), mimetype='application/x-ndjson')
+
+        results = list(results)
+        end_task(task_id, 'complete', 'OCR complete')
+        return jsonify({
+            'text': "\n\n".join(result['text'] for result in results),
+            'pages': [{'page': result['page'], 'method': result['method']} for result in results]
+        })
     except Exception as e:
+        end_task(task_id, 'error', str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/qr/generate', methods=['POST'])
@@ -612,7 +984,7 @@ def api_generate_qr():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
-        out_path = os.path.join(TMP, f'qrcode_{uuid.uuid4()}.png')
+        out_path = request.workspace.file(f'qrcode_{uuid.uuid4()}.png')
         result = make_qr(data, out_path)
         return send_file(result, mimetype='image/png')
     except Exception as e:
@@ -628,8 +1000,7 @@ def api_decode_codes():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
 
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         results = decode_codes(temp_input)
         return jsonify({'codes': results})
@@ -646,10 +1017,9 @@ def api_invert_image():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
 
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
-        out_dir = tempfile.mkdtemp(dir=TMP, prefix='invert_')
+        out_dir = request.workspace.mkdtemp('invert_')
         out_path = invert_image(temp_input, out_dir)
 
         base_name = os.path.splitext(secure_filename(file.filename))[0]
@@ -670,7 +1040,7 @@ def api_text_to_image():
         height = int(data.get('height', 600))
         font_size = int(data.get('font_size', 24))
 
-        out_path = os.path.join(TMP, f'text_image_{uuid.uuid4()}.png')
+        out_path = request.workspace.file(f'text_image_{uuid.uuid4()}.png')
         result = text_to_image(text, out_path, width, height, font_size)
         return send_file(result, as_attachment=True, download_name='text_image.png')
     except Exception as e:
@@ -688,18 +1058,16 @@ def api_zip_folder():
 
         folder_name = secure_filename(request.form.get('folder_name', 'folder'))
 
-        temp_folder = os.path.join(TMP, f'{folder_name}_{uuid.uuid4()}')
+        temp_folder = request.workspace.file(f'{folder_name}_{uuid.uuid4()}')
         os.makedirs(temp_folder, exist_ok=True)
 
         for file in files:
             if file.filename == '':
                 continue
             safe_name = secure_filename(file.filename)
-            file.save(os.path.join(temp_folder, safe_name))
+            save_upload(file, os.path.join(temp_folder, safe_name))
 
-        out_zip = os.path.join(TMP, f"{folder_name}_{uuid.uuid4()}.zip")
-        result = zip_folder(temp_folder, out_zip)
-        return send_file(result, as_attachment=True)
+        return zip_response(walk_entries(temp_folder), f'{folder_name}.zip')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -713,22 +1081,13 @@ def api_unzip():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
 
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
-        out_dir = os.path.join(TMP, f'unzipped_{uuid.uuid4()}')
+        out_dir = request.workspace.file(f'unzipped_{uuid.uuid4()}')
         os.makedirs(out_dir, exist_ok=True)
         result_dir = unzip(temp_input, out_dir)
 
-        import zipfile
-        zip_path = os.path.join(TMP, f'extracted_files_{uuid.uuid4()}.zip')
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for root, dirs, files in os.walk(result_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    zipf.write(file_path, os.path.relpath(file_path, result_dir))
-
-        return send_file(zip_path, as_attachment=True)
+        return zip_response(walk_entries(result_dir), 'extracted_files.zip')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -743,13 +1102,19 @@ def api_convert_ebook():
             return jsonify({'error': 'No file selected'}), 400
 
         out_format = request.form.get('format', 'epub')
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         base = os.path.splitext(secure_filename(file.filename))[0]
-        out_path = os.path.join(TMP, f'{base}_{uuid.uuid4()}.{out_format}')
-        result = convert_ebook(temp_input, out_path, out_format)
-        return send_file(result, as_attachment=True)
+        out_path = request.workspace.file(f'{base}_{uuid.uuid4()}.{out_format}')
+        if wants_async():
+            return queue_job('ebook.convert', {'in_path': temp_input, 'out_path': out_path, 'out_format': out_format},
+                             download_name=f'{base}.{out_format}', task_id=request.form.get('task_id'))
+        result = cached_result(
+            'ebook.convert', temp_input, {'format': out_format},
+            lambda: convert_ebook(temp_input, out_path, out_format),
+            input_hash=upload_sha256(file)
+        )
+        return send_file(result, as_attachment=True, download_name=f'{base}.{out_format}')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -764,13 +1129,19 @@ def api_convert_presentation():
             return jsonify({'error': 'No file selected'}), 400
 
         out_format = request.form.get('format', 'pdf')
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         base = os.path.splitext(secure_filename(file.filename))[0]
-        out_path = os.path.join(TMP, f'{base}_{uuid.uuid4()}.{out_format}')
-        result = convert_presentation(temp_input, out_path, out_format)
-        return send_file(result, as_attachment=True)
+        out_path = request.workspace.file(f'{base}_{uuid.uuid4()}.{out_format}')
+        if wants_async():
+            return queue_job('presentation.convert', {'in_path': temp_input, 'out_path': out_path, 'out_format': out_format},
+                             download_name=f'{base}.{out_format}', task_id=request.form.get('task_id'))
+        result = cached_result(
+            'presentation.convert', temp_input, {'format': out_format},
+            lambda: convert_presentation(temp_input, out_path, out_format),
+            input_hash=upload_sha256(file)
+        )
+        return send_file(result, as_attachment=True, download_name=f'{base}.{out_format}')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -785,13 +1156,19 @@ def api_convert_spreadsheet():
             return jsonify({'error': 'No file selected'}), 400
 
         out_format = request.form.get('format', 'xlsx')
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         base = os.path.splitext(secure_filename(file.filename))[0]
-        out_path = os.path.join(TMP, f'{base}_{uuid.uuid4()}.{out_format}')
-        result = convert_spreadsheet(temp_input, out_path, out_format)
-        return send_file(result, as_attachment=True)
+        out_path = request.workspace.file(f'{base}_{uuid.uuid4()}.{out_format}')
+        if wants_async():
+            return queue_job('spreadsheet.convert', {'in_path': temp_input, 'out_path': out_path, 'out_format': out_format},
+                             download_name=f'{base}.{out_format}', task_id=request.form.get('task_id'))
+        result = cached_result(
+            'spreadsheet.convert', temp_input, {'format': out_format},
+            lambda: convert_spreadsheet(temp_input, out_path, out_format),
+            input_hash=upload_sha256(file)
+        )
+        return send_file(result, as_attachment=True, download_name=f'{base}.{out_format}')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -806,13 +1183,19 @@ def api_convert_vector():
             return jsonify({'error': 'No file selected'}), 400
 
         out_format = request.form.get('format', 'svg')
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         base = os.path.splitext(secure_filename(file.filename))[0]
-        out_path = os.path.join(TMP, f'{base}_{uuid.uuid4()}.{out_format}')
-        result = convert_vector(temp_input, out_path, out_format)
-        return send_file(result, as_attachment=True)
+        out_path = request.workspace.file(f'{base}_{uuid.uuid4()}.{out_format}')
+        if wants_async():
+            return queue_job('vector.convert', {'in_path': temp_input, 'out_path': out_path, 'out_format': out_format},
+                             download_name=f'{base}.{out_format}', task_id=request.form.get('task_id'))
+        result = cached_result(
+            'vector.convert', temp_input, {'format': out_format},
+            lambda: convert_vector(temp_input, out_path, out_format),
+            input_hash=upload_sha256(file)
+        )
+        return send_file(result, as_attachment=True, download_name=f'{base}.{out_format}')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -827,13 +1210,16 @@ def api_convert_font():
             return jsonify({'error': 'No file selected'}), 400
 
         out_format = request.form.get('format', 'ttf')
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         base = os.path.splitext(secure_filename(file.filename))[0]
-        out_path = os.path.join(TMP, f'{base}_{uuid.uuid4()}.{out_format}')
-        result = convert_font(temp_input, out_path, out_format)
-        return send_file(result, as_attachment=True)
+        out_path = request.workspace.file(f'{base}_{uuid.uuid4()}.{out_format}')
+        result = cached_result(
+            'font.convert', temp_input, {'format': out_format},
+            lambda: convert_font(temp_input, out_path, out_format),
+            input_hash=upload_sha256(file)
+        )
+        return send_file(result, as_attachment=True, download_name=f'{base}.{out_format}')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -848,13 +1234,19 @@ def api_convert_cad():
             return jsonify({'error': 'No file selected'}), 400
 
         out_format = request.form.get('format', 'pdf')
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         base = os.path.splitext(secure_filename(file.filename))[0]
-        out_path = os.path.join(TMP, f'{base}_{uuid.uuid4()}.{out_format}')
-        result = convert_cad(temp_input, out_path, out_format)
-        return send_file(result, as_attachment=True)
+        out_path = request.workspace.file(f'{base}_{uuid.uuid4()}.{out_format}')
+        if wants_async():
+            return queue_job('cad.convert', {'in_path': temp_input, 'out_path': out_path, 'out_format': out_format},
+                             download_name=f'{base}.{out_format}', task_id=request.form.get('task_id'))
+        result = cached_result(
+            'cad.convert', temp_input, {'format': out_format},
+            lambda: convert_cad(temp_input, out_path, out_format),
+            input_hash=upload_sha256(file)
+        )
+        return send_file(result, as_attachment=True, download_name=f'{base}.{out_format}')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -864,45 +1256,59 @@ def get_citations():
         return jsonify({'error': 'Not authenticated'}), 401
 
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute(
-            'SELECT id, source_type, citation_style, metadata, formatted_citation, created_at FROM citations WHERE user_id = %s ORDER BY created_at DESC',
-            (session['user_id'],)
-        )
-        citations = cur.fetchall()
-        cur.close()
-        conn.close()
-
-        return jsonify({'citations': citations})
+        citations, next_cursor = fetch_page('citations', CITATION_FIELDS, 100)
+        return jsonify({'citations': citations, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Largest number of citations one bulk request may touch
+CITATION_BULK_MAX = int(os.getenv('CITATION_BULK_MAX', '10000'))
+CITATION_EXPORT_BATCH = 2000
+URL_METADATA_BATCH_MAX = int(os.getenv('URL_METADATA_BATCH_MAX', '200'))
+
+def citation_values(data):
+    """(source_type, citation_style, metadata, formatted_citation) from a request
+    body; ValueError if a field is missing."""
+    if not isinstance(data, dict):
+        raise ValueError('Citation must be an object')
+    source_type = data.get('source_type')
+    citation_style = data.get('citation_style')
+    metadata = data.get('metadata')
+    formatted_citation = data.get('formatted_citation')
+
+    if not all([source_type, citation_style, metadata, formatted_citation]):
+        raise ValueError('Missing required fields')
+    return source_type, citation_style, Json(metadata), formatted_citation
+
+def bulk_items(data, key):
+    """The list under key in a bulk request body; ValueError if it is missing or too long."""
+    items = (data or {}).get(key)
+    if not isinstance(items, list) or not items:
+        raise ValueError(f'{key} must be a non-empty list')
+    if len(items) > CITATION_BULK_MAX:
+        raise ValueError(f'At most {CITATION_BULK_MAX} citations per request')
+    return items
+
 @app.route('/api/citations', methods=['POST'])
 def save_citation():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
 
     try:
-        data = request.json
-        source_type = data.get('source_type')
-        citation_style = data.get('citation_style')
-        metadata = data.get('metadata')
-        formatted_citation = data.get('formatted_citation')
-
-        if not all([source_type, citation_style, metadata, formatted_citation]):
-            return jsonify({'error': 'Missing required fields'}), 400
-
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute(
-            'INSERT INTO citations (user_id, source_type, citation_style, metadata, formatted_citation) VALUES (%s, %s, %s, %s, %s) RETURNING id',
-            (session['user_id'], source_type, citation_style, metadata, formatted_citation)
-        )
-        citation_id = cur.fetchone()['id']
-        conn.commit()
-        cur.close()
-        conn.close()
+        try:
+            values = citation_values(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(
+                'INSERT INTO citations (user_id, source_type, citation_style, metadata, formatted_citation) VALUES (%s, %s, %s, %s, %s) RETURNING id',
+                (session['user_id'], *values)
+            )
+            citation_id = cur.fetchone()['id']
+            conn.commit()
 
         return jsonify({'success': True, 'citation_id': citation_id})
     except Exception as e:
@@ -914,15 +1320,12 @@ def delete_citation(citation_id):
         return jsonify({'error': 'Not authenticated'}), 401
 
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute(
-            'DELETE FROM citations WHERE id = %s AND user_id = %s',
-            (citation_id, session['user_id'])
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(
+                'DELETE FROM citations WHERE id = %s AND user_id = %s',
+                (citation_id, session['user_id'])
+            )
+            conn.commit()
 
         return jsonify({'success': True})
     except Exception as e:
@@ -934,29 +1337,120 @@ def update_citation(citation_id):
         return jsonify({'error': 'Not authenticated'}), 401
 
     try:
-        data = request.json
-        source_type = data.get('source_type')
-        citation_style = data.get('citation_style')
-        metadata = data.get('metadata')
-        formatted_citation = data.get('formatted_citation')
+        try:
+            values = citation_values(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        if not all([source_type, citation_style, metadata, formatted_citation]):
-            return jsonify({'error': 'Missing required fields'}), 400
-
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute(
-            'UPDATE citations SET source_type = %s, citation_style = %s, metadata = %s, formatted_citation = %s WHERE id = %s AND user_id = %s',
-            (source_type, citation_style, metadata, formatted_citation, citation_id, session['user_id'])
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(
+                'UPDATE citations SET source_type = %s, citation_style = %s, metadata = %s, formatted_citation = %s WHERE id = %s AND user_id = %s',
+                (*values, citation_id, session['user_id'])
+            )
+            conn.commit()
 
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/citations/bulk', methods=['POST'])
+def save_citations_bulk():
+    """Insert a list of citations in one transaction; all or nothing."""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    try:
+        try:
+            items = bulk_items(request.json, 'citations')
+            rows = []
+            for i, item in enumerate(items):
+                try:
+                    rows.append((session['user_id'], *citation_values(item)))
+                except ValueError as e:
+                    raise ValueError(f'citations[{i}]: {e}')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        with get_db() as conn, conn.cursor() as cur:
+            inserted = execute_values(
+                cur,
+                'INSERT INTO citations (user_id, source_type, citation_style, metadata, formatted_citation) VALUES %s RETURNING id',
+                rows, page_size=1000, fetch=True
+            )
+            conn.commit()
+
+        return jsonify({'success': True, 'citation_ids': [row['id'] for row in inserted]})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/citations/bulk', methods=['PUT'])
+def update_citations_bulk():
+    """Update a list of citations (each with its id) in one transaction.
+    Ids that do not exist or belong to someone else are reported as missing."""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    try:
+        try:
+            items = bulk_items(request.json, 'citations')
+            rows = []
+            for i, item in enumerate(items):
+                try:
+                    values = citation_values(item)
+                    if not isinstance(item.get('id'), int):
+                        raise ValueError('Missing id')
+                except ValueError as e:
+                    raise ValueError(f'citations[{i}]: {e}')
+                rows.append((item['id'], session['user_id'], *values))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        with get_db() as conn, conn.cursor() as cur:
+            updated = execute_values(
+                cur,
+                '''
+                UPDATE citations AS c
+                SET source_type = v.source_type, citation_style = v.citation_style,
+                    metadata = v.metadata, formatted_citation = v.formatted_citation
+                FROM (VALUES %s) AS v (id, user_id, source_type, citation_style, metadata, formatted_citation)
+                WHERE c.id = v.id AND c.user_id = v.user_id
+                RETURNING c.id
+                ''',
+                rows, template='(%s::integer, %s::integer, %s, %s, %s::jsonb, %s)', page_size=1000, fetch=True
+            )
+            conn.commit()
+
+        updated_ids = {row['id'] for row in updated}
+        missing = [row[0] for row in rows if row[0] not in updated_ids]
+        return jsonify({'success': True, 'updated': len(updated_ids), 'missing': missing})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/citations/bulk', methods=['DELETE'])
+def delete_citations_bulk():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    try:
+        try:
+            citation_ids = bulk_items(request.json, 'citation_ids')
+            if not all(isinstance(i, int) for i in citation_ids):
+                raise ValueError('citation_ids must be integers')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(
+                'DELETE FROM citations WHERE user_id = %s AND id = ANY(%s)',
+                (session['user_id'], citation_ids)
+            )
+            deleted = cur.rowcount
+            conn.commit()
+
+        return jsonify({'success': True, 'deleted': deleted})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/citations/fetch-metadata', methods=['POST'])
 def fetch_url_metadata():
     try:
@@ -966,170 +1460,166 @@ def fetch_url_metadata():
         if not url:
             return jsonify({'error': 'URL is required'}), 400
 
-        import requests
-        from bs4 import BeautifulSoup
-        from datetime import datetime
-
-        url = url.strip()
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-
-        try:
-            from urllib.parse import urlparse
-            parsed = urlparse(url)
-            if not parsed.netloc or not '.' in parsed.netloc:
-                return jsonify({'error': 'Invalid URL format. Please enter a valid website URL.'}), 400
-        except:
-            return jsonify({'error': 'Invalid URL format. Please enter a valid website URL.'}), 400
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        metadata = {
-            'url': url,
-            'title': None,
-            'author': None,
-            'publishDate': None,
-            'accessDate': datetime.now().strftime('%Y-%m-%d')
-        }
-
-        # Extract title
-        title_tag = soup.find('meta', property='og:title') or soup.find('title')
-        if title_tag:
-            metadata['title'] = title_tag.get('content') if title_tag.get('content') else title_tag.get_text()
-
-        # Extract author
-        author_tag = (
-            soup.find('meta', attrs={'name': 'author'}) or
-            soup.find('meta', property='article:author') or
-            soup.find('meta', attrs={'name': 'citation_author'})
-        )
-        if author_tag:
-            metadata['author'] = author_tag.get('content')
-
-        # Extract publish date
-        date_tag = (
-            soup.find('meta', property='article:published_time') or
-            soup.find('meta', attrs={'name': 'publication_date'}) or
-            soup.find('meta', attrs={'name': 'date'}) or
-            soup.find('meta', property='og:updated_time')
-        )
-        if date_tag:
-            date_str = date_tag.get('content')
-            try:
-                # Try to parse ISO format date
-                parsed_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                metadata['publishDate'] = parsed_date.strftime('%Y-%m-%d')
-            except:
-                metadata['publishDate'] = date_str
-
-        return jsonify(metadata)
+        return jsonify(get_url_metadata_fetcher().fetch(url))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except requests.RequestException as e:
         return jsonify({'error': f'Failed to fetch URL: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/citations/fetch-metadata/batch', methods=['POST'])
+def fetch_url_metadata_batch():
+    """Metadata for a list of URLs, fetched in parallel; per-URL errors are
+    reported in place rather than failing the batch."""
+    try:
+        urls = (request.json or {}).get('urls')
+        if not isinstance(urls, list) or not urls or not all(isinstance(u, str) for u in urls):
+            return jsonify({'error': 'urls must be a non-empty list of strings'}), 400
+        if len(urls) > URL_METADATA_BATCH_MAX:
+            return jsonify({'error': f'At most {URL_METADATA_BATCH_MAX} URLs per request'}), 400
+
+        return jsonify({'results': get_url_metadata_fetcher().fetch_many(urls)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def citation_export_stream(user_id, citation_ids, formatter):
+    """Yield the export in chunks, reading rows through a server-side cursor so
+    only one batch is in memory; the connection is held until the stream ends."""
+    where = 'user_id = %s'
+    params = [user_id]
+    if citation_ids is not None:
+        where += ' AND id = ANY(%s)'
+        params.append(citation_ids)
+
+    with get_db() as conn:
+        with conn.cursor(name=f'citation_export_{uuid.uuid4().hex}') as cur:
+            cur.itersize = CITATION_EXPORT_BATCH
+            cur.execute(
+                f'SELECT id, source_type, metadata, formatted_citation FROM citations WHERE {where} ORDER BY created_at, id',
+                params
+            )
+            while True:
+                rows = cur.fetchmany(CITATION_EXPORT_BATCH)
+                if not rows:
+                    break
+                yield ''.join(formatter(row) for row in rows).encode('utf-8')
+        conn.commit()
+
 @app.route('/api/citations/export', methods=['POST'])
 def export_citations():
+    """Export the selected citations (or all with "all": true) as txt, bib or ris."""
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
 
     try:
-        data = request.json
-        citation_ids = data.get('citation_ids', [])
+        data = request.json or {}
         export_format = data.get('format', 'txt')
-
-        if not citation_ids:
-            return jsonify({'error': 'No citations selected'}), 400
-
-        conn = get_db()
-        cur = conn.cursor()
-
-        placeholders = ','.join(['%s'] * len(citation_ids))
-        cur.execute(
-            f'SELECT formatted_citation FROM citations WHERE id IN ({placeholders}) AND user_id = %s',
-            (*citation_ids, session['user_id'])
-        )
-        citations = cur.fetchall()
-        cur.close()
-        conn.close()
-
-        if not citations:
+        if export_format not in CITATION_EXPORT_FORMATS:
+            return jsonify({'error': f'Unsupported export format: {export_format}'}), 400
+        formatter, mimetype = CITATION_EXPORT_FORMATS[export_format]
+
+        citation_ids = None
+        if not data.get('all'):
+            citation_ids = data.get('citation_ids', [])
+            if not citation_ids:
+                return jsonify({'error': 'No citations selected'}), 400
+            if not all(isinstance(i, int) for i in citation_ids):
+                return jsonify({'error': 'citation_ids must be integers'}), 400
+
+        chunks = citation_export_stream(session['user_id'], citation_ids, formatter)
+        # Run the query now so an empty export is a 404 rather than an empty file
+        first = next(chunks, None)
+        if first is None:
             return jsonify({'error': 'No citations found'}), 404
 
-        content = '\n\n'.join([c['formatted_citation'] for c in citations])
-
-        import io
-        output = io.BytesIO()
-        output.write(content.encode('utf-8'))
-        output.seek(0)
+        def stream():
+            # A generator (unlike itertools.chain) passes close() on to chunks,
+            # so a dropped download returns the connection straight away
+            yield first
+            yield from chunks
 
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=f'citations.{export_format}',
-            mimetype='text/plain'
+        return Response(
+            stream(),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="citations.{export_format}"'}
         )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 import threading
-import time
 import json
 
-# Global progress tracking
-conversion_progress = {}
-download_progress = {}  # For YouTube downloads
-
-def update_progress(task_id, progress, status='processing', message=''):
-    """Update progress for a task"""
-    conversion_progress[task_id] = {
-        'progress': progress,
-        'status': status,
-        'message': message
-    }
-
-def cleanup_progress(task_id):
-    """Clean up progress data after a delay"""
-    time.sleep(5)
-    if task_id in conversion_progress:
-        del conversion_progress[task_id]
-    if task_id in download_progress:
-        del download_progress[task_id]
+# Progress lives in a shared store (utils/progress_store.py) so any worker can stream it
+def set_download_progress(task_id, progress, status, message):
+    update_progress(task_id, progress, status, message, channel='download')
+
+def progress_response(channel, task_id):
+    """SSE response for a task, bounded by the per-process connection cap"""
+    if request.headers.get('Last-Event-ID') == SSE_FINAL_ID:
+        # The stream already ended; 204 is the one answer EventSource won't retry
+        return '', 204
+    if not sse_connections.acquire():
+        response = jsonify({'error': 'Too many open progress streams'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
 
+    response = app.response_class(progress_stream(get_progress_store(), channel, task_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Release on close rather than in the generator: it may never be started
+    response.call_on_close(sse_connections.release)
+    return response
 
 @app.route('/api/progress/<task_id>')
 def get_progress(task_id):
     """Generic progress endpoint for all conversions"""
-    def generate():
-        while True:
-            if task_id in conversion_progress:
-                data = conversion_progress[task_id]
-                yield f"data: {json.dumps(data)}\n\n"
-                if data.get('status') in ['complete', 'error']:
-                    break
-            time.sleep(0.3)
-
-    return app.response_class(generate(), mimetype='text/event-stream')
+    return progress_response('conversion', task_id)
 
 @app.route('/api/youtube/progress/<task_id>')
 def youtube_progress(task_id):
     """YouTube-specific progress endpoint"""
-    def generate():
-        while True:
-            if task_id in download_progress:
-                data = download_progress[task_id]
-                yield f"data: {json.dumps(data)}\n\n"
-                if data.get('status') in ['complete', 'error']:
-                    break
-            time.sleep(0.3)
+    return progress_response('download', task_id)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = owned_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = owned_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] != 'complete':
+        return jsonify(job_status(job)), 409
+    if job['result_value'] is not None:
+        return jsonify({'result': json.loads(job['result_value'])})
+    if not job['result_path'] or not os.path.exists(job['result_path']):
+        return jsonify({'error': 'Job result has expired'}), 410
+    return send_file(
+        job['result_path'],
+        as_attachment=True,
+        download_name=job['download_name'] or os.path.basename(job['result_path'])
+    )
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    if not owned_job(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+    if not cancel_job(job_id):
+        return jsonify({'error': 'Job has already finished or cannot be stopped'}), 409
+    return jsonify({'success': True})
 
-    return app.response_class(generate(), mimetype='text/event-stream')
+@app.route('/api/tasks/<task_id>/cancel', methods=['POST'])
+def cancel_task(task_id):
+    """Stop a synchronous audio/video conversion started with this task_id."""
+    if not cancel_ffmpeg(task_id):
+        return jsonify({'error': 'No conversion running for this task'}), 404
+    return jsonify({'success': True})
 
 @app.route('/api/capture/<format_type>', methods=['POST'])
 def capture_website(format_type):
@@ -1145,7 +1635,7 @@ def capture_website(format_type):
             update_progress(task_id, 10, 'processing', 'Capturing website...')
 
         import subprocess
-        output_path = os.path.join(TMP, f'capture_{uuid.uuid4().hex}')
+        output_path = request.workspace.file(f'capture_{uuid.uuid4().hex}')
 
         if format_type == 'pdf':
             if task_id:
@@ -1165,15 +1655,7 @@ def capture_website(format_type):
 
         response = send_file(final_path, as_attachment=True, download_name=f'website.{format_type}', mimetype=mimetype)
 
-        @response.call_on_close
-        def cleanup():
-            threading.Thread(target=cleanup_progress, args=(task_id,)).start()
-            try:
-                if os.path.exists(final_path):
-                    os.remove(final_path)
-            except Exception as e:
-                print(f"Error during cleanup: {e}")
-
+        response.call_on_close(lambda: cleanup_progress(task_id))
         return response
 
     except subprocess.CalledProcessError as e:
@@ -1195,13 +1677,17 @@ def optimize_file(tool):
         return jsonify({'error': 'No file selected'}), 400
 
     task_id = request.form.get('task_id')
+    # PDF profiles trade image resolution and quality against size
+    profile = request.form.get('profile', DEFAULT_PDF_PROFILE)
+    if profile not in PDF_PROFILES:
+        return jsonify({'error': f"Unknown profile '{profile}'. Choose from: {', '.join(PDF_PROFILES)}"}), 400
+    linearize = str(request.form.get('linearize')).lower() in ('1', 'true', 'yes')
 
     try:
         if task_id:
             update_progress(task_id, 20, 'processing', 'Optimizing file...')
 
-        temp_input = get_unique_filepath(file.filename)
-        file.save(temp_input)
+        temp_input = save_upload(file)
 
         if task_id:
             update_progress(task_id, 60, 'processing', 'Compressing...')
@@ -1209,22 +1695,15 @@ def optimize_file(tool):
         # Simple compression using Pillow for images
         from PIL import Image
 
+        stats = None
         if tool == 'compress-pdf':
-            # For PDF, we'll use basic optimization
-            import PyPDF2
-            reader = PyPDF2.PdfReader(temp_input)
-            writer = PyPDF2.PdfWriter()
-
-            for page in reader.pages:
-                writer.add_page(page)
-
-            output_path = os.path.join(TMP, f'compressed_{uuid.uuid4()}.pdf')
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
+            output_path = request.workspace.file(f'compressed_{uuid.uuid4()}.pdf')
+            stats = compress_pdf(temp_input, output_path, profile=profile, linearize=linearize,
+                                 progress=task_progress(task_id))
         else:
             # For images
             img = Image.open(temp_input)
-            output_path = os.path.join(TMP, f'compressed_{uuid.uuid4()}.{tool.split("-")[1]}')
+            output_path = request.workspace.file(f'compressed_{uuid.uuid4()}.{tool.split("-")[1]}')
 
             if tool == 'compress-png':
                 img.save(output_path, 'PNG', optimize=True, compress_level=9)
@@ -1235,18 +1714,11 @@ def optimize_file(tool):
             update_progress(task_id, 100, 'complete', 'Compression complete')
 
         response = send_file(output_path, as_attachment=True)
+        if stats:
+            response.headers['X-Original-Size'] = str(stats['original_size'])
+            response.headers['X-Compressed-Size'] = str(stats['compressed_size'])
 
-        @response.call_on_close
-        def cleanup():
-            threading.Thread(target=cleanup_progress, args=(task_id,)).start()
-            try:
-                if os.path.exists(temp_input):
-                    os.remove(temp_input)
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-            except Exception as e:
-                print(f"Error during cleanup: {e}")
-
+        response.call_on_close(lambda: cleanup_progress(task_id))
         return response
 
     except Exception as e:
@@ -1265,127 +1737,23 @@ def youtube_download():
         return jsonify({'error': 'URL is required'}), 400
 
     try:
-        if task_id:
-            download_progress[task_id] = {'progress': 0, 'status': 'starting', 'message': 'Initializing download...'}
+        output_path = request.workspace.file(f'yt_{uuid.uuid4().hex}')
 
-        output_path = os.path.join(TMP, f'yt_{uuid.uuid4().hex}')
+        if wants_async():
+            return queue_job('youtube.download', {'url': url, 'output_path': output_path, 'format_type': format_type},
+                             task_id=task_id)
 
-        def progress_hook(d):
-            if task_id and d['status'] == 'downloading':
-                try:
-                    percent = d.get('_percent_str', '0%').strip().replace('%', '')
-                    progress = float(percent)
-                    download_progress[task_id] = {'progress': progress, 'status': 'downloading', 'message': f'Downloading... {int(progress)}%'}
-                except Exception as e:
-                    print(f"Error in progress hook: {e}")
-                    download_progress[task_id] = {'progress': 0, 'status': 'error', 'message': f'Progress tracking failed: {str(e)}'}
-            elif task_id and d['status'] == 'finished':
-                download_progress[task_id] = {'progress': 95, 'status': 'processing', 'message': 'Processing...'}
-
-        base_opts = {
-            'format': 'bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best',
-            'outtmpl': output_path,
-            'merge_output_format': 'mp4',
-            'concurrent_fragment_downloads': 8,
-            'http_chunk_size': 10485760,
-            'retries': 10,
-            'fragment_retries': 10,
-            'progress_hooks': [progress_hook] if task_id else [],
-            'quiet': True,
-            'no_warnings': True,
-            'sleep_interval': 2,
-            'max_sleep_interval': 5
-        }
-        client_profiles = [
-            {
-                'http_headers': {
-                    'User-Agent': 'com.google.android.youtube/18.17.36 (Linux; U; Android 13; en_US) gzip',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'X-YouTube-Client-Name': '3',
-                    'X-YouTube-Client-Version': '18.17.36',
-                },
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['android'],
-                        'skip': ['dash', 'configs']
-                    }
-                }
-            },
-            {
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                },
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['web']
-                    }
-                }
-            },
-            {
-                'http_headers': {
-                    'User-Agent': 'YouTube/18.15.1 CFNetwork/1240.0.4 Darwin/20.6.0',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'X-YouTube-Client-Name': '5',
-                    'X-YouTube-Client-Version': '18.15.1',
-                },
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['ios'],
-                        'skip': ['dash', 'configs']
-                    }
-                }
-            }
-        ]
-
-        info = None
-        last_error = None
-
-        for profile in client_profiles:
-            try:
-                ydl_opts = {**base_opts, 'http_headers': profile['http_headers'], 'extractor_args': profile['extractor_args']}
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=True)
-                break
-            except yt_dlp.utils.DownloadError as profile_error:
-                last_error = profile_error
-                error_message = str(profile_error).lower()
-                if 'sign in to confirm you' not in error_message and 'please sign in' not in error_message:
-                    break
-
-        if info is None and last_error:
-            raise last_error
-
-        title = info.get('title', 'download')
-
-        safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).strip()
-        safe_title = safe_title[:50] if len(safe_title) > 50 else safe_title
+        if task_id:
+            set_download_progress(task_id, 0, 'starting', 'Initializing download...')
 
-        if format_type == 'mp3':
-            filename = f"{safe_title}.mp3"
-            final_path = output_path + '.mp3'
-        else:
-            filename = f"{safe_title}.mp4"
-            final_path = output_path + '.mp4'
-
-        # Try to find the actual downloaded file
-        actual_file_found = False
-        for ext in ['.mp4', '.mkv', '.webm', '.mp3', '.m4a']:  # Add common video/audio extensions
-            potential_path = f"{output_path}{ext}"
-            if os.path.exists(potential_path):
-                final_path = potential_path
-                actual_file_found = True
-                break
+        def report(progress, status, message):
+            if task_id:
+                set_download_progress(task_id, progress, status, message)
 
-        if not actual_file_found:
-            # Fallback if the exact extension wasn't found but download should be complete
-            if os.path.exists(output_path):
-                final_path = output_path
-            else:
-                raise Exception("Output file not found after download.")
+        final_path, filename = download_youtube(url, output_path, format_type, progress=report)
 
         if task_id:
-            download_progress[task_id] = {'progress': 100, 'status': 'complete', 'message': 'Download complete'}
+            set_download_progress(task_id, 100, 'complete', 'Download complete')
 
         response = send_file(
             final_path,
@@ -1396,45 +1764,51 @@ def youtube_download():
 
         response.headers['X-Task-ID'] = task_id  # Add task_id to response headers for client-side tracking
 
-        @response.call_on_close
-        def cleanup():
-            if task_id:
-                threading.Thread(target=cleanup_progress, args=(task_id,)).start()
-            try:
-                if os.path.exists(final_path):
-                    os.remove(final_path)
-                # Clean up other potential temporary files
-                for ext in ['.part', '.ytdl', '.mp4', '.mkv', '.webm', '.mp3', '.m4a']:
-                    temp_file = f"{output_path}{ext}"
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
-            except Exception as e:
-                print(f"Error during cleanup: {e}")
-
+        response.call_on_close(lambda: cleanup_progress(task_id))
         return response
 
     except yt_dlp.utils.DownloadError as e:
         if task_id:
-            download_progress[task_id] = {'progress': 0, 'status': 'error', 'message': f'yt-dlp error: {str(e)}'}
+            set_download_progress(task_id, 0, 'error', f'yt-dlp error: {str(e)}')
         return jsonify({'error': f'Download failed: {str(e)}'}), 400
     except Exception as e:
         if task_id:
-            download_progress[task_id] = {'progress': 0, 'status': 'error', 'message': str(e)}
+            set_download_progress(task_id, 0, 'error', str(e))
         return jsonify({'error': str(e)}), 500
 
 
+def warm_libreoffice():
+    try:
+        get_lo_pool().warm()
+    except Exception as e:
+        print(f"LibreOffice pool warm-up error: {e}")
+
+workspace_janitor.start()
+
+if os.environ.get('LO_POOL_PREWARM', 'false').lower() == 'true':
+    threading.Thread(target=warm_libreoffice, daemon=True).start()
+
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({'status': 'healthy', 'service': 'converter-api'}), 200
 
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        'pid': os.getpid(),
+        'sse_connections': sse_connections.stats(),
+        'result_cache': get_result_cache().stats(),
+        'workspace': workspace_janitor.stats(),
+        'db_pool': db_pool_stats(),
+        'url_metadata': url_metadata_stats(),
+        'passwords': hasher_stats()
+    })
+
 @app.route('/ready', methods=['GET'])
 def ready():
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute('SELECT 1')
-        cur.close()
-        conn.close()
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute('SELECT 1')
         return jsonify({'status': 'ready', 'database': 'connected'}), 200
     except Exception as e:
         return jsonify({'status': 'not ready', 'error': str(e)}), 503
@@ -1451,6 +1825,47 @@ def serve_spa(path):
         response.headers['Expires'] = '0'
         return response
 
+@app.cli.command('migrate-history-blobs')
+@click.option('--batch-size', default=20, show_default=True, help='Rows moved per transaction')
+def migrate_history_blobs(batch_size):
+    """Move inline base64 history files out of Postgres into the blob store."""
+    store = get_blob_store()
+    moved = total_bytes = 0
+    last_id = 0
+    while True:
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, file_url FROM download_history WHERE id > %s AND blob_key IS NULL "
+                "AND file_url LIKE 'data:%%' ORDER BY id LIMIT %s",
+                (last_id, batch_size)
+            )
+            rows = cur.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                mime_type, data = decode_data_url(row['file_url'])
+                blob_key, size = store.put_bytes(data)
+                cur.execute(
+                    'UPDATE download_history SET blob_key = %s, size = %s, mime_type = COALESCE(mime_type, %s), file_url = NULL WHERE id = %s',
+                    (blob_key, size, mime_type, row['id'])
+                )
+                moved += 1
+                total_bytes += size
+            conn.commit()
+            last_id = rows[-1]['id']
+        click.echo(f'Moved {moved} files ({total_bytes} bytes)...')
+    click.echo(f'Done: {moved} files, {total_bytes} bytes moved to the blob store.')
+
+@app.cli.command('gc-blobs')
+@click.option('--min-age', default=3600, show_default=True, help='Only delete blobs older than this many seconds')
+def gc_blobs(min_age):
+    """Delete blobs no history row refers to any more."""
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute('SELECT DISTINCT blob_key FROM download_history WHERE blob_key IS NOT NULL')
+        referenced = {row['blob_key'] for row in cur.fetchall()}
+    deleted, freed = collect_garbage(referenced, min_age=min_age)
+    click.echo(f'Deleted {deleted} blobs ({freed} bytes).')
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8000))
     app.run(host='0.0.0.0', port=port, debug=True)
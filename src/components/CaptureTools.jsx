@@ -56,7 +56,7 @@ export default function CaptureTools() {
           if (data.progress !== undefined) {
             setProgress(data.progress)
           }
-          if (data.status === 'complete' || data.status === 'error') {
+          if (['complete', 'error', 'cancelled', 'expired'].includes(data.status)) {
             eventSource?.close()
           }
         } catch (e) {
@@ -124,7 +124,7 @@ export default function CaptureTools() {
           if (data.progress !== undefined) {
             setProgress(data.progress)
           }
-          if (data.status === 'complete' || data.status === 'error') {
+          if (['complete', 'error', 'cancelled', 'expired'].includes(data.status)) {
             eventSource?.close()
           }
         } catch (e) {
@@ -24,10 +24,12 @@ export default function CitationGenerator() {
   const [formData, setFormData] = useState({})
   const [citations, setCitations] = useState([])
   const [savedCitations, setSavedCitations] = useState([])
+  const [citationsCursor, setCitationsCursor] = useState(null)
   const [copied, setCopied] = useState(null)
   const [isFetching, setIsFetching] = useState(false)
   const [user, setUser] = useState(null)
   const [selectedCitations, setSelectedCitations] = useState([])
+  const [exportFormat, setExportFormat] = useState('txt')
   const [editingCitation, setEditingCitation] = useState(null)
 
   useEffect(() => {
@@ -46,10 +48,15 @@ export default function CitationGenerator() {
     }
   }
 
-  const loadSavedCitations = async () => {
+  const loadSavedCitations = async (cursor = null) => {
     try {
-      const response = await axios.get(`${API_URL}/citations`, { withCredentials: true })
-      setSavedCitations(response.data.citations)
+      const response = await axios.get(`${API_URL}/citations`, {
+        params: cursor ? { cursor } : {},
+        withCredentials: true
+      })
+      const page = response.data.citations || []
+      setSavedCitations(prev => cursor ? [...prev, ...page] : page)
+      setCitationsCursor(response.data.next_cursor || null)
     } catch (error) {
       console.error('Error loading citations:', error)
     }
@@ -575,6 +582,42 @@ export default function CitationGenerator() {
     }
   }
 
+  const saveAllCitations = async () => {
+    if (!user || citations.length === 0) return
+
+    try {
+      const response = await axios.post(`${API_URL}/citations/bulk`, {
+        citations: citations.map(c => ({
+          source_type: c.sourceType,
+          citation_style: c.citationStyle,
+          metadata: c.formData,
+          formatted_citation: c.formatted
+        }))
+      }, { withCredentials: true })
+
+      toast.success(`${response.data.citation_ids.length} citations saved to your account!`)
+      loadSavedCitations()
+    } catch (error) {
+      toast.error('Failed to save citations: ' + (error.response?.data?.error || error.message))
+    }
+  }
+
+  const deleteSelectedCitations = async () => {
+    if (selectedCitations.length === 0) return
+
+    try {
+      const response = await axios.delete(`${API_URL}/citations/bulk`, {
+        data: { citation_ids: selectedCitations },
+        withCredentials: true
+      })
+      toast.success(`${response.data.deleted} citations deleted!`)
+      setSelectedCitations([])
+      loadSavedCitations()
+    } catch (error) {
+      toast.error('Failed to delete citations')
+    }
+  }
+
   const deleteSavedCitation = async (citationId) => {
     try {
       await axios.delete(`${API_URL}/citations/${citationId}`, { withCredentials: true })
@@ -607,7 +650,7 @@ export default function CitationGenerator() {
     try {
       const response = await axios.post(`${API_URL}/citations/export`, {
         citation_ids: selectedCitations,
-        format: 'txt'
+        format: exportFormat
       }, { 
         withCredentials: true,
         responseType: 'blob'
@@ -616,7 +659,7 @@ export default function CitationGenerator() {
       const url = window.URL.createObjectURL(new Blob([response.data]))
       const link = document.createElement('a')
       link.href = url
-      link.setAttribute('download', 'citations.txt')
+      link.setAttribute('download', `citations.${exportFormat}`)
       document.body.appendChild(link)
       link.click()
       link.remove()
@@ -771,12 +814,22 @@ export default function CitationGenerator() {
         <div className="space-y-4">
           <div className="flex items-center justify-between">
             <h3 className="text-lg font-semibold text-gray-800">Current Citations ({citations.length})</h3>
-            <button
-              onClick={copyAllCitations}
-              className="px-4 py-2 bg-blue-600 text-white rounded-lg hover:bg-blue-700 transition-colors text-sm"
-            >
-              Copy All
-            </button>
+            <div className="flex items-center gap-2">
+              {user && (
+                <button
+                  onClick={saveAllCitations}
+                  className="px-4 py-2 bg-green-600 text-white rounded-lg hover:bg-green-700 transition-colors text-sm"
+                >
+                  Save All
+                </button>
+              )}
+              <button
+                onClick={copyAllCitations}
+                className="px-4 py-2 bg-blue-600 text-white rounded-lg hover:bg-blue-700 transition-colors text-sm"
+              >
+                Copy All
+              </button>
+            </div>
           </div>
 
           {citations.map((citation) => (
@@ -845,13 +898,31 @@ export default function CitationGenerator() {
           <div className="flex items-center justify-between">
             <h3 className="text-lg font-semibold text-gray-800">Saved Citations ({savedCitations.length})</h3>
             {selectedCitations.length > 0 && (
-              <button
-                onClick={exportCitations}
-                className="flex items-center gap-2 px-4 py-2 bg-green-600 text-white rounded-lg hover:bg-green-700 transition-colors text-sm"
-              >
-                <ArrowDownTrayIcon className="h-4 w-4" />
-                Export Selected ({selectedCitations.length})
-              </button>
+              <div className="flex items-center gap-2">
+                <select
+                  value={exportFormat}
+                  onChange={(e) => setExportFormat(e.target.value)}
+                  className="px-2 py-2 border border-gray-300 rounded-lg text-sm"
+                >
+                  <option value="txt">Text</option>
+                  <option value="bib">BibTeX</option>
+                  <option value="ris">RIS</option>
+                </select>
+                <button
+                  onClick={exportCitations}
+                  className="flex items-center gap-2 px-4 py-2 bg-green-600 text-white rounded-lg hover:bg-green-700 transition-colors text-sm"
+                >
+                  <ArrowDownTrayIcon className="h-4 w-4" />
+                  Export Selected ({selectedCitations.length})
+                </button>
+                <button
+                  onClick={deleteSelectedCitations}
+                  className="flex items-center gap-2 px-4 py-2 bg-red-600 text-white rounded-lg hover:bg-red-700 transition-colors text-sm"
+                >
+                  <TrashIcon className="h-4 w-4" />
+                  Delete Selected
+                </button>
+              </div>
             )}
           </div>
 
@@ -915,6 +986,15 @@ export default function CitationGenerator() {
               </div>
             </div>
           ))}
+
+          {citationsCursor && (
+            <button
+              onClick={() => loadSavedCitations(citationsCursor)}
+              className="w-full py-2 text-sm text-green-700 hover:bg-green-50 rounded-lg transition-colors"
+            >
+              Load more
+            </button>
+          )}
         </div>
       )}
 
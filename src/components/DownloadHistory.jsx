@@ -7,6 +7,8 @@ const API_URL = '/api'
 
 export default function DownloadHistory({ isOpen, onClose }) {
   const [history, setHistory] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [loading, setLoading] = useState(true)
   const [searchQuery, setSearchQuery] = useState('')
   const [previewItem, setPreviewItem] = useState(null)
@@ -23,6 +25,7 @@ export default function DownloadHistory({ isOpen, onClose }) {
     try {
       const response = await axios.get(`${API_URL}/history`, { withCredentials: true })
       setHistory(response.data.history || [])
+      setNextCursor(response.data.next_cursor || null)
     } catch (error) {
       console.error('Error loading history:', error)
     } finally {
@@ -30,6 +33,22 @@ export default function DownloadHistory({ isOpen, onClose }) {
     }
   }
 
+  const loadMore = async () => {
+    setLoadingMore(true)
+    try {
+      const response = await axios.get(`${API_URL}/history`, {
+        params: { cursor: nextCursor },
+        withCredentials: true
+      })
+      setHistory(prev => [...prev, ...(response.data.history || [])])
+      setNextCursor(response.data.next_cursor || null)
+    } catch (error) {
+      console.error('Error loading history:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleDelete = async (id) => {
     try {
       await axios.delete(`${API_URL}/history/${id}`, { withCredentials: true })
@@ -157,6 +176,15 @@ export default function DownloadHistory({ isOpen, onClose }) {
                     </div>
                   </div>
                 ))}
+                {nextCursor && (
+                  <button
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    className="w-full py-2 text-sm text-primary-600 hover:bg-primary-50 rounded-lg transition-colors disabled:opacity-50"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                )}
               </div>
             )}
           </div>
@@ -40,7 +40,7 @@ export default function ImageTools() {
       eventSource.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data)
-          if (data.status === 'complete' || data.status === 'error') {
+          if (['complete', 'error', 'cancelled', 'expired'].includes(data.status)) {
             eventSource?.close()
           }
         } catch (e) {
@@ -66,7 +66,7 @@ export default function MergeTools() {
           if (data.progress !== undefined) {
             setProgress(data.progress)
           }
-          if (data.status === 'complete' || data.status === 'error') {
+          if (['complete', 'error', 'cancelled', 'expired'].includes(data.status)) {
             eventSource?.close()
           }
         } catch (e) {
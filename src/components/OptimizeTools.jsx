@@ -13,6 +13,7 @@ export default function OptimizeTools() {
   const [loading, setLoading] = useState(false)
   const [progress, setProgress] = useState(0)
   const [lang, setLang] = useState('eng')
+  const [pdfProfile, setPdfProfile] = useState('ebook')
   const [downloadUrl, setDownloadUrl] = useState(null)
   const [convertedBlob, setConvertedBlob] = useState(null)
   const [outputFilename, setOutputFilename] = useState('')
@@ -76,6 +77,9 @@ export default function OptimizeTools() {
     if (tool.includes('ocr')) {
       formData.append('lang', lang)
     }
+    if (tool === 'compress-pdf') {
+      formData.append('profile', pdfProfile)
+    }
 
     try {
       // Start listening to progress updates
@@ -87,7 +91,7 @@ export default function OptimizeTools() {
           if (data.progress !== undefined) {
             setProgress(data.progress)
           }
-          if (data.status === 'complete' || data.status === 'error') {
+          if (['complete', 'error', 'cancelled', 'expired'].includes(data.status)) {
             eventSource?.close()
           }
         } catch (e) {
@@ -119,6 +123,12 @@ export default function OptimizeTools() {
         setOutputFilename('extracted_text.txt')
         setDownloadUrl(window.URL.createObjectURL(blob))
       } else {
+        const originalSize = Number(response.headers['x-original-size'])
+        const compressedSize = Number(response.headers['x-compressed-size'])
+        if (originalSize && compressedSize) {
+          const saved = Math.round((1 - compressedSize / originalSize) * 100)
+          toast.success(saved > 0 ? `Reduced by ${saved}%` : 'File was already well compressed')
+        }
         setConvertedBlob(response.data)
         const ext = file.name.split('.').pop()
         setOutputFilename(`compressed.${ext}`)
@@ -165,6 +175,20 @@ export default function OptimizeTools() {
               <span>{currentTool.info}</span>
             </div>
           )}
+          {tool === 'compress-pdf' && (
+            <div className="mt-4">
+              <CustomDropdown
+                value={pdfProfile}
+                onChange={setPdfProfile}
+                options={[
+                  { value: 'screen', label: 'Smallest (72 dpi images)' },
+                  { value: 'ebook', label: 'Balanced (150 dpi images)' },
+                  { value: 'printer', label: 'High quality (300 dpi images)' },
+                ]}
+                label="Compression Level"
+              />
+            </div>
+          )}
           {tool.includes('ocr') && (
             <div className="mt-4">
               <CustomDropdown
@@ -43,7 +43,7 @@ export default function QRTools() {
       eventSource.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data)
-          if (data.status === 'complete' || data.status === 'error') {
+          if (['complete', 'error', 'cancelled', 'expired'].includes(data.status)) {
             eventSource?.close()
           }
         } catch (e) {
@@ -104,7 +104,7 @@ export default function QRTools() {
       eventSource.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data)
-          if (data.status === 'complete' || data.status === 'error') {
+          if (['complete', 'error', 'cancelled', 'expired'].includes(data.status)) {
             eventSource?.close()
           }
         } catch (e) {
@@ -82,7 +82,7 @@ export default function UniversalConverter() {
             // Optionally show status messages
             console.log(data.message)
           }
-          if (data.status === 'complete' || data.status === 'error') {
+          if (['complete', 'error', 'cancelled', 'expired'].includes(data.status)) {
             eventSource?.close()
           }
         } catch (e) {
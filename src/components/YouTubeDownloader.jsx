@@ -42,7 +42,7 @@ export default function YouTubeDownloader() {
           if (data.progress !== undefined) {
             setProgress(data.progress)
           }
-          if (data.status === 'complete' || data.status === 'error') {
+          if (['complete', 'error', 'cancelled', 'expired'].includes(data.status)) {
             eventSource?.close()
           }
         } catch (e) {
@@ -0,0 +1,168 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from utils import url_metadata
+from utils.url_metadata import HeadParser, MetadataFetcher, read_head
+
+PAGE = '''<!doctype html>
+<html><head>
+<title> Plain title </title>
+<meta property="og:title" content="Open Graph title">
+<meta name="author" content="Ada Lovelace">
+<meta property="article:published_time" content="2021-03-04T10:00:00Z">
+</head>
+<body><meta name="author" content="Not in the head">{filler}</body></html>'''
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves server.pages[path] as (status, headers, body) and records every
+    request as (path, headers, client port) in server.log."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.log.append((self.path, dict(self.headers), self.client_address[1]))
+        status, headers, body = self.server.pages.get(self.path, (404, {}, ''))
+        etag = headers.get('ETag')
+        if etag and self.headers.get('If-None-Match') == etag:
+            status, body = 304, ''
+        modified = headers.get('Last-Modified')
+        if modified and self.headers.get('If-Modified-Since') == modified:
+            status, body = 304, ''
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class MetadataFetcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+        self.server.pages = {}
+        self.server.log = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        self.clock = Clock()
+        patcher = mock.patch.object(url_metadata, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fetcher = MetadataFetcher(workers=4)
+        self.addCleanup(self.fetcher.session.close)
+
+    def page(self, path, headers=None, filler=''):
+        self.server.pages[path] = (200, headers or {}, PAGE.format(filler=filler))
+
+    def requests_for(self, path):
+        return [headers for logged, headers, _ in self.server.log if logged == path]
+
+    def test_head_parser_prefers_meta_and_stops_at_head(self):
+        parser = HeadParser()
+        parser.feed(PAGE.format(filler=''))
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.title, 'Plain title')
+        self.assertEqual(parser.first(url_metadata.TITLE_KEYS), 'Open Graph title')
+        self.assertEqual(parser.first(url_metadata.AUTHOR_KEYS), 'Ada Lovelace')
+
+    def test_read_head_leaves_the_body_unread(self):
+        self.page('/long', filler='x' * 200000)
+        with self.fetcher.session.get(self.base + '/long', stream=True) as response:
+            parser = read_head(response)
+            self.assertEqual(parser.title, 'Plain title')
+            self.assertFalse(response.raw.isclosed())
+            self.assertLess(response.raw.tell(), 200000)
+
+    def test_fetch_extracts_metadata(self):
+        self.page('/a')
+        metadata = self.fetcher.fetch(self.base + '/a')
+        self.assertEqual(metadata['url'], self.base + '/a')
+        self.assertEqual(metadata['title'], 'Open Graph title')
+        self.assertEqual(metadata['author'], 'Ada Lovelace')
+        self.assertEqual(metadata['publishDate'], '2021-03-04')
+        self.assertIn('accessDate', metadata)
+
+    def test_fresh_entries_are_served_from_cache(self):
+        self.page('/a')
+        self.fetcher.fetch(self.base + '/a')
+        self.clock.now += url_metadata.URL_METADATA_TTL - 1
+        self.fetcher.fetch(self.base + '/a')
+        self.assertEqual(len(self.requests_for('/a')), 1)
+        self.assertEqual(self.fetcher.cache.stats()['hits'], 1)
+
+    def test_expired_entry_is_revalidated_with_etag(self):
+        self.page('/a', {'ETag': '"v1"'})
+        first = self.fetcher.fetch(self.base + '/a')
+        self.clock.now += url_metadata.URL_METADATA_TTL + 1
+        second = self.fetcher.fetch(self.base + '/a')
+        sent = self.requests_for('/a')
+        self.assertEqual(len(sent), 2)
+        self.assertEqual(sent[1].get('If-None-Match'), '"v1"')
+        self.assertEqual(second, first)
+        self.assertEqual(self.fetcher.cache.stats()['revalidated'], 1)
+        # A 304 renews the entry
+        self.fetcher.fetch(self.base + '/a')
+        self.assertEqual(len(self.requests_for('/a')), 2)
+
+    def test_expired_entry_is_revalidated_with_last_modified(self):
+        stamp = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        self.page('/a', {'Last-Modified': stamp})
+        self.fetcher.fetch(self.base + '/a')
+        self.clock.now += url_metadata.URL_METADATA_TTL + 1
+        self.fetcher.fetch(self.base + '/a')
+        sent = self.requests_for('/a')
+        self.assertEqual(sent[1].get('If-Modified-Since'), stamp)
+        self.assertNotIn('If-None-Match', sent[1])
+        self.assertEqual(self.fetcher.cache.stats()['revalidated'], 1)
+
+    def test_changed_page_replaces_expired_entry(self):
+        self.page('/a', {'ETag': '"v1"'})
+        self.fetcher.fetch(self.base + '/a')
+        self.server.pages['/a'] = (200, {'ETag': '"v2"'}, '<head><title>New</title></head>')
+        self.clock.now += url_metadata.URL_METADATA_TTL + 1
+        self.assertEqual(self.fetcher.fetch(self.base + '/a')['title'], 'New')
+        self.assertEqual(self.fetcher.cache.stats()['misses'], 2)
+
+    def test_connections_are_reused(self):
+        self.page('/a', filler='x' * 20000)
+        self.page('/b', filler='x' * 20000)
+        self.fetcher.fetch(self.base + '/a')
+        self.fetcher.fetch(self.base + '/b')
+        ports = {port for _, _, port in self.server.log}
+        self.assertEqual(len(ports), 1)
+
+    def test_fetch_many_keeps_order_and_reports_errors(self):
+        self.page('/a')
+        self.page('/b')
+        urls = [self.base + '/b', 'not a url', self.base + '/a', self.base + '/missing', self.base + '/b']
+        results = self.fetcher.fetch_many(urls)
+        self.assertEqual([r['url'] for r in results], urls)
+        self.assertEqual(results[0]['metadata']['url'], self.base + '/b')
+        self.assertIn('error', results[1])
+        self.assertEqual(results[2]['metadata']['title'], 'Open Graph title')
+        self.assertTrue(results[3]['error'].startswith('Failed to fetch URL'))
+        self.assertEqual(results[4]['metadata'], results[0]['metadata'])
+        # Duplicates are fetched once
+        self.assertEqual(len(self.requests_for('/b')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
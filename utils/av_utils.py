@@ -1,36 +1,413 @@
-import os, subprocess, shutil, tempfile
+import os, json, time, sqlite3, subprocess, shutil, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.result_cache import CACHE_DIR
+from utils.ffmpeg_runner import FFmpegTask
+
+# Threads per ffmpeg process; 0 lets ffmpeg decide
+FFMPEG_THREADS = int(os.getenv('FFMPEG_THREADS', '0'))
+# Videos at least this long (seconds) are split and encoded in parallel
+FFMPEG_PARALLEL_MIN_DURATION = float(os.getenv('FFMPEG_PARALLEL_MIN_DURATION', '120'))
+FFMPEG_SEGMENT_SECONDS = float(os.getenv('FFMPEG_SEGMENT_SECONDS', '30'))
+FFMPEG_SEGMENT_WORKERS = int(os.getenv('FFMPEG_SEGMENT_WORKERS', str(os.cpu_count() or 1)))
+PROBE_CACHE_ENTRIES = int(os.getenv('PROBE_CACHE_ENTRIES', '10000'))
+GIF_COLORS = 256
+GIF_MAX_ATTEMPTS = 5
+WEBP_QUALITY = 75
+
+# preset -> settings per encoder family; x264 CRF ~23 is visually transparent for most
+# sources, VP9 needs a higher CRF for similar quality
+VIDEO_PRESETS = {
+    'fast': {'x264': ('veryfast', 23), 'vp9': (5, 34), 'mpeg4': 4, 'audio_bitrate': '192k'},
+    'balanced': {'x264': ('medium', 23), 'vp9': (3, 32), 'mpeg4': 3, 'audio_bitrate': '160k'},
+    'small': {'x264': ('slow', 28), 'vp9': (2, 38), 'mpeg4': 6, 'audio_bitrate': '96k'},
+}
+AUDIO_PRESET_BITRATES = {'fast': '192k', 'balanced': '192k', 'small': '96k'}
+DEFAULT_PRESET = 'balanced'
+
+# output extension -> (video encoder family, audio encoder)
+VIDEO_CODECS = {
+    'mp4': ('x264', 'aac'), 'm4v': ('x264', 'aac'), 'mov': ('x264', 'aac'), 'mkv': ('x264', 'aac'),
+    'ts': ('x264', 'aac'), 'm2ts': ('x264', 'aac'), 'mts': ('x264', 'aac'), 'flv': ('x264', 'aac'),
+    '3gp': ('x264', 'aac'), '3g2': ('x264', 'aac'),
+    'webm': ('vp9', 'libopus'),
+    'avi': ('mpeg4', 'libmp3lame'),
+}
+AUDIO_CODECS = {
+    'mp3': 'libmp3lame', 'aac': 'aac', 'm4a': 'aac', 'm4b': 'aac',
+    'ogg': 'libvorbis', 'oga': 'libvorbis', 'opus': 'libopus', 'weba': 'libopus',
+}
+LOSSLESS_AUDIO = {'wav', 'flac', 'aif', 'aiff', 'aifc', 'au', 'caf'}
+# Encoder families whose chunks can be joined by the concat demuxer without re-encoding
+SEGMENTABLE = {'x264', 'vp9'}
+
+# output extension -> (video codecs, audio codecs) it can hold as-is; None means any.
+# Inputs already in these codecs are remuxed with -c copy instead of re-encoded.
+MP4_VIDEO = {'h264', 'hevc', 'av1', 'mpeg4'}
+MP4_AUDIO = {'aac', 'mp3', 'ac3', 'eac3', 'alac'}
+COPY_COMPATIBLE = {
+    'mp4': (MP4_VIDEO, MP4_AUDIO), 'm4v': (MP4_VIDEO, MP4_AUDIO),
+    'mov': (MP4_VIDEO | {'prores', 'mjpeg'}, MP4_AUDIO | {'pcm_s16le', 'pcm_s24le'}),
+    '3gp': ({'h264', 'mpeg4', 'h263'}, {'aac', 'amr_nb', 'amr_wb'}),
+    'mkv': (None, None),
+    'webm': ({'vp8', 'vp9', 'av1'}, {'opus', 'vorbis'}),
+    'ts': ({'h264', 'hevc', 'mpeg2video'}, {'aac', 'mp3', 'ac3', 'mp2'}),
+    'm2ts': ({'h264', 'hevc', 'mpeg2video'}, {'aac', 'ac3', 'eac3', 'mp2'}),
+    'mts': ({'h264', 'hevc', 'mpeg2video'}, {'aac', 'ac3', 'eac3', 'mp2'}),
+    'flv': ({'h264'}, {'aac', 'mp3'}),
+    'avi': ({'mpeg4', 'h264', 'mjpeg'}, {'mp3', 'ac3', 'pcm_s16le'}),
+    # audio-only targets
+    'aac': (set(), {'aac'}), 'm4a': (set(), {'aac', 'alac'}), 'm4b': (set(), {'aac'}),
+    'mp3': (set(), {'mp3'}), 'ogg': (set(), {'vorbis', 'opus', 'flac'}), 'oga': (set(), {'vorbis', 'opus', 'flac'}),
+    'opus': (set(), {'opus'}), 'weba': (set(), {'opus', 'vorbis'}), 'flac': (set(), {'flac'}),
+    'wav': (set(), {'pcm_s16le', 'pcm_s24le', 'pcm_f32le'}),
+}
 
 def which(name):
     return shutil.which(name)
 
-def convert_audio(in_path, out_path, bitrate='192k'):
+def _require_ffmpeg():
     if not which('ffmpeg'):
         raise RuntimeError('ffmpeg not found. brew install ffmpeg')
-    cmd = ['ffmpeg','-y','-i',in_path,'-vn','-ab',bitrate,out_path]
-    cp = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+def _ext(path):
+    return os.path.splitext(path)[1].lstrip('.').lower()
+
+def _preset(name):
+    if name not in VIDEO_PRESETS:
+        raise RuntimeError(f"Unknown preset '{name}'. Choose from: {', '.join(VIDEO_PRESETS)}")
+    return VIDEO_PRESETS[name]
+
+class ProbeCache:
+    """ffprobe results keyed by input hash, in a SQLite file beside the result
+    cache so web and job worker processes share it."""
+
+    def __init__(self, directory=CACHE_DIR, max_entries=PROBE_CACHE_ENTRIES):
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, 'probes.sqlite3')
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._conn().execute(
+            'CREATE TABLE IF NOT EXISTS probes (key TEXT PRIMARY KEY, info TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute('SELECT info FROM probes WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, info):
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO probes (key, info, created_at) VALUES (?, ?, ?)',
+                     (key, json.dumps(info), time.time()))
+        conn.execute('DELETE FROM probes WHERE key IN (SELECT key FROM probes ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                     (self.max_entries,))
+
+_probe_cache = None
+_probe_cache_lock = threading.Lock()
+
+def get_probe_cache():
+    global _probe_cache
+    with _probe_cache_lock:
+        if _probe_cache is None:
+            _probe_cache = ProbeCache()
+        return _probe_cache
+
+def probe(in_path, input_hash=None):
+    """ffprobe's format and stream information for a file, cached by input_hash
+    (or by path, size and mtime when no hash is known)."""
+    if not which('ffprobe'):
+        raise RuntimeError('ffprobe not found. brew install ffmpeg')
+    if input_hash:
+        key = input_hash
+    else:
+        st = os.stat(in_path)
+        key = f'{os.path.realpath(in_path)}:{st.st_size}:{st.st_mtime_ns}'
+    cache = get_probe_cache()
+    info = cache.get(key)
+    if info is not None:
+        return info
+
+    cp = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_format', '-show_streams', '-of', 'json', in_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
     if cp.returncode != 0:
-        raise RuntimeError(f"ffmpeg error:\nSTDOUT:\n{cp.stdout}\nSTDERR:\n{cp.stderr}")
+        raise RuntimeError(f"ffprobe error:\n{cp.stderr}")
+    info = json.loads(cp.stdout or '{}')
+    cache.put(key, info)
+    return info
+
+def first_stream(info, kind):
+    for stream in info.get('streams', []):
+        # Cover art shows up as a video stream; it is not the video
+        if stream.get('codec_type') == kind and not stream.get('disposition', {}).get('attached_pic'):
+            return stream
+    return None
+
+def stream_plan(info, out_ext):
+    """('copy' | 'encode' | None, same for audio): None when the input has no
+    such stream, 'copy' when its codec can go into out_ext unchanged."""
+    video_ok, audio_ok = COPY_COMPATIBLE.get(out_ext, (set(), set()))
+    plan = []
+    for kind, allowed in (('video', video_ok), ('audio', audio_ok)):
+        stream = first_stream(info, kind)
+        if stream is None:
+            plan.append(None)
+        elif allowed is None or stream.get('codec_name') in allowed:
+            plan.append('copy')
+        else:
+            plan.append('encode')
+    return tuple(plan)
+
+def copy_args(stream, out_ext):
+    args = ['-c:v', 'copy']
+    # Apple players only recognise HEVC in MP4/MOV with the hvc1 tag
+    if stream and stream.get('codec_name') == 'hevc' and out_ext in ('mp4', 'm4v', 'mov'):
+        args += ['-tag:v', 'hvc1']
+    return args
+
+def media_duration(info):
+    try:
+        return float(info.get('format', {}).get('duration') or 0)
+    except ValueError:
+        return 0.0
+
+def video_args(family, preset, threads=FFMPEG_THREADS):
+    """Encoder arguments for the video stream; empty for containers we leave to ffmpeg."""
+    settings = _preset(preset)
+    if family == 'x264':
+        speed, crf = settings['x264']
+        args = ['-c:v', 'libx264', '-preset', speed, '-crf', str(crf), '-pix_fmt', 'yuv420p']
+    elif family == 'vp9':
+        cpu_used, crf = settings['vp9']
+        args = ['-c:v', 'libvpx-vp9', '-crf', str(crf), '-b:v', '0', '-cpu-used', str(cpu_used),
+                '-row-mt', '1', '-deadline', 'good']
+    elif family == 'mpeg4':
+        args = ['-c:v', 'mpeg4', '-q:v', str(settings['mpeg4'])]
+    else:
+        args = []
+    return args + ['-threads', str(threads)]
+
+def audio_args(encoder, bitrate):
+    if encoder is None:
+        return []
+    return ['-c:a', encoder, '-b:a', bitrate]
+
+def convert_audio(in_path, out_path, bitrate=None, preset=DEFAULT_PRESET, input_hash=None,
+                  progress=None, task_id=None):
+    """Convert to the audio format of out_path's extension. The audio stream is
+    copied as-is when it already fits the target, unless a bitrate or the
+    small preset asks for re-encoding."""
+    _require_ffmpeg()
+    _preset(preset)
+    ext = _ext(out_path)
+    info = probe(in_path, input_hash) if which('ffprobe') else {}
+    cmd = ['ffmpeg','-y','-i',in_path,'-vn','-map','0:a:0?']
+    if not bitrate and preset != 'small' and stream_plan(info, ext)[1] == 'copy':
+        cmd += ['-c:a', 'copy']
+    elif ext not in LOSSLESS_AUDIO:
+        bitrate = bitrate or AUDIO_PRESET_BITRATES[preset]
+        encoder = AUDIO_CODECS.get(ext)
+        cmd += ['-c:a', encoder] if encoder else []
+        cmd += ['-b:a', bitrate]
+    with FFmpegTask(task_id, progress) as task:
+        task.run(cmd + ['-threads', str(FFMPEG_THREADS), out_path], media_duration(info))
     return out_path
 
-def convert_video(in_path, out_path):
-    if not which('ffmpeg'):
-        raise RuntimeError('ffmpeg not found. brew install ffmpeg')
-    cmd = ['ffmpeg','-y','-i',in_path,out_path]
-    cp = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if cp.returncode != 0:
-        raise RuntimeError(f"ffmpeg error:\nSTDOUT:\n{cp.stdout}\nSTDERR:\n{cp.stderr}")
+def convert_video(in_path, out_path, preset=DEFAULT_PRESET, parallel=None, input_hash=None,
+                  progress=None, task_id=None):
+    """Convert to the container of out_path's extension with the named preset.
+
+    Streams whose codec the target already supports are copied rather than
+    re-encoded (a plain remux when both are), except with the small preset,
+    whose point is a smaller file. Long inputs with a segmentable codec are
+    encoded in parallel chunks unless parallel is False.
+    """
+    _require_ffmpeg()
+    settings = _preset(preset)
+    ext = _ext(out_path)
+    family, audio_encoder = VIDEO_CODECS.get(ext, (None, None))
+    if ext in ('gif', 'webp'):
+        return video_to_gif(in_path, out_path, input_hash=input_hash, progress=progress, task_id=task_id)
+
+    with FFmpegTask(task_id, progress) as task:
+        if not which('ffprobe'):
+            cmd = ['ffmpeg','-y','-i',in_path] + video_args(family, preset)
+            cmd += audio_args(audio_encoder, settings['audio_bitrate'])
+            task.run(cmd + _container_args(out_path) + [out_path])
+            return out_path
+
+        info = probe(in_path, input_hash)
+        video, audio = stream_plan(info, ext)
+        if preset == 'small':
+            video = video and 'encode'
+            audio = audio and 'encode'
+
+        if video == 'encode' and parallel is not False and family in SEGMENTABLE and FFMPEG_SEGMENT_WORKERS > 1 \
+                and media_duration(info) >= FFMPEG_PARALLEL_MIN_DURATION:
+            return _convert_segmented(task, in_path, out_path, info, family,
+                                      audio_encoder if audio == 'encode' else None, preset)
+
+        cmd = ['ffmpeg','-y','-i',in_path]
+        if video:
+            cmd += ['-map', '0:v:0']
+            cmd += copy_args(first_stream(info, 'video'), ext) if video == 'copy' else video_args(family, preset)
+        if audio:
+            cmd += ['-map', '0:a:0']
+            cmd += ['-c:a', 'copy'] if audio == 'copy' else audio_args(audio_encoder, settings['audio_bitrate'])
+        cmd += _container_args(out_path) + [out_path]
+        task.run(cmd, media_duration(info), message='Remuxing...' if 'encode' not in (video, audio) else 'Converting...')
     return out_path
 
-def video_to_gif(in_path, out_path, fps=12, scale=None):
-    if not which('ffmpeg'):
-        raise RuntimeError('ffmpeg not found. brew install ffmpeg')
-    filters = [f'fps={fps}']
+def _container_args(out_path):
+    # Put the index first so MP4/MOV outputs can start playing before fully downloaded
+    return ['-movflags', '+faststart'] if _ext(out_path) in ('mp4', 'm4v', 'mov') else []
+
+def _convert_segmented(task, in_path, out_path, info, family, audio_encoder, preset):
+    """Split the video stream at keyframes (stream copy, so cuts land on
+    keyframes), encode the pieces concurrently, then join them with the concat
+    demuxer and mux in the audio, which is encoded once in a single pass so
+    there are no gaps at chunk boundaries (or copied when audio_encoder is None)."""
+    total = media_duration(info)
+    work = tempfile.mkdtemp(prefix='segments_', dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        task.run(['ffmpeg','-y','-i',in_path,'-map','0:v:0','-an','-sn','-c','copy',
+                  '-f','segment','-segment_time',str(FFMPEG_SEGMENT_SECONDS),'-reset_timestamps','1',
+                  os.path.join(work, 'src_%05d.mkv')],
+                 total, span=(0, 5), message='Splitting...')
+        sources = sorted(f for f in os.listdir(work) if f.startswith('src_'))
+        if not sources:
+            raise RuntimeError('ffmpeg produced no segments')
+
+        workers = min(FFMPEG_SEGMENT_WORKERS, len(sources))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        encoded = [os.path.join(work, f'enc_{name[4:]}') for name in sources]
+        # Encoded seconds per chunk, summed against the whole duration
+        done = {}
+
+        def encode(pair):
+            src, dest = pair
+
+            def on_time(seconds):
+                done[src] = seconds
+                task.report(5 + 85 * min(1.0, sum(done.values()) / total), 'Encoding...')
+
+            task.run(['ffmpeg','-y','-i',os.path.join(work, src)] + video_args(family, preset, threads) + [dest],
+                     on_time=on_time)
+
+        # The encoding happens in the ffmpeg processes; threads only wait on them
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(encode, zip(sources, encoded)))
+
+        list_path = os.path.join(work, 'segments.txt')
+        with open(list_path, 'w') as f:
+            for path in encoded:
+                f.write("file '{}'\n".format(path.replace("'", "'\\''")))
+
+        cmd = ['ffmpeg','-y','-f','concat','-safe','0','-i',list_path]
+        if first_stream(info, 'audio'):
+            cmd += ['-i', in_path, '-map', '0:v:0', '-map', '1:a:0']
+            cmd += audio_args(audio_encoder, _preset(preset)['audio_bitrate']) or ['-c:a', 'copy']
+        cmd += ['-c:v', 'copy'] + _container_args(out_path) + [out_path]
+        task.run(cmd, total, span=(90, 100), message='Joining...')
+        return out_path
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+def _gif_filters(fps, scale, factor):
+    filters = [f'fps={fps:g}']
     if scale:
-        w,h = scale
+        w, h = scale
+        w = w if w in (-1, -2) else max(2, int(w * factor))
+        h = h if h in (-1, -2) else max(2, int(h * factor))
         filters.append(f'scale={w}:{h}:flags=lanczos')
-    vf = ','.join(filters)
-    cmd = ['ffmpeg','-y','-i',in_path,'-vf',vf,'-loop','0',out_path]
-    cp = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if cp.returncode != 0:
-        raise RuntimeError(f"ffmpeg error:\nSTDOUT:\n{cp.stdout}\nSTDERR:\n{cp.stderr}")
+    elif factor < 1:
+        filters.append(f'scale=trunc(iw*{factor:.3f}/2)*2:-2:flags=lanczos')
+    return ','.join(filters)
+
+def _trim_args(start, duration):
+    # -ss before -i seeks the input, so the skipped part is never decoded
+    args = ['-ss', str(start)] if start else []
+    return args + (['-t', str(duration)] if duration else [])
+
+def _render_animation(task, in_path, out_path, trim, vf, colors, quality, length, message):
+    if _ext(out_path) == 'webp':
+        task.run(['ffmpeg','-y'] + trim + ['-i',in_path,'-vf',vf,'-an','-c:v','libwebp_anim','-lossless','0',
+                  '-q:v',str(quality),'-compression_level','4','-loop','0','-threads',str(FFMPEG_THREADS),out_path],
+                 length, message=message)
+        return
+    # Two decoding passes rather than split=[a][b]: that would buffer every
+    # frame in memory while palettegen waits for the end of the clip. Ordered
+    # (bayer) dithering is stable between frames, so it compresses better than
+    # error diffusion
+    palette = out_path + '.palette.png'
+    try:
+        task.run(['ffmpeg','-y'] + trim + ['-i',in_path,'-vf',f'{vf},palettegen=max_colors={colors}:stats_mode=diff',
+                  '-threads',str(FFMPEG_THREADS),palette],
+                 length, span=(0, 40), message=message)
+        task.run(['ffmpeg','-y'] + trim + ['-i',in_path,'-i',palette,'-lavfi',
+                  f'{vf}[x];[x][1:v]paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle',
+                  '-loop','0','-threads',str(FFMPEG_THREADS),out_path],
+                 length, span=(40, 100), message=message)
+    finally:
+        if os.path.exists(palette):
+            os.remove(palette)
+
+def video_to_gif(in_path, out_path, fps=12, scale=None, start=None, duration=None, max_bytes=None,
+                 colors=GIF_COLORS, quality=WEBP_QUALITY, input_hash=None, progress=None, task_id=None):
+    """Animated GIF (or animated WebP when out_path ends in .webp) of the clip
+    between start and start + duration seconds.
+
+    GIFs use a palette generated from the clip itself. With max_bytes, the
+    output is re-rendered with fewer colours (or lower WebP quality), a lower
+    frame rate and a smaller size until it fits; after GIF_MAX_ATTEMPTS the
+    smallest attempt is kept, so callers check the size of out_path to tell
+    whether the target was met.
+    """
+    _require_ffmpeg()
+    trim = _trim_args(start, duration)
+    # Length of the clip actually rendered, for progress
+    length = duration
+    if which('ffprobe'):
+        total = media_duration(probe(in_path, input_hash)) - (start or 0)
+        length = min(length, total) if length else total
+    factor = 1.0
+    root, ext = os.path.splitext(out_path)
+    attempt_path = f'{root}.attempt{ext}'
+    best = None
+    with FFmpegTask(task_id, progress) as task:
+        for attempt in range(GIF_MAX_ATTEMPTS if max_bytes else 1):
+            message = 'Rendering...' if attempt == 0 else f'Shrinking to fit (attempt {attempt + 1})...'
+            try:
+                _render_animation(task, in_path, attempt_path, trim, _gif_filters(fps, scale, factor), colors,
+                                  quality, length, message)
+            except BaseException:
+                # A failed or cancelled attempt leaves nothing half-written behind
+                if os.path.exists(attempt_path):
+                    os.remove(attempt_path)
+                raise
+            size = os.path.getsize(attempt_path)
+            # Fewer colours and frames usually but not always make a smaller
+            # file, so only an attempt that beats the best so far replaces it
+            if best is None or size < best:
+                os.replace(attempt_path, out_path)
+                best = size
+            else:
+                os.remove(attempt_path)
+            if not max_bytes or best <= max_bytes:
+                break
+            # Shrink everything a little rather than one knob a lot; colours go first
+            # because they cost the least visible quality
+            colors = max(32, colors // 2)
+            quality = max(20, quality - 15)
+            fps = max(5, fps * 0.8)
+            factor *= max(0.5, min(0.85, (max_bytes / size) ** 0.5))
     return out_path
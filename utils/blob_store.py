@@ -0,0 +1,176 @@
+import io
+import os
+import base64
+import time
+import uuid
+import hashlib
+import threading
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLOB_STORE_BACKEND = os.getenv('BLOB_STORE_BACKEND', 'local').lower()
+BLOB_STORE_DIR = os.getenv('BLOB_STORE_DIR', os.path.join(REPO_ROOT, 'data', 'blobs'))
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobNotFound(KeyError):
+    pass
+
+
+class BlobStore:
+    """Content-addressed blob storage: a blob's key is the SHA-256 of its bytes.
+
+    Backends implement put_stream/open/stat/delete/keys; anything that can
+    stream bytes in and out by key (e.g. an S3-compatible bucket) fits.
+    """
+
+    def put_stream(self, fileobj):
+        """Store everything read from fileobj; returns (key, size)."""
+        raise NotImplementedError
+
+    def open(self, key):
+        """Binary file object for the blob; raises BlobNotFound."""
+        raise NotImplementedError
+
+    def stat(self, key):
+        """(size, mtime) of the blob; raises BlobNotFound."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def keys(self):
+        """Iterate over every stored key."""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Filesystem path of the blob when the backend has one, else None."""
+        return None
+
+    def put_file(self, path):
+        with open(path, 'rb') as f:
+            return self.put_stream(f)
+
+    def put_bytes(self, data):
+        return self.put_stream(io.BytesIO(data))
+
+    def exists(self, key):
+        try:
+            self.stat(key)
+            return True
+        except BlobNotFound:
+            return False
+
+
+def valid_key(key):
+    return isinstance(key, str) and len(key) == 64 and all(c in '0123456789abcdef' for c in key)
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under directory/ab/cd/<key>."""
+
+    def __init__(self, directory=BLOB_STORE_DIR):
+        self.directory = directory
+        self.tmp_dir = os.path.join(directory, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _path(self, key):
+        if not valid_key(key):
+            raise BlobNotFound(key)
+        return os.path.join(self.directory, key[:2], key[2:4], key)
+
+    def put_stream(self, fileobj):
+        h = hashlib.sha256()
+        size = 0
+        tmp = os.path.join(self.tmp_dir, uuid.uuid4().hex)
+        try:
+            with open(tmp, 'wb') as out:
+                for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+                    h.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            key = h.hexdigest()
+            final = self._path(key)
+            if os.path.exists(final):
+                # Same bytes already stored; refresh mtime so gc treats it as new
+                os.utime(final)
+            else:
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                os.replace(tmp, final)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return key, size
+
+    def local_path(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            raise BlobNotFound(key)
+        return path
+
+    def open(self, key):
+        try:
+            return open(self._path(key), 'rb')
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+
+    def stat(self, key):
+        try:
+            st = os.stat(self._path(key))
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+        return st.st_size, st.st_mtime
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except (FileNotFoundError, BlobNotFound):
+            pass
+
+    def keys(self):
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if valid_key(name):
+                    yield name
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Return the configured blob store (BLOB_STORE_BACKEND=local)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if BLOB_STORE_BACKEND != 'local':
+                raise RuntimeError(f'Unknown BLOB_STORE_BACKEND: {BLOB_STORE_BACKEND}')
+            _store = LocalBlobStore()
+        return _store
+
+
+def collect_garbage(referenced, min_age=3600):
+    """Delete blobs not in referenced (a set of keys) and older than min_age
+    seconds; the age guard protects blobs whose row is still being written.
+    Returns (deleted, bytes_freed)."""
+    store = get_blob_store()
+    cutoff = time.time() - min_age
+    deleted = freed = 0
+    for key in list(store.keys()):
+        if key in referenced:
+            continue
+        try:
+            size, mtime = store.stat(key)
+        except BlobNotFound:
+            continue
+        if mtime < cutoff:
+            store.delete(key)
+            deleted += 1
+            freed += size
+    return deleted, freed
+
+
+def decode_data_url(url):
+    """(mime_type, bytes) from a base64 data: URL."""
+    header, _, payload = url.partition(',')
+    mime_type = header[5:].split(';')[0] or 'application/octet-stream'
+    return mime_type, base64.b64decode(payload)
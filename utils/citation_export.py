@@ -0,0 +1,169 @@
+import re
+import json
+
+BIBTEX_TYPES = {
+    'book': 'book',
+    'journal': 'article',
+    'newspaper': 'article',
+    'magazine': 'article',
+    'report': 'techreport',
+    'conference': 'inproceedings',
+}
+
+RIS_TYPES = {
+    'website': 'ELEC',
+    'book': 'BOOK',
+    'journal': 'JOUR',
+    'newspaper': 'NEWS',
+    'magazine': 'MGZN',
+    'video': 'VIDEO',
+    'podcast': 'SOUND',
+    'report': 'RPRT',
+    'thesis': 'THES',
+    'conference': 'CPAPER',
+}
+
+# Metadata field -> BibTeX field; the first present field wins for each target
+BIBTEX_FIELDS = [
+    ('title', 'title'),
+    ('journal', 'journal'),
+    ('newspaper', 'journal'),
+    ('magazine', 'journal'),
+    ('conference', 'booktitle'),
+    ('series', 'series'),
+    ('publisher', 'publisher'),
+    ('organization', 'institution'),
+    ('institution', 'school'),
+    ('city', 'address'),
+    ('location', 'address'),
+    ('edition', 'edition'),
+    ('volume', 'volume'),
+    ('issue', 'number'),
+    ('reportNumber', 'number'),
+    ('episode', 'number'),
+    ('pages', 'pages'),
+    ('doi', 'doi'),
+    ('isbn', 'isbn'),
+    ('url', 'url'),
+    ('accessDate', 'urldate'),
+]
+
+RIS_FIELDS = [
+    ('title', 'TI'),
+    ('journal', 'T2'),
+    ('newspaper', 'T2'),
+    ('magazine', 'T2'),
+    ('conference', 'T2'),
+    ('series', 'T2'),
+    ('platform', 'PB'),
+    ('publisher', 'PB'),
+    ('organization', 'PB'),
+    ('institution', 'PB'),
+    ('city', 'CY'),
+    ('location', 'CY'),
+    ('edition', 'ET'),
+    ('volume', 'VL'),
+    ('issue', 'IS'),
+    ('reportNumber', 'IS'),
+    ('episode', 'IS'),
+    ('degreeType', 'M3'),
+    ('publishDate', 'DA'),
+    ('doi', 'DO'),
+    ('isbn', 'SN'),
+    ('url', 'UR'),
+    ('accessDate', 'Y2'),
+]
+
+BIBTEX_SPECIAL = re.compile(r'([&%$#_])')
+
+
+def _metadata(row):
+    metadata = row.get('metadata') or {}
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return {}
+    return {k: str(v).strip() for k, v in metadata.items() if v not in (None, '') and str(v).strip()}
+
+
+def _authors(metadata):
+    names = metadata.get('author') or metadata.get('host') or ''
+    return [n.strip() for n in re.split(r';|\s+&\s+|\s+and\s+', names) if n.strip()]
+
+
+def _year(metadata):
+    match = re.search(r'\b(\d{4})\b', metadata.get('year') or metadata.get('publishDate') or '')
+    return match.group(1) if match else ''
+
+
+def _pick(metadata, mapping):
+    fields = {}
+    for source, target in mapping:
+        if source in metadata and target not in fields:
+            fields[target] = metadata[source]
+    return fields
+
+
+def _bibtex_escape(value):
+    return BIBTEX_SPECIAL.sub(r'\\\1', value.replace('{', '').replace('}', ''))
+
+
+def to_txt(row):
+    return row['formatted_citation'] + '\n\n'
+
+
+def to_bibtex(row):
+    metadata = _metadata(row)
+    authors = _authors(metadata)
+    year = _year(metadata)
+
+    entry_type = BIBTEX_TYPES.get(row['source_type'], 'misc')
+    if row['source_type'] == 'thesis':
+        entry_type = 'mastersthesis' if 'master' in metadata.get('degreeType', '').lower() else 'phdthesis'
+
+    surname = re.sub(r'[^a-z]', '', authors[0].split(',')[0].split()[-1].lower()) if authors else ''
+    key = f"{surname or 'citation'}{year}_{row['id']}"
+
+    fields = {}
+    if authors:
+        fields['author'] = ' and '.join(authors)
+    if year:
+        fields['year'] = year
+    fields.update(_pick(metadata, BIBTEX_FIELDS))
+    if 'pages' in fields:
+        fields['pages'] = re.sub(r'\s*[-–]\s*', '--', fields['pages'])
+    if entry_type == 'misc' and 'platform' in metadata:
+        fields['howpublished'] = metadata['platform']
+
+    lines = [f'@{entry_type}{{{key},']
+    lines += [f'  {name} = {{{_bibtex_escape(value)}}},' for name, value in fields.items()]
+    lines.append('}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def to_ris(row):
+    metadata = _metadata(row)
+    lines = [f"TY  - {RIS_TYPES.get(row['source_type'], 'GEN')}"]
+    lines += [f'AU  - {author}' for author in _authors(metadata)]
+    year = _year(metadata)
+    if year:
+        lines.append(f'PY  - {year}')
+
+    for tag, value in _pick(metadata, RIS_FIELDS).items():
+        lines.append(f'{tag}  - {value}')
+    if 'pages' in metadata:
+        pages = re.split(r'\s*[-–]+\s*', metadata['pages'], maxsplit=1)
+        lines.append(f'SP  - {pages[0]}')
+        if len(pages) > 1:
+            lines.append(f'EP  - {pages[1]}')
+    lines.append('ER  - ')
+    return '\n'.join(lines) + '\n\n'
+
+
+# format -> (formatter, mimetype)
+EXPORT_FORMATS = {
+    'txt': (to_txt, 'text/plain'),
+    'bib': (to_bibtex, 'application/x-bibtex'),
+    'ris': (to_ris, 'application/x-research-info-systems'),
+}
@@ -0,0 +1,167 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Connections idle longer than this are pinged before being handed out
+DB_POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', '5'))
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    """Bounded pool of psycopg2 connections for one process.
+
+    ThreadedConnectionPool raises as soon as it is exhausted; the semaphore in
+    front of it makes borrowers wait up to `timeout` for a connection instead.
+    """
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn, cursor_factory=RealDictCursor)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._returned_at = {}
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.wait_seconds = 0.0
+
+    def getconn(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f'No database connection available within {self.timeout:g}s')
+        try:
+            conn = self._borrow()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_seconds += time.monotonic() - start
+        return conn
+
+    def _borrow(self):
+        # Idle connections that fail the check are dropped; once none are left
+        # the pool opens a fresh one, which needs no check
+        while True:
+            conn = self._pool.getconn()
+            if self._healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        returned = self._returned_at.get(id(conn))
+        if returned is None or time.monotonic() - returned < DB_POOL_PING_AFTER:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._returned_at.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+        with self._lock:
+            self.discarded += 1
+
+    def putconn(self, conn, broken=False):
+        try:
+            if broken or conn.closed:
+                self._discard(conn)
+                return
+            if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                # Never hand the next borrower a half-finished transaction
+                conn.rollback()
+            self._returned_at[id(conn)] = time.monotonic()
+            self._pool.putconn(conn)
+        except psycopg2.Error:
+            self._discard(conn)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block."""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, broken=broken)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'min': self.minconn,
+                'max': self.maxconn,
+                'in_use': self.in_use,
+                'idle': len(self._pool._pool),
+                'utilisation': round(self.in_use / self.maxconn, 3),
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'discarded': self.discarded,
+                'avg_wait_ms': round(1000 * self.wait_seconds / self.checkouts, 2) if self.checkouts else 0,
+            }
+
+    def close(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# Pools inherited across fork; kept referenced so their sockets, which the
+# parent still uses, are never closed (and terminated) from the child
+_inherited = []
+
+
+def get_pool():
+    """The connection pool for this process, created on first use after fork."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid != os.getpid():
+            _inherited.append(_pool)
+            _pool = None
+        if _pool is None:
+            _pool = ConnectionPool(os.environ.get('DATABASE_URL'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def db_connection():
+    """Context manager lending a pooled connection: `with db_connection() as conn:`"""
+    return get_pool().connection()
+
+
+def pool_stats():
+    """Pool metrics, or None before this process has touched the database."""
+    pool = _pool
+    if pool is None or _pool_pid != os.getpid():
+        return None
+    return pool.stats()
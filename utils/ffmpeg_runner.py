@@ -0,0 +1,133 @@
+import os
+import signal
+import shutil
+import tempfile
+import threading
+import subprocess
+from collections import deque
+
+FFMPEG_RUN_DIR = os.getenv('FFMPEG_RUN_DIR', os.path.join(tempfile.gettempdir(), 'pptools_ffmpeg'))
+# Lines of ffmpeg's stderr kept for error messages; the rest is discarded as it arrives
+STDERR_TAIL_LINES = 40
+CANCEL_MARKER = 'cancelled'
+
+
+class Cancelled(RuntimeError):
+    pass
+
+
+def _task_dir(task_id):
+    if not task_id or not all(c.isalnum() or c in '-_' for c in task_id):
+        return None
+    return os.path.join(FFMPEG_RUN_DIR, task_id)
+
+
+class FFmpegTask:
+    """Runs the ffmpeg processes of one conversion, reporting progress and
+    making them cancellable by task id from any process.
+
+    Each ffmpeg runs in its own process group whose id is recorded under
+    FFMPEG_RUN_DIR/<task_id>/ while it runs; cancel() kills those groups and
+    leaves a marker so no further ffmpeg is started for the task.
+    """
+
+    def __init__(self, task_id=None, progress=None):
+        self.dir = _task_dir(task_id)
+        self.progress = progress
+        self._lock = threading.Lock()
+        self._last = None
+
+    def __enter__(self):
+        if self.dir:
+            os.makedirs(self.dir, exist_ok=True)
+        return self
+
+    def __exit__(self, *exc):
+        if self.dir:
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+    @property
+    def cancelled(self):
+        return bool(self.dir) and os.path.exists(os.path.join(self.dir, CANCEL_MARKER))
+
+    def report(self, percent, message):
+        """Pass progress on, skipping updates that would not change the percentage."""
+        if not self.progress:
+            return
+        percent = int(percent)
+        with self._lock:
+            if (percent, message) == self._last:
+                return
+            self._last = (percent, message)
+        self.progress(percent, 'processing', message)
+
+    def run(self, cmd, duration=None, span=(0, 100), message='Converting...', on_time=None):
+        """Run an ffmpeg command line, mapping its position in a media of
+        `duration` seconds onto the span of the overall progress. on_time, if
+        given, receives the position instead (for callers combining runs)."""
+        if self.cancelled:
+            raise Cancelled('Cancelled')
+        cmd = [cmd[0], '-nostats', '-progress', 'pipe:1'] + cmd[1:]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                errors='replace', start_new_session=True)
+        pid_file = os.path.join(self.dir, str(proc.pid)) if self.dir else None
+        if pid_file:
+            with open(pid_file, 'w') as f:
+                f.write(str(proc.pid))
+            # A cancel that listed the directory just before the file existed
+            if self.cancelled:
+                proc.kill()
+
+        tail = deque(maxlen=STDERR_TAIL_LINES)
+        drain = threading.Thread(target=lambda: tail.extend(proc.stderr), daemon=True)
+        drain.start()
+        try:
+            for line in proc.stdout:
+                key, _, value = line.strip().partition('=')
+                if key not in ('out_time_us', 'out_time_ms') or not value.isdigit():
+                    continue
+                # out_time_ms is in microseconds too, despite its name
+                seconds = int(value) / 1_000_000
+                if on_time:
+                    on_time(seconds)
+                elif duration:
+                    lo, hi = span
+                    self.report(lo + (hi - lo) * min(1.0, seconds / duration), message)
+            proc.wait()
+            drain.join()
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            if pid_file and os.path.exists(pid_file):
+                os.remove(pid_file)
+
+        if self.cancelled:
+            raise Cancelled('Cancelled')
+        if proc.returncode != 0:
+            raise RuntimeError('ffmpeg error:\n' + ''.join(tail))
+
+
+def cancel(task_id):
+    """Stop every ffmpeg running for task_id. Returns False when the task has
+    no ffmpeg work in progress."""
+    path = _task_dir(task_id)
+    if not path or not os.path.isdir(path):
+        return False
+    try:
+        with open(os.path.join(path, CANCEL_MARKER), 'w'):
+            pass
+    except FileNotFoundError:
+        # Finished in the meantime
+        return False
+    try:
+        names = os.listdir(path)
+    except FileNotFoundError:
+        return False
+    for name in names:
+        if name.isdigit():
+            try:
+                os.killpg(int(name), signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+    return True
@@ -3,6 +3,16 @@ from PIL import Image
 import os
 import subprocess
 import shutil
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from utils.result_cache import cached_result
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', str(os.cpu_count() or 2)))
+# Conversions submitted but not yet collected; bounds queued inputs and finished outputs
+IMAGE_MAX_IN_FLIGHT = int(os.getenv('IMAGE_MAX_IN_FLIGHT', str(IMAGE_WORKERS * 2)))
+IMAGE_MAX_TASKS_PER_CHILD = 100
 
 # Formats that can be READ (input formats)
 SUPPORTED_INPUT = ['3fr', 'arw', 'avif', 'bmp', 'cr2', 'cr3', 'crw', 'dcr', 'dng', 'eps', 'erf', 'gif', 'heic', 'heif', 'icns', 'ico', 'jfif', 'jpeg', 'jpg', 'mos', 'mrw', 'nef', 'odd', 'odg', 'orf', 'pef', 'png', 'ppm', 'ps', 'psd', 'pub', 'raf', 'raw', 'rw2', 'tif', 'tiff', 'webp', 'x3f', 'xcf', 'xps']
@@ -112,8 +122,111 @@ def convert_image(in_path, out_dir, out_format='png', resize=None, quality=90):
     else:
         return convert_with_imagemagick(in_path, out_path, out_format, resize, quality)
 
-def images_to_pdf(image_paths, out_pdf):
-    imgs = [Image.open(p).convert('RGB') for p in image_paths]
-    first, rest = imgs[0], imgs[1:]
-    first.save(out_pdf, save_all=True, append_images=rest)
-    return out_pdf
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Process pool for batch conversions, one per worker process"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = _new_pool(IMAGE_WORKERS)
+            _executor_pid = os.getpid()
+        return _executor
+
+def _new_pool(workers):
+    # forkserver: forking a threaded server process directly is unsafe
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('forkserver'),
+        max_tasks_per_child=IMAGE_MAX_TASKS_PER_CHILD
+    )
+
+def _replace_executor(broken):
+    """Drop a pool whose worker died and return a fresh one"""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    return get_executor()
+
+def _convert_cached(in_path, input_hash, out_dir, out_format, resize, quality):
+    return cached_result(
+        'image.convert', in_path, {'format': out_format, 'resize': resize, 'quality': quality},
+        lambda: convert_image(in_path, out_dir, out_format, resize, quality),
+        input_hash=input_hash
+    )
+
+def _convert_isolated(suspects, args):
+    """Convert files that were in flight when a worker died, one at a time on
+    a pool of their own, so a crash is pinned on the file that caused it."""
+    pool = None
+    try:
+        for index, in_path, input_hash in suspects:
+            pool = pool or _new_pool(1)
+            try:
+                yield index, pool.submit(_convert_cached, in_path, input_hash, *args).result(), None
+            except BrokenProcessPool:
+                yield index, None, 'Image converter process crashed'
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = None
+            except Exception as e:
+                yield index, None, str(e)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+def convert_images(inputs, out_dir, out_format='png', resize=None, quality=90, max_in_flight=None):
+    """Convert (in_path, input_hash) pairs across the process pool.
+
+    Yields (index, out_path, error) in completion order; a failed file has
+    out_path None and the error message, and does not stop the others.
+    """
+    executor = get_executor()
+    max_in_flight = max_in_flight or IMAGE_MAX_IN_FLIGHT
+    args = (out_dir, out_format, resize, quality)
+    queued = enumerate(inputs)
+    pending = {}
+
+    def submit(index, in_path, input_hash):
+        future = executor.submit(_convert_cached, in_path, input_hash, *args)
+        pending[future] = (index, in_path, input_hash)
+
+    def fill():
+        while len(pending) < max_in_flight:
+            item = next(queued, None)
+            if item is None:
+                return
+            submit(item[0], *item[1])
+
+    try:
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                # A worker died (e.g. a decoder crash) and took every unfinished
+                # file down with it; the rest of the in-flight set settles at once
+                done = set(pending)
+                wait(done)
+            suspects = []
+            for future in done:
+                entry = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    suspects.append(entry)
+                    continue
+                except Exception as e:
+                    yield entry[0], None, str(e)
+                    continue
+                yield entry[0], result, None
+            if suspects:
+                executor = _replace_executor(executor)
+                yield from _convert_isolated(sorted(suspects), args)
+            fill()
+    finally:
+        # Closed early: drop what has not started
+        for future in pending:
+            future.cancel()
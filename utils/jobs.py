@@ -0,0 +1,401 @@
+# SQLite-backed job queue. Web workers call submit() and return straight away;
+# worker processes started by ensure_workers() (or `python -m utils.jobs`)
+# claim queued jobs in priority order, respecting per-tool concurrency limits.
+import os
+import sys
+import json
+import time
+import shutil
+import uuid
+import fcntl
+import signal
+import sqlite3
+import tempfile
+import importlib
+import threading
+import subprocess
+import atexit
+from utils.progress_store import update_progress
+from utils.ffmpeg_runner import Cancelled, cancel as cancel_task
+
+JOBS_DIR = os.getenv('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'pptools_jobs'))
+JOBS_DB = os.path.join(JOBS_DIR, 'jobs.sqlite3')
+WORKER_COUNT = int(os.getenv('JOB_WORKERS', str(max(2, (os.cpu_count() or 2) // 2))))
+POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '0.5'))
+RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '3600'))
+
+class JobExists(Exception):
+    """A queued or running job already reports on this task id."""
+
+
+# name -> callable spec; 'returns' is 'file' (path or (path, download_name)) or 'json',
+# 'channel' is the progress stream the job reports on, 'cancellable' jobs get
+# their job id as task_id and can be stopped while running (utils.ffmpeg_runner)
+TOOLS = {
+    'audio.convert': {'target': 'utils.av_utils:convert_audio', 'concurrency': 4, 'priority': 5,
+                      'progress': True, 'cancellable': True},
+    'video.convert': {'target': 'utils.av_utils:convert_video', 'concurrency': 2, 'priority': 0,
+                      'progress': True, 'cancellable': True},
+    'video.to-gif': {'target': 'utils.av_utils:video_to_gif', 'concurrency': 2, 'priority': 3,
+                     'progress': True, 'cancellable': True},
+    'office.convert': {'target': 'utils.office_utils:convert_office_document', 'concurrency': 2, 'priority': 5},
+    'presentation.convert': {'target': 'utils.presentation_utils:convert_presentation', 'concurrency': 2, 'priority': 5},
+    'spreadsheet.convert': {'target': 'utils.spreadsheet_utils:convert_spreadsheet', 'concurrency': 2, 'priority': 5},
+    'cad.convert': {'target': 'utils.cad_utils:convert_cad', 'concurrency': 2, 'priority': 5},
+    'ebook.convert': {'target': 'utils.ebook_utils:convert_ebook', 'concurrency': 2, 'priority': 5},
+    'vector.convert': {'target': 'utils.vector_utils:convert_vector', 'concurrency': 2, 'priority': 5},
+    'ocr.pdf': {'target': 'utils.ocr_utils:pdf_to_text', 'concurrency': 2, 'priority': 3, 'returns': 'json',
+                'progress': True},
+    'youtube.download': {'target': 'utils.youtube_utils:download_youtube', 'concurrency': 3, 'priority': 1,
+                         'progress': True, 'channel': 'download'},
+}
+
+
+def tool_concurrency(tool):
+    env = 'JOB_CONCURRENCY_' + tool.upper().replace('.', '_').replace('-', '_')
+    return int(os.getenv(env, TOOLS[tool]['concurrency']))
+
+
+def _connect():
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def init_store():
+    conn = _connect()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            tool TEXT NOT NULL,
+            status TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            params TEXT NOT NULL,
+            result_path TEXT,
+            result_value TEXT,
+            download_name TEXT,
+            task_id TEXT,
+            owner TEXT,
+            error TEXT,
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            worker_pid INTEGER,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+    ''')
+    # Stores created before jobs had a client task id or an owner
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+    for column in ('task_id', 'owner'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at)')
+    # Two live jobs must not report progress on the same task id
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS jobs_live_task ON jobs (task_id) WHERE status IN ('queued', 'running')"
+    )
+    conn.close()
+
+
+def job_dir(job_id, create=True):
+    """Directory owned by a job for its input and output files."""
+    path = os.path.join(JOBS_DIR, 'files', job_id)
+    if create:
+        os.makedirs(path, exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def new_job_id():
+    """Job ids are always made here: knowing one is enough to fetch or cancel
+    the job, so it must not be guessable."""
+    return str(uuid.uuid4())
+
+
+def valid_task_id(task_id):
+    return bool(task_id) and len(task_id) <= 64 and all(c.isalnum() or c in '-_' for c in task_id)
+
+
+def progress_key(job):
+    """Progress store key a job reports on: the client's task id, if it sent one."""
+    return job['task_id'] or job['id']
+
+
+def submit(tool, kwargs, priority=None, job_id=None, download_name=None, task_id=None, owner=None):
+    """Queue a job and return its id. Progress is published under task_id
+    when given. Raises JobExists if a live job already uses that task_id."""
+    if tool not in TOOLS:
+        raise ValueError(f'Unknown tool: {tool}')
+    if priority is None:
+        priority = TOOLS[tool]['priority']
+    job_id = job_id or new_job_id()
+    task_id = task_id if valid_task_id(task_id) else None
+
+    init_store()
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT INTO jobs (id, tool, status, priority, params, download_name, task_id, owner, message, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, tool, 'queued', int(priority), json.dumps(kwargs), download_name, task_id, owner, 'Queued',
+             time.time())
+        )
+    except sqlite3.IntegrityError:
+        raise JobExists(f'A job is already running for task {task_id}')
+    finally:
+        conn.close()
+
+    publish(task_id or job_id, tool, 0, 'queued', 'Queued')
+    ensure_workers()
+    return job_id
+
+
+def publish(key, tool, progress, status, message):
+    """Mirror job state into the shared progress store so SSE watchers see it."""
+    update_progress(key, progress, status, message, channel=TOOLS[tool].get('channel', 'conversion'))
+
+
+def get_job(job_id):
+    if not os.path.exists(JOBS_DB):
+        return None
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+def job_status(job):
+    """Public view of a job row."""
+    data = {
+        'job_id': job['id'],
+        'tool': job['tool'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+    }
+    if job['status'] == 'error':
+        data['error'] = job['error']
+    if job['result_value'] is not None:
+        data['result'] = json.loads(job['result_value'])
+    return data
+
+
+def cancel(job_id):
+    """Cancel a job that has not started yet, or a running cancellable one.
+    Returns True if it was cancelled."""
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            "UPDATE jobs SET status = 'cancelled', message = 'Cancelled', finished_at = ? "
+            "WHERE id = ? AND status = 'queued' RETURNING tool, task_id, id",
+            (time.time(), job_id)
+        )
+        row = cur.fetchone()
+        if row is None:
+            row = conn.execute("SELECT tool FROM jobs WHERE id = ? AND status = 'running'", (job_id,)).fetchone()
+            # The worker sees the job fail with Cancelled and records it
+            return bool(row) and TOOLS[row['tool']].get('cancellable', False) and cancel_task(job_id)
+    finally:
+        conn.close()
+    publish(progress_key(row), row['tool'], 0, 'cancelled', 'Cancelled')
+    return True
+
+
+def set_progress(job_id, key, tool, progress, status='processing', message=''):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET progress = ?, message = ? WHERE id = ? AND status = 'running'",
+            (progress, message, job_id)
+        )
+    finally:
+        conn.close()
+    publish(key, tool, progress, status, message)
+
+
+def _claim(conn):
+    """Atomically pick the next runnable job, honouring per-tool limits."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        running = {
+            row['tool']: row['n'] for row in
+            conn.execute("SELECT tool, COUNT(*) AS n FROM jobs WHERE status = 'running' GROUP BY tool")
+        }
+        candidates = conn.execute(
+            "SELECT id, tool FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 100"
+        ).fetchall()
+        for row in candidates:
+            if running.get(row['tool'], 0) >= tool_concurrency(row['tool']):
+                continue
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, worker_pid = ?, message = 'Processing...' "
+                "WHERE id = ?",
+                (time.time(), os.getpid(), row['id'])
+            )
+            conn.execute('COMMIT')
+            return dict(conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone())
+        conn.execute('COMMIT')
+        return None
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def _resolve(target):
+    module_name, func_name = target.split(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _finish(conn, job, status, **fields):
+    fields.update(status=status, finished_at=time.time())
+    cols = ', '.join(f'{k} = ?' for k in fields)
+    conn.execute(f'UPDATE jobs SET {cols} WHERE id = ?', (*fields.values(), job['id']))
+    publish(progress_key(job), job['tool'], fields.get('progress', 0), status, fields.get('message', ''))
+
+
+def run_job(conn, job):
+    spec = TOOLS[job['tool']]
+    kwargs = json.loads(job['params'])
+    if spec.get('progress'):
+        kwargs['progress'] = lambda progress, status='processing', message='': set_progress(
+            job['id'], progress_key(job), job['tool'], progress, status, message
+        )
+    if spec.get('cancellable'):
+        kwargs['task_id'] = job['id']
+
+    try:
+        result = _resolve(spec['target'])(**kwargs)
+    except Cancelled:
+        _finish(conn, job, 'cancelled', message='Cancelled', progress=0)
+        return
+    except Exception as e:
+        _finish(conn, job, 'error', error=str(e), message=str(e), progress=0)
+        return
+
+    if spec.get('returns') == 'json':
+        _finish(conn, job, 'complete', result_value=json.dumps(result), progress=100,
+                message='Conversion complete')
+        return
+
+    download_name = job['download_name']
+    if isinstance(result, (tuple, list)):
+        result, download_name = result
+    _finish(conn, job, 'complete', result_path=result, download_name=download_name,
+            progress=100, message='Conversion complete')
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def reap_orphans(conn):
+    """Fail running jobs whose worker died, and drop expired finished jobs."""
+    for row in conn.execute("SELECT id, tool, task_id, worker_pid FROM jobs WHERE status = 'running'").fetchall():
+        if row['worker_pid'] and not _pid_alive(row['worker_pid']):
+            _finish(conn, row, 'error', error='Worker exited unexpectedly',
+                    message='Worker exited unexpectedly')
+
+    cutoff = time.time() - RESULT_TTL
+    for row in conn.execute(
+        "SELECT id FROM jobs WHERE status IN ('complete', 'error', 'cancelled') AND finished_at < ?", (cutoff,)
+    ).fetchall():
+        shutil.rmtree(os.path.join(JOBS_DIR, 'files', row['id']), ignore_errors=True)
+        conn.execute('DELETE FROM jobs WHERE id = ?', (row['id'],))
+
+
+def worker_main(parent_pid=None):
+    """Worker process loop: claim, run, repeat until the parent goes away."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_store()
+    conn = _connect()
+    last_reap = 0
+    while True:
+        if parent_pid and os.getppid() != parent_pid:
+            return
+        if time.monotonic() - last_reap > 60:
+            reap_orphans(conn)
+            last_reap = time.monotonic()
+        job = _claim(conn)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        publish(progress_key(job), job['tool'], 0, 'processing', 'Processing...')
+        run_job(conn, job)
+
+
+_workers = []
+_lock_file = None
+_workers_lock = threading.Lock()
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def ensure_workers(count=WORKER_COUNT):
+    """Start the worker pool from this process unless another process already hosts it."""
+    global _lock_file
+    if count <= 0:
+        return
+    with _workers_lock:
+        if _lock_file is None:
+            os.makedirs(JOBS_DIR, exist_ok=True)
+            fh = open(os.path.join(JOBS_DIR, 'workers.lock'), 'w')
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                fh.close()
+                return
+            _lock_file = fh
+            atexit.register(stop_workers)
+
+        _workers[:] = [p for p in _workers if p.poll() is None]
+        while len(_workers) < count:
+            _workers.append(subprocess.Popen(
+                [sys.executable, '-m', 'utils.jobs', '--worker', '--parent', str(os.getpid())],
+                cwd=REPO_ROOT,
+            ))
+
+
+def stop_workers():
+    for p in _workers:
+        if p.poll() is None:
+            p.terminate()
+    for p in _workers:
+        try:
+            p.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Run conversion job workers.')
+    parser.add_argument('--worker', action='store_true', help='run a single worker loop')
+    parser.add_argument('--parent', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=WORKER_COUNT)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args.parent)
+    else:
+        ensure_workers(args.workers)
+        if _lock_file is None:
+            sys.exit('Another process already hosts the job workers.')
+        try:
+            while True:
+                time.sleep(5)
+                ensure_workers(args.workers)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,385 @@
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import atexit
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+    HAS_UNO = True
+except Exception:
+    # Not only ImportError: a pyuno built for another Python can fail in other
+    # ways, and the cold --convert-to path must still work then
+    HAS_UNO = False
+
+# Pool configuration (per process)
+POOL_SIZE = int(os.getenv('LO_POOL_SIZE', '2'))
+MAX_JOBS_PER_INSTANCE = int(os.getenv('LO_POOL_MAX_JOBS', '200'))
+QUEUE_TIMEOUT = float(os.getenv('LO_POOL_QUEUE_TIMEOUT', '120'))
+STARTUP_TIMEOUT = float(os.getenv('LO_POOL_STARTUP_TIMEOUT', '30'))
+CONVERT_TIMEOUT = float(os.getenv('LO_POOL_CONVERT_TIMEOUT', '110'))
+HEALTHCHECK_INTERVAL = float(os.getenv('LO_POOL_HEALTHCHECK_INTERVAL', '30'))
+PROFILE_ROOT = os.getenv('LO_POOL_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'pptools_lo_profiles'))
+
+# Document service -> component family used to pick export filters
+DOC_SERVICES = [
+    ('com.sun.star.sheet.SpreadsheetDocument', 'calc'),
+    ('com.sun.star.presentation.PresentationDocument', 'impress'),
+    ('com.sun.star.drawing.DrawingDocument', 'draw'),
+    ('com.sun.star.text.TextDocument', 'writer'),
+]
+
+EXPORT_FILTERS = {
+    'writer': {
+        'pdf': 'writer_pdf_Export',
+        'doc': 'MS Word 97',
+        'docx': 'MS Word 2007 XML',
+        'odt': 'writer8',
+        'rtf': 'Rich Text Format',
+        'txt': 'Text',
+        'html': 'XHTML Writer File',
+        'epub': 'EPUB',
+    },
+    'calc': {
+        'pdf': 'calc_pdf_Export',
+        'xls': 'MS Excel 97',
+        'xlsx': 'Calc MS Excel 2007 XML',
+        'ods': 'calc8',
+        'csv': 'Text - txt - csv (StarCalc)',
+        'html': 'XHTML Calc File',
+    },
+    'impress': {
+        'pdf': 'impress_pdf_Export',
+        'ppt': 'MS PowerPoint 97',
+        'pptx': 'Impress MS PowerPoint 2007 XML',
+        'odp': 'impress8',
+        'svg': 'impress_svg_Export',
+        'png': 'impress_png_Export',
+    },
+    'draw': {
+        'pdf': 'draw_pdf_Export',
+        'odg': 'draw8',
+        'svg': 'draw_svg_Export',
+        'png': 'draw_png_Export',
+        'jpg': 'draw_jpg_Export',
+        'jpeg': 'draw_jpg_Export',
+    },
+}
+
+
+def libreoffice_path():
+    """Find a usable LibreOffice executable."""
+
+    # Try env override first
+    lo_env = os.getenv('LIBREOFFICE_PATH')
+    if lo_env and os.path.exists(lo_env):
+        return lo_env
+
+    # Default Homebrew cask location on macOS
+    default = '/Applications/LibreOffice.app/Contents/MacOS/soffice'
+    if os.path.exists(default):
+        return default
+
+    # Fallback to PATH
+    return shutil.which('soffice') or shutil.which('libreoffice')
+
+
+def split_format(out_format):
+    """Split a --convert-to style 'ext[:Filter]' spec into (ext, filter or None)."""
+    ext, _, filter_name = out_format.partition(':')
+    return ext.lower(), (filter_name or None)
+
+
+def _prop(name, value):
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+
+def _kill_group(proc):
+    """SIGKILL every process in proc's session, as utils.ffmpeg_runner does."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class LibreOfficeInstance:
+    """One headless soffice process with its own user profile."""
+
+    def __init__(self, soffice, index):
+        self.soffice = soffice
+        self.index = index
+        self.profile_dir = os.path.join(PROFILE_ROOT, f'{os.getpid()}_{index}')
+        self.proc = None
+        self.desktop = None
+        self.jobs = 0
+        self.generation = 0
+        self.last_used = 0.0
+
+    @property
+    def profile_url(self):
+        return 'file://' + os.path.abspath(self.profile_dir)
+
+    def start(self):
+        """Launch soffice and connect to it over a UNO pipe."""
+        self.stop()
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.generation += 1
+        pipe_name = f'pptools_lo_{os.getpid()}_{self.index}_{self.generation}'
+        cmd = [
+            self.soffice,
+            '--headless', '--invisible', '--nologo', '--norestore',
+            '--nodefault', '--nolockcheck',
+            f'-env:UserInstallation={self.profile_url}',
+            f'--accept=pipe,name={pipe_name};urp;StarOffice.ComponentContext',
+        ]
+        self.proc = subprocess.Popen(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+        )
+
+        local_ctx = uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_ctx
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(f'uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext')
+                self.desktop = ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+                break
+            except Exception:
+                if self.proc.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError('LibreOffice instance failed to start.')
+                time.sleep(0.2)
+
+        self.jobs = 0
+        self.last_used = time.monotonic()
+
+    def stop(self):
+        """Terminate the soffice process, if any."""
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.proc is not None:
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._kill()
+            self.proc = None
+
+    def healthy(self):
+        """Check that the process is alive and still answers UNO calls."""
+        if self.proc is None or self.proc.poll() is not None or self.desktop is None:
+            return False
+        try:
+            self.desktop.getComponents()
+            return True
+        except Exception:
+            return False
+
+    def convert(self, in_path, out_path, out_format):
+        if not HAS_UNO:
+            return self._convert_cli(in_path, out_path, out_format)
+
+        needs_check = time.monotonic() - self.last_used > HEALTHCHECK_INTERVAL
+        if self.desktop is None or (needs_check and not self.healthy()):
+            self.start()
+
+        ext, filter_name = split_format(out_format)
+
+        # Kill a hung instance so the blocked UNO call returns
+        watchdog = threading.Timer(CONVERT_TIMEOUT, self._kill)
+        watchdog.daemon = True
+        watchdog.start()
+        doc = None
+        try:
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(in_path)), '_blank', 0,
+                (_prop('Hidden', True), _prop('ReadOnly', True)),
+            )
+            if doc is None:
+                raise RuntimeError('LibreOffice could not open the document.')
+
+            if not filter_name:
+                family = next((f for service, f in DOC_SERVICES if doc.supportsService(service)), None)
+                filter_name = EXPORT_FILTERS.get(family, {}).get(ext)
+            if not filter_name:
+                raise RuntimeError(f'Conversion to {ext.upper()} is not supported for this document.')
+
+            doc.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(out_path)),
+                (_prop('FilterName', filter_name), _prop('Overwrite', True)),
+            )
+        except RuntimeError:
+            raise
+        except Exception as e:
+            # The bridge is unusable after a crash or kill; restart on next use
+            if not self.healthy():
+                self.stop()
+            raise RuntimeError(f'LibreOffice failed: {e}') from e
+        finally:
+            watchdog.cancel()
+            if doc is not None:
+                try:
+                    doc.close(True)
+                except Exception:
+                    pass
+
+        self.jobs += 1
+        self.last_used = time.monotonic()
+
+        if not os.path.exists(out_path):
+            raise RuntimeError('Converted file not found in output directory.')
+        return out_path
+
+    def _kill(self):
+        # soffice forks soffice.bin, which holds the pipe and the profile;
+        # killing only the wrapper would leave it running
+        proc = self.proc
+        if proc is not None and proc.poll() is None:
+            _kill_group(proc)
+            proc.wait()
+
+    def _convert_cli(self, in_path, out_path, out_format):
+        """Cold conversion via --convert-to, still isolated to this slot's profile."""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        scratch = tempfile.mkdtemp(prefix='lo_out_')
+        try:
+            cmd = [
+                self.soffice,
+                '--headless', '--norestore', '--nolockcheck',
+                f'-env:UserInstallation={self.profile_url}',
+                '--convert-to', out_format,
+                '--outdir', scratch,
+                in_path,
+            ]
+            proc = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, start_new_session=True
+            )
+            try:
+                stdout, stderr = proc.communicate(timeout=CONVERT_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                _kill_group(proc)
+                proc.communicate()
+                raise RuntimeError('LibreOffice timed out.')
+            if proc.returncode != 0:
+                raise RuntimeError(f"LibreOffice failed:\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}")
+
+            produced = os.listdir(scratch)
+            if not produced:
+                raise RuntimeError('Converted file not found in output directory.')
+            shutil.move(os.path.join(scratch, produced[0]), out_path)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        self.jobs += 1
+        self.last_used = time.monotonic()
+        return out_path
+
+
+class LibreOfficePool:
+    """Fixed-size pool of warm LibreOffice instances shared by the converters."""
+
+    def __init__(self, size=POOL_SIZE, max_jobs=MAX_JOBS_PER_INSTANCE, queue_timeout=QUEUE_TIMEOUT):
+        soffice = libreoffice_path()
+        if not soffice:
+            raise RuntimeError(
+                'LibreOffice (soffice) not found. Install with: brew install --cask libreoffice'
+            )
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self.queue_timeout = queue_timeout
+        self.instances = [LibreOfficeInstance(soffice, i) for i in range(self.size)]
+        self._idle = queue.Queue()
+        for inst in self.instances:
+            self._idle.put(inst)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.recycled = 0
+
+    def warm(self):
+        """Start every instance up front instead of on first use."""
+        if not HAS_UNO:
+            return
+        for inst in self.instances:
+            if inst.desktop is None:
+                inst.start()
+
+    def convert(self, in_path, out_path, out_format):
+        """Convert in_path to out_path on the next free instance, queueing if all are busy."""
+        with self._lock:
+            self.waiting += 1
+        try:
+            inst = self._idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            raise RuntimeError('All LibreOffice workers are busy, please try again later.')
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+        try:
+            result = inst.convert(in_path, out_path, out_format)
+            with self._lock:
+                self.completed += 1
+            return result
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            if inst.jobs >= self.max_jobs:
+                inst.stop()
+                inst.jobs = 0
+                with self._lock:
+                    self.recycled += 1
+            self._idle.put(inst)
+
+    def shutdown(self):
+        for inst in self.instances:
+            inst.stop()
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'idle': self._idle.qsize(),
+            'waiting': self.waiting,
+            'running': sum(1 for i in self.instances if i.proc is not None and i.proc.poll() is None),
+            'completed': self.completed,
+            'failed': self.failed,
+            'recycled': self.recycled,
+            'uno': HAS_UNO,
+        }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return this process's pool, creating it lazily (after any fork)."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = LibreOfficePool()
+            _pool_pid = os.getpid()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def convert(in_path, out_path, out_format):
+    """Convert a document with the shared LibreOffice pool."""
+    return get_pool().convert(in_path, out_path, out_format)
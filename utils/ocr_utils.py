@@ -1,15 +1,153 @@
-import os, tempfile
+import os
+import shutil
+import tempfile
+import threading
+import unicodedata
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 import pytesseract
-from pdf2image import convert_from_path
 from PIL import Image
+from pypdf import PdfReader
+from utils.pdf_utils import pdf_to_images, selected_pages
+
+# tesseract processes running at once per worker process, shared by all requests
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(os.cpu_count() or 1)))
+# With a process per core, tesseract's own OpenMP threads only oversubscribe
+# the CPUs; tesseract reads this from the environment it inherits
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+# A page's own text is used instead of OCR when it has at least this many
+# characters and this share of them are letters, digits, punctuation or symbols
+TEXT_LAYER_MIN_CHARS = int(os.getenv('TEXT_LAYER_MIN_CHARS', '50'))
+TEXT_LAYER_MIN_QUALITY = float(os.getenv('TEXT_LAYER_MIN_QUALITY', '0.9'))
+OCR_MODES = ('auto', 'ocr')
 
 def image_to_text(image_path, lang='eng'):
     text = pytesseract.image_to_string(Image.open(image_path), lang=lang)
     return text
 
-def pdf_to_text(pdf_path, lang='eng', dpi=200):
-    pages = convert_from_path(pdf_path, dpi=dpi)
-    texts = []
-    for img in pages:
-        texts.append(pytesseract.image_to_string(img, lang=lang))
-    return "\n\n".join(texts)
+def _recognise(image_path, lang):
+    # A path goes to tesseract as is, without pytesseract re-encoding the image
+    try:
+        return pytesseract.image_to_string(image_path, lang=lang)
+    finally:
+        os.remove(image_path)
+
+def _layer_text(page):
+    """The page's own text when it can stand in for OCR, else None."""
+    try:
+        text = page.extract_text() or ''
+    except Exception:
+        return None
+    chars = [c for c in text if not c.isspace()]
+    good = sum(1 for c in chars if c != '\ufffd' and unicodedata.category(c)[0] in 'LNPS')
+    if chars and good < len(chars) * TEXT_LAYER_MIN_QUALITY:
+        # Fonts without a usable encoding come out as garbage
+        return None
+    if len(chars) >= TEXT_LAYER_MIN_CHARS:
+        return text
+    # Little or no text: only worth OCR when there is an image to read it from
+    try:
+        return None if len(page.images) else text
+    except Exception:
+        return None
+
+def text_layers(pdf_path, numbers):
+    """page number -> text for the pages whose text layer is good enough to skip OCR."""
+    try:
+        reader = PdfReader(pdf_path)
+        if reader.is_encrypted:
+            reader.decrypt('')
+        layers = {}
+        for number in numbers:
+            text = _layer_text(reader.pages[number - 1])
+            if text is not None:
+                layers[number] = text
+        return layers
+    except Exception:
+        # pypdf cannot read it; poppler may still render it
+        return {}
+
+def ocr_pages(pdf_path, lang='eng', dpi=200, pages=None, progress=None, workers=None, mode='auto'):
+    """Generator of {'page', 'text', 'method'} in page order for the selected
+    pages, each yielded as soon as it and the pages before it are done.
+
+    In 'auto' mode pages with a usable text layer are read with pypdf
+    (method 'text') and only the rest are OCRed (method 'ocr'); 'ocr' mode
+    OCRs every page. Pages are rendered a few at a time and recognised on the
+    shared OCR pool, taking up to `workers` of its tesseract processes, so
+    memory and disk use stay flat. The selection is checked before this
+    returns.
+    """
+    if mode not in OCR_MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Choose from: {', '.join(OCR_MODES)}")
+    numbers = selected_pages(pdf_path, pages)
+    workers = max(1, min(workers or OCR_WORKERS, len(numbers)))
+    return _ocr(pdf_path, lang, dpi, numbers, progress, workers, mode)
+
+_ocr_pool = None
+_ocr_pool_pid = None
+_ocr_pool_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    """The tesseract pool for this process. Every request draws from it, so
+    concurrent requests never run more than OCR_WORKERS at once."""
+    global _ocr_pool, _ocr_pool_pid
+    with _ocr_pool_lock:
+        if _ocr_pool is None or _ocr_pool_pid != os.getpid():
+            _ocr_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix='ocr')
+            _ocr_pool_pid = os.getpid()
+        return _ocr_pool
+
+
+def _ocr(pdf_path, lang, dpi, numbers, progress, workers, mode):
+    layers = text_layers(pdf_path, numbers) if mode == 'auto' else {}
+    needed = [number for number in numbers if number not in layers]
+    out_dir = tempfile.mkdtemp(prefix='ocr_')
+    executor = get_ocr_pool()
+    # (page, method, text or future) in page order
+    pending = deque()
+    done = 0
+
+    def ready():
+        return pending[0][1] == 'text' or pending[0][2].done()
+
+    def finished():
+        nonlocal done
+        page, method, result = pending.popleft()
+        text = result if method == 'text' else result.result()
+        done += 1
+        if progress:
+            progress(int(done * 100 / len(numbers)), 'processing', f'Read page {done} of {len(numbers)}')
+        return {'page': page, 'text': text, 'method': method}
+
+    images = None
+    try:
+        if needed:
+            # Rendering is far quicker than recognition, so a quarter of the
+            # workers keeps tesseract fed
+            images = pdf_to_images(pdf_path, out_dir, dpi=dpi, pages=needed, workers=max(1, workers // 4))
+        for page in numbers:
+            if page in layers:
+                pending.append((page, 'text', layers[page]))
+            else:
+                pending.append((page, 'ocr', executor.submit(_recognise, next(images), lang)))
+            # Hand back finished pages, and stop rendering ahead once every
+            # worker has a page waiting behind it
+            while pending and (ready() or len(pending) >= workers * 2):
+                yield finished()
+        while pending:
+            yield finished()
+    finally:
+        if images is not None:
+            images.close()
+        # Drop queued pages and let running ones finish before out_dir goes
+        futures = [result for _, method, result in pending if method == 'ocr']
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+def pdf_to_text(pdf_path, lang='eng', dpi=200, pages=None, progress=None, mode='auto'):
+    results = ocr_pages(pdf_path, lang, dpi, pages=pages, progress=progress, mode=mode)
+    return "\n\n".join(result['text'] for result in results)
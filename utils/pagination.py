@@ -0,0 +1,35 @@
+import base64
+from datetime import datetime
+
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at, row_id):
+    """Opaque cursor for the position just after (created_at, id)."""
+    raw = f'{created_at.isoformat()}|{row_id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor; ValueError if it is malformed."""
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+    created_at, _, row_id = raw.partition('|')
+    return datetime.fromisoformat(created_at), int(row_id)
+
+
+def parse_limit(value, default, maximum=MAX_PAGE_SIZE):
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), maximum))
+
+
+def parse_fields(value, allowed):
+    """Requested fields from a comma-separated list, in allowed's order; all of
+    allowed when value is empty. ValueError names any unknown field."""
+    if not value:
+        return list(allowed)
+    requested = {f.strip() for f in value.split(',') if f.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [f for f in allowed if f in requested]
@@ -0,0 +1,190 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Any werkzeug method string, e.g. scrypt:65536:8:1 or pbkdf2:sha256:1000000
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+# Hashes queued or running at once per process; beyond this logins get a 503
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', str(PASSWORD_HASH_WORKERS * 8)))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+
+AUTH_THROTTLE_DIR = os.getenv('AUTH_THROTTLE_DIR', os.path.join(tempfile.gettempdir(), 'pptools_auth'))
+AUTH_FAILURE_WINDOW = int(os.getenv('AUTH_FAILURE_WINDOW', '900'))
+AUTH_MAX_FAILURES_ACCOUNT = int(os.getenv('AUTH_MAX_FAILURES_ACCOUNT', '5'))
+AUTH_MAX_FAILURES_IP = int(os.getenv('AUTH_MAX_FAILURES_IP', '50'))
+PURGE_INTERVAL = 300
+
+
+class HasherBusy(RuntimeError):
+    pass
+
+
+class PasswordHasher:
+    """Runs key derivation on a small thread pool so a burst of logins uses at
+    most `workers` cores (hashlib releases the GIL while deriving)."""
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 max_pending=PASSWORD_HASH_MAX_PENDING, timeout=PASSWORD_HASH_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.rejected = 0
+        # A throwaway hash gives the full method string (scrypt -> scrypt:32768:8:1)
+        # and something to verify against when the account does not exist
+        self._dummy_hash = generate_password_hash(os.urandom(16).hex(), method)
+        self.method = self._dummy_hash.split('$', 1)[0]
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy('Too many sign-ins in progress, try again shortly')
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        with self._lock:
+            self.hashed += 1
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.method
+
+    def verify(self, password_hash, password):
+        """(ok, new_hash): new_hash is set when the password was right but was
+        stored with different parameters than PASSWORD_HASH_METHOD."""
+        with self._lock:
+            self.verified += 1
+        if not password_hash:
+            # Unknown accounts still pay for one hash so timing does not reveal them
+            self._run(check_password_hash, self._dummy_hash, password)
+            return False, None
+        if not self._run(check_password_hash, password_hash, password):
+            return False, None
+        if not self.needs_rehash(password_hash):
+            return True, None
+        with self._lock:
+            self.rehashed += 1
+        return True, self._run(generate_password_hash, password, self.method)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'hashed': self.hashed,
+                'verified': self.verified,
+                'rehashed': self.rehashed,
+                'rejected': self.rejected,
+            }
+
+
+class LoginThrottle:
+    """Failed-login counters per account and per client IP in a SQLite file
+    shared by every worker process. Counts reset AUTH_FAILURE_WINDOW seconds
+    after the first failure of a run."""
+
+    def __init__(self, directory=AUTH_THROTTLE_DIR, window=AUTH_FAILURE_WINDOW):
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, 'throttle.sqlite3')
+        self.window = window
+        self.limits = {'account': AUTH_MAX_FAILURES_ACCOUNT, 'ip': AUTH_MAX_FAILURES_IP}
+        self._local = threading.local()
+        self._last_purge = 0
+        self._conn().execute('''
+            CREATE TABLE IF NOT EXISTS login_failures (
+                key TEXT PRIMARY KEY,
+                failures INTEGER NOT NULL,
+                window_start REAL NOT NULL
+            )
+        ''')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _keys(self, email, ip):
+        return [('account', f'account:{email}'), ('ip', f'ip:{ip}')]
+
+    def retry_after(self, email, ip):
+        """Seconds until email may try again from ip; 0 when not throttled."""
+        now = time.time()
+        wait = 0
+        conn = self._conn()
+        for kind, key in self._keys(email, ip):
+            row = conn.execute(
+                'SELECT failures, window_start FROM login_failures WHERE key = ?', (key,)
+            ).fetchone()
+            if row and row[0] >= self.limits[kind] and row[1] + self.window > now:
+                wait = max(wait, row[1] + self.window - now)
+        return int(wait) + 1 if wait else 0
+
+    def record_failure(self, email, ip):
+        now = time.time()
+        conn = self._conn()
+        for kind, key in self._keys(email, ip):
+            conn.execute(
+                'INSERT INTO login_failures (key, failures, window_start) VALUES (?, 1, ?) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                'failures = CASE WHEN window_start + ? <= excluded.window_start THEN 1 ELSE failures + 1 END, '
+                'window_start = CASE WHEN window_start + ? <= excluded.window_start THEN excluded.window_start ELSE window_start END',
+                (key, now, self.window, self.window)
+            )
+        if time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+            self._last_purge = time.monotonic()
+            conn.execute('DELETE FROM login_failures WHERE window_start < ?', (now - self.window,))
+
+    def record_success(self, email):
+        # Only the account is cleared: signing in to one account must not
+        # reset an IP that is guessing at others
+        self._conn().execute('DELETE FROM login_failures WHERE key = ?', (f'account:{email}',))
+
+
+_hasher = None
+_hasher_pid = None
+_throttle = None
+_lock = threading.Lock()
+
+
+def get_hasher():
+    """The hasher for this process; its threads do not survive fork."""
+    global _hasher, _hasher_pid
+    with _lock:
+        if _hasher is None or _hasher_pid != os.getpid():
+            _hasher = PasswordHasher()
+            _hasher_pid = os.getpid()
+        return _hasher
+
+
+def hasher_stats():
+    """Hashing counters, or None before this process has hashed anything."""
+    hasher = _hasher
+    if hasher is None or _hasher_pid != os.getpid():
+        return None
+    return hasher.stats()
+
+
+def get_throttle():
+    global _throttle
+    with _lock:
+        if _throttle is None:
+            _throttle = LoginThrottle()
+        return _throttle
@@ -0,0 +1,197 @@
+import io
+import os
+import shutil
+import subprocess
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ContentStream, NameObject, NumberObject
+
+# Target resolution and JPEG quality of embedded images per profile
+PDF_PROFILES = {
+    'screen': {'dpi': 72, 'quality': 50},
+    'ebook': {'dpi': 150, 'quality': 70},
+    'printer': {'dpi': 300, 'quality': 85},
+}
+DEFAULT_PDF_PROFILE = 'ebook'
+
+# Images are only downsampled when above target dpi by this factor, as
+# Ghostscript does; resampling for small gains just costs quality
+DOWNSAMPLE_THRESHOLD = 1.5
+# A recompressed image must come out at least this much smaller to be used
+MIN_SAVING = 0.1
+# Images smaller than this on both sides are left alone
+MIN_IMAGE_SIDE = 64
+# Filters for bilevel and wavelet images we cannot improve on with JPEG
+KEEP_FILTERS = {'/JBIG2Decode', '/CCITTFaxDecode', '/JPXDecode'}
+
+
+def _multiply(a, b):
+    return [
+        a[0] * b[0] + a[1] * b[2], a[0] * b[1] + a[1] * b[3],
+        a[2] * b[0] + a[3] * b[2], a[2] * b[1] + a[3] * b[3],
+        a[4] * b[0] + a[5] * b[2] + b[4], a[4] * b[1] + a[5] * b[3] + b[5],
+    ]
+
+
+def _placements(content, resources, pdf, ctm, sizes, seen):
+    """Record in sizes the largest size (in points) each image XObject is
+    drawn at, following q/Q/cm through the content and into forms."""
+    xobjects = resources.get('/XObject') if resources else None
+    xobjects = xobjects.get_object() if xobjects else {}
+    stack = []
+    for operands, operator in ContentStream(content, pdf).operations:
+        if operator == b'q':
+            stack.append(ctm)
+        elif operator == b'Q' and stack:
+            ctm = stack.pop()
+        elif operator == b'cm':
+            ctm = _multiply([float(x) for x in operands], ctm)
+        elif operator == b'Do' and operands[0] in xobjects:
+            ref = xobjects.raw_get(operands[0])
+            xobj = ref.get_object()
+            idnum = getattr(ref, 'idnum', None)
+            if xobj.get('/Subtype') == '/Image' and idnum is not None:
+                width = (ctm[0] ** 2 + ctm[1] ** 2) ** 0.5
+                height = (ctm[2] ** 2 + ctm[3] ** 2) ** 0.5
+                old = sizes.get(idnum, (0, 0))
+                sizes[idnum] = (max(old[0], width), max(old[1], height))
+            elif xobj.get('/Subtype') == '/Form' and idnum not in seen:
+                seen.add(idnum)
+                matrix = [float(x) for x in xobj.get('/Matrix', [1, 0, 0, 1, 0, 0])]
+                _placements(xobj, xobj.get('/Resources'), pdf, _multiply(matrix, ctm), sizes, seen)
+                seen.discard(idnum)
+
+
+def _image_xobjects(resources, path=(), seen=None):
+    """(key for page.images, indirect reference) of each image XObject under resources."""
+    seen = set() if seen is None else seen
+    xobjects = resources.get('/XObject') if resources else None
+    if not xobjects:
+        return
+    xobjects = xobjects.get_object()
+    for name in xobjects:
+        ref = xobjects.raw_get(name)
+        xobj = ref.get_object()
+        if xobj.get('/Subtype') == '/Image':
+            yield path + (name,), ref
+        elif xobj.get('/Subtype') == '/Form' and getattr(ref, 'idnum', None) not in seen:
+            seen.add(getattr(ref, 'idnum', None))
+            yield from _image_xobjects(xobj.get('/Resources'), path + (name,), seen)
+
+
+def _skip(xobj):
+    filters = xobj.get('/Filter', [])
+    filters = [filters] if isinstance(filters, str) else list(filters)
+    return (
+        xobj.get('/ImageMask') or '/SMask' in xobj or '/Mask' in xobj
+        or xobj.get('/BitsPerComponent', 8) == 1
+        or any(f in KEEP_FILTERS for f in filters)
+        or max(xobj.get('/Width', 0), xobj.get('/Height', 0)) < MIN_IMAGE_SIDE
+    )
+
+
+def _recompress(xobj, image, size, dpi, quality):
+    """Replace the stream of xobj with a downsampled JPEG of image when that
+    is worth it. Returns the bytes saved."""
+    if image.mode == 'P':
+        image = image.convert('RGB')
+    if image.mode not in ('RGB', 'L'):
+        # CMYK, alpha and exotic modes would change colour or lose data
+        return 0
+    if size:
+        target = (max(1, round(size[0] / 72 * dpi)), max(1, round(size[1] / 72 * dpi)))
+        if image.width > target[0] * DOWNSAMPLE_THRESHOLD and image.height > target[1] * DOWNSAMPLE_THRESHOLD:
+            image = image.resize(target, Image.LANCZOS)
+
+    buf = io.BytesIO()
+    image.save(buf, 'JPEG', quality=quality, optimize=True)
+    data = buf.getvalue()
+    original = len(xobj._data)
+    if len(data) > original * (1 - MIN_SAVING):
+        return 0
+
+    xobj._data = data
+    xobj[NameObject('/Filter')] = NameObject('/DCTDecode')
+    xobj[NameObject('/Width')] = NumberObject(image.width)
+    xobj[NameObject('/Height')] = NumberObject(image.height)
+    xobj[NameObject('/BitsPerComponent')] = NumberObject(8)
+    xobj[NameObject('/ColorSpace')] = NameObject('/DeviceRGB' if image.mode == 'RGB' else '/DeviceGray')
+    for key in ('/DecodeParms', '/Decode', '/Intent'):
+        xobj.pop(key, None)
+    return original - len(data)
+
+
+def _qpdf(in_path, out_path, linearize):
+    cmd = ['qpdf', '--object-streams=generate', in_path, out_path]
+    if linearize:
+        cmd.insert(1, '--linearize')
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    # Exit code 3 means it succeeded with warnings
+    if proc.returncode not in (0, 3):
+        raise RuntimeError(f'qpdf error: {proc.stderr.strip()}')
+
+
+def compress_pdf(in_path, out_path, profile=DEFAULT_PDF_PROFILE, linearize=False, progress=None):
+    """Shrink a PDF: downsample and recompress images to the profile's dpi and
+    JPEG quality, compress content streams, merge identical objects and drop
+    unreferenced ones. With qpdf installed the result also gets object streams
+    and, if asked, is linearized for fast web view.
+
+    Images are decoded one at a time. If nothing helps, the original is
+    copied through unchanged. Returns a dict of sizes and what was done.
+    """
+    settings = PDF_PROFILES[profile]
+    original_size = os.path.getsize(in_path)
+    writer = PdfWriter(clone_from=PdfReader(in_path))
+
+    # Where each image is drawn largest decides its target resolution
+    sizes = {}
+    for page in writer.pages:
+        contents = page.get_contents()
+        if contents is not None:
+            _placements(contents, page.get('/Resources'), writer, [1, 0, 0, 1, 0, 0], sizes, set())
+
+    done = set()
+    recompressed = 0
+    total = len(writer.pages)
+    for number, page in enumerate(writer.pages, 1):
+        for key, ref in _image_xobjects(page.get('/Resources')):
+            xobj = ref.get_object()
+            idnum = getattr(ref, 'idnum', None)
+            if idnum in done or _skip(xobj):
+                continue
+            done.add(idnum)
+            try:
+                image = page.images[key if len(key) > 1 else key[0]].image
+            except Exception:
+                # Image data pypdf cannot decode is left as it is
+                continue
+            if _recompress(xobj, image, sizes.get(idnum), settings['dpi'], settings['quality']):
+                recompressed += 1
+            del image
+        page.compress_content_streams(level=9)
+        if progress:
+            progress(int(number * 80 / total), 'processing', f'Compressed page {number} of {total}')
+
+    writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+    with open(out_path, 'wb') as f:
+        writer.write(f)
+
+    linearized = False
+    if shutil.which('qpdf'):
+        if progress:
+            progress(90, 'processing', 'Optimizing structure...')
+        tmp_path = out_path + '.qpdf'
+        _qpdf(out_path, tmp_path, linearize)
+        os.replace(tmp_path, out_path)
+        linearized = linearize
+
+    if os.path.getsize(out_path) >= original_size:
+        shutil.copyfile(in_path, out_path)
+        linearized = False
+    return {
+        'original_size': original_size,
+        'compressed_size': os.path.getsize(out_path),
+        'images_recompressed': recompressed,
+        'linearized': linearized,
+    }
@@ -1,30 +1,543 @@
+import io
 import os
-from pdf2image import convert_from_path
-from pypdf import PdfReader, PdfWriter
+import math
+import zlib
+import hashlib
+import shutil
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NullObject, StreamObject, TextStringObject,
+)
 from PIL import Image
 
-def pdf_to_images(pdf_path, out_dir, dpi=200, fmt='png'):
-    images = convert_from_path(pdf_path, dpi=dpi)
-    out_files = []
+# pdftoppm processes running at once per worker process, shared by all requests
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', str(os.cpu_count() or 1)))
+# Most pages one pdftoppm call renders; smaller chunks spread short documents over more workers
+PDF_RENDER_CHUNK = int(os.getenv('PDF_RENDER_CHUNK', '10'))
+# Merges beyond these are refused before any page is copied
+PDF_MERGE_MAX_FILES = int(os.getenv('PDF_MERGE_MAX_FILES', '200'))
+PDF_MERGE_MAX_PAGES = int(os.getenv('PDF_MERGE_MAX_PAGES', '5000'))
+PDF_MERGE_MAX_BYTES = int(os.getenv('PDF_MERGE_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+
+def page_count(pdf_path):
+    return int(pdfinfo_from_path(pdf_path)['Pages'])
+
+
+def parse_page_ranges(spec, count):
+    """1-based page numbers for a selection like '1-3,8,10-' in the order
+    given; ValueError for malformed or out-of-range parts."""
+    pages = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition('-')
+        try:
+            first = int(first) if first.strip() else 1
+            last = (int(last) if last.strip() else count) if dash else first
+        except ValueError:
+            raise ValueError(f"Invalid page range '{part}'")
+        if not 1 <= first <= count or not 1 <= last <= count:
+            raise ValueError(f"Page range '{part}' is outside 1-{count}")
+        step = 1 if last >= first else -1
+        pages.extend(range(first, last + step, step))
+    if not pages:
+        raise ValueError('No pages selected')
+    return pages
+
+
+def selected_pages(pdf_path, pages=None):
+    """Sorted, distinct page numbers for a selection given as a spec like
+    '1-3,8' or a list of numbers; every page when pages is empty."""
+    count = page_count(pdf_path)
+    if not pages:
+        return list(range(1, count + 1))
+    if isinstance(pages, str):
+        pages = parse_page_ranges(pages, count)
+    elif any(not 1 <= page <= count for page in pages):
+        raise ValueError(f'Pages must be within 1-{count}')
+    return sorted(set(pages))
+
+
+def _chunks(pages, size):
+    """Split sorted page numbers into runs of consecutive pages of at most size."""
+    chunks = []
+    for page in pages:
+        if chunks and page == chunks[-1][1] + 1 and chunks[-1][1] - chunks[-1][0] + 1 < size:
+            chunks[-1][1] = page
+        else:
+            chunks.append([page, page])
+    return chunks
+
+
+_render_pool = None
+_render_pool_pid = None
+_render_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """The pdftoppm pool for this process. Every request draws from it, so
+    concurrent requests never run more than PDF_RENDER_WORKERS at once."""
+    global _render_pool, _render_pool_pid
+    with _render_pool_lock:
+        if _render_pool is None or _render_pool_pid != os.getpid():
+            _render_pool = ThreadPoolExecutor(max_workers=PDF_RENDER_WORKERS, thread_name_prefix='pdf-render')
+            _render_pool_pid = os.getpid()
+        return _render_pool
+
+
+def _render_chunk(pdf_path, out_dir, dpi, fmt, first, last):
+    # Each call gets its own folder: pdftoppm names files by page number with
+    # padding that depends on the document, so we only list what it wrote
+    folder = tempfile.mkdtemp(dir=out_dir)
+    paths = convert_from_path(pdf_path, dpi=dpi, fmt=fmt, first_page=first, last_page=last,
+                              output_folder=folder, paths_only=True)
+    return folder, paths
+
+
+def pdf_to_images(pdf_path, out_dir, dpi=200, fmt='png', pages=None, workers=None):
+    """Render the selected pages (see selected_pages; all by default) into
+    out_dir, returning a generator of file paths in page order.
+
+    Runs of pages are rendered by pdftoppm on the shared render pool, each
+    writing straight to disk, so memory stays flat however long the document
+    is; `workers` caps how many of the pool's slots this document takes. The
+    selection is checked before anything is rendered.
+    """
+    selected = selected_pages(pdf_path, pages)
+    workers = max(1, min(workers or PDF_RENDER_WORKERS, len(selected)))
+    size = max(1, min(PDF_RENDER_CHUNK, -(-len(selected) // workers)))
     base = os.path.splitext(os.path.basename(pdf_path))[0]
-    for i, img in enumerate(images):
-        path = os.path.join(out_dir, f"{base}_page{i+1}.{fmt}")
-        img.save(path, fmt.upper())
-        out_files.append(path)
-    return out_files
-
-def merge_pdfs(pdf_paths, out_pdf):
-    writer = PdfWriter()
-    for p in pdf_paths:
-        reader = PdfReader(p)
-        for page in reader.pages:
-            writer.add_page(page)
-    with open(out_pdf, 'wb') as f:
-        writer.write(f)
+    return _render(pdf_path, out_dir, dpi, fmt, _chunks(selected, size), workers, base)
+
+
+def _render(pdf_path, out_dir, dpi, fmt, chunks, workers, base):
+    executor = get_render_pool()
+    chunks = iter(chunks)
+    pending = deque()
+
+    def submit():
+        chunk = next(chunks, None)
+        if chunk:
+            pending.append((chunk[0], executor.submit(_render_chunk, pdf_path, out_dir, dpi, fmt, *chunk)))
+
+    try:
+        # Keep this document's share busy plus one chunk queued behind each
+        for _ in range(workers * 2):
+            submit()
+        while pending:
+            first, future = pending.popleft()
+            folder, paths = future.result()
+            submit()
+            for page, path in enumerate(paths, first):
+                dest = os.path.join(out_dir, f"{base}_page{page}{os.path.splitext(path)[1]}")
+                os.replace(path, dest)
+                yield dest
+            os.rmdir(folder)
+    finally:
+        # Stopped early (error or client gone): render nothing more, and let
+        # running chunks finish before the caller removes out_dir; what was
+        # already written goes with the workspace
+        for _, future in pending:
+            future.cancel()
+        wait([future for _, future in pending])
+
+def _open_pdf(f, title):
+    reader = PdfReader(f)
+    if reader.is_encrypted and not reader.decrypt(''):
+        raise ValueError(f'{title} is password protected')
+    return reader
+
+
+def _pdf_str(obj):
+    buf = io.BytesIO()
+    obj.write_to_stream(buf)
+    return buf.getvalue().decode('latin-1')
+
+
+def _has_refs(value):
+    if isinstance(value, IndirectObject):
+        return True
+    if isinstance(value, dict):
+        return any(_has_refs(v) for k, v in value.items() if k != '/Length')
+    if isinstance(value, list):
+        return any(_has_refs(v) for v in value)
+    return False
+
+
+class _MergeSource:
+    """Copies the selected pages of one reader into a _PdfFile, following
+    references and renumbering as it goes. Pages outside the selection and
+    the source's page tree are never pulled in."""
+
+    def __init__(self, pdf, reader, indices, parent, streams):
+        self.pdf = pdf
+        self.reader = reader
+        self.parent = parent
+        # Reference-free streams (fonts, images) already written, by digest
+        self.streams = streams
+        self.numbers = {}
+        self.queue = deque()
+        self.skipped = {page.indirect_reference.idnum for page in reader.pages}
+        self.page_numbers = [pdf.reserve() for _ in indices]
+        for index, number in zip(indices, self.page_numbers):
+            self.numbers.setdefault(reader.pages[index].indirect_reference.idnum, number)
+
+    def _ref(self, ref):
+        number = self.numbers.get(ref.idnum)
+        if number is None:
+            if ref.idnum in self.skipped:
+                return NullObject()
+            obj = ref.get_object()
+            if isinstance(obj, DictionaryObject) and obj.get('/Type') in ('/Pages', '/Catalog'):
+                return NullObject()
+            if isinstance(obj, StreamObject) and not _has_refs(obj):
+                number = self._write_leaf(obj)
+            else:
+                number = self.pdf.reserve()
+                self.queue.append((ref, number))
+            self.numbers[ref.idnum] = number
+        return IndirectObject(number, 0, None)
+
+    def _rewrite(self, value):
+        if isinstance(value, IndirectObject):
+            return self._ref(value)
+        if isinstance(value, DictionaryObject):
+            return DictionaryObject({k: self._rewrite(v) for k, v in value.items()})
+        if isinstance(value, ArrayObject):
+            return ArrayObject(self._rewrite(v) for v in value)
+        return value
+
+    def _stream_info(self, obj):
+        return ' '.join(f'{k} {_pdf_str(self._rewrite(v))}' for k, v in obj.items() if k != '/Length')
+
+    def _write_leaf(self, obj):
+        info = self._stream_info(obj)
+        digest = hashlib.sha256(info.encode('latin-1') + b'\0' + obj._data).digest()
+        number = self.streams.get(digest)
+        if number is None:
+            number = self.streams[digest] = self.pdf.reserve()
+            self.pdf.write_stream(number, info, len(obj._data), data=obj._data)
+        return number
+
+    def _drain(self):
+        while self.queue:
+            ref, number = self.queue.popleft()
+            obj = ref.get_object()
+            if isinstance(obj, StreamObject):
+                self.pdf.write_stream(number, self._stream_info(obj), len(obj._data), data=obj._data)
+            else:
+                self.pdf.write(number, _pdf_str(self._rewrite(obj)))
+
+    def copy_page(self, index, number):
+        page = self.reader.pages[index]
+        entries = {k: self._rewrite(v) for k, v in page.items() if k != '/Parent'}
+        entries[NameObject('/Parent')] = IndirectObject(self.parent, 0, None)
+        self.pdf.write(number, _pdf_str(DictionaryObject(entries)))
+        self._drain()
+        # Everything this page needed is on disk; keep only the numbering
+        self.reader.resolved_objects.clear()
+
+    def outline(self, indices):
+        """(title, page number, children) for the source's bookmarks that
+        point at a copied page; the children of dropped ones move up."""
+        first = {}
+        for index, number in zip(indices, self.page_numbers):
+            first.setdefault(index, number)
+
+        def items(entries):
+            result = []
+            for entry in entries:
+                if isinstance(entry, list):
+                    children = items(entry)
+                    if result:
+                        result[-1][2].extend(children)
+                    else:
+                        result.extend(children)
+                    continue
+                children = []
+                number = first.get(self.reader.get_destination_page_number(entry))
+                if number is not None:
+                    result.append((entry.title or '', number, children))
+            return result
+        try:
+            return items(self.reader.outline)
+        except Exception:
+            # A broken outline costs the bookmarks, not the merge
+            return []
+
+
+def _write_outline(pdf, parent, items):
+    """Write sibling bookmarks under parent; returns (first, last, count)."""
+    numbers = [pdf.reserve() for _ in items]
+    count = 0
+    for i, (number, (title, page, children)) in enumerate(zip(numbers, items)):
+        entries = [f'/Title {_pdf_str(TextStringObject(title))}', f'/Parent {parent} 0 R',
+                   f'/Dest [{page} 0 R /Fit]']
+        if i:
+            entries.append(f'/Prev {numbers[i - 1]} 0 R')
+        if i + 1 < len(numbers):
+            entries.append(f'/Next {numbers[i + 1]} 0 R')
+        if children:
+            first, last, below = _write_outline(pdf, number, children)
+            entries.append(f'/First {first} 0 R /Last {last} 0 R /Count {-below}')
+            count += below
+        pdf.write(number, f"<< {' '.join(entries)} >>")
+    return numbers[0], numbers[-1], count + len(items)
+
+
+def merge_pdfs(sources, out_pdf, outline=True, progress=None):
+    """Merge PDFs into out_pdf. sources are paths or (path, pages, title)
+    tuples, where pages is a selection like '3-1,7' (order kept) and title
+    names the source's bookmark.
+
+    Every input is checked against the PDF_MERGE_MAX_* limits before any page
+    is copied (ValueError if over). Pages are copied one at a time straight
+    to out_pdf, so memory holds one page's objects plus the numbering of the
+    current input, however large the result. Fonts and images that are
+    identical across inputs are written once. Form fields, named
+    destinations and other document-level parts of the inputs are not kept.
+    """
+    sources = [s if isinstance(s, tuple) else (s, None, None) for s in sources]
+    if len(sources) > PDF_MERGE_MAX_FILES:
+        raise ValueError(f'At most {PDF_MERGE_MAX_FILES} files can be merged at once')
+    if sum(os.path.getsize(path) for path, _, _ in sources) > PDF_MERGE_MAX_BYTES:
+        raise ValueError(f'Files to merge exceed {PDF_MERGE_MAX_BYTES} bytes in total')
+
+    # Preflight: only each page tree is read here
+    plan = []
+    total = 0
+    for path, pages, title in sources:
+        title = title or os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'rb') as f:
+            count = len(_open_pdf(f, title).pages)
+        try:
+            indices = [n - 1 for n in parse_page_ranges(pages, count)] if pages else list(range(count))
+        except ValueError as e:
+            raise ValueError(f'{title}: {e}')
+        total += len(indices)
+        if total > PDF_MERGE_MAX_PAGES:
+            raise ValueError(f'Merged document would exceed {PDF_MERGE_MAX_PAGES} pages')
+        plan.append((path, indices, title))
+
+    try:
+        with open(out_pdf, 'wb') as out:
+            pdf = _PdfFile(out, version='1.7')
+            catalog, pages = pdf.reserve(), pdf.reserve()
+            kids = []
+            bookmarks = []
+            streams = {}
+            for number, (path, indices, title) in enumerate(plan, 1):
+                with open(path, 'rb') as f:
+                    source = _MergeSource(pdf, _open_pdf(f, title), indices, pages, streams)
+                    for index, page in zip(indices, source.page_numbers):
+                        source.copy_page(index, page)
+                    kids.extend(source.page_numbers)
+                    if outline and indices:
+                        bookmarks.append((title, source.page_numbers[0], source.outline(indices)))
+                if progress:
+                    progress(int(number * 90 / len(plan)), 'processing', f'Merged {number} of {len(plan)} files')
+
+            pdf.write(pages, f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>")
+            root = f'<< /Type /Catalog /Pages {pages} 0 R'
+            if bookmarks:
+                outlines = pdf.reserve()
+                first, last, count = _write_outline(pdf, outlines, bookmarks)
+                pdf.write(outlines, f'<< /Type /Outlines /First {first} 0 R /Last {last} 0 R /Count {count} >>')
+                root += f' /Outlines {outlines} 0 R'
+            pdf.write(catalog, root + ' >>')
+            pdf.close(catalog)
+    except BaseException:
+        if os.path.exists(out_pdf):
+            os.remove(out_pdf)
+        raise
     return out_pdf
 
-def images_to_pdf(image_paths, out_pdf):
-    imgs = [Image.open(p).convert('RGB') for p in image_paths]
-    first, rest = imgs[0], imgs[1:]
-    first.save(out_pdf, save_all=True, append_images=rest)
+# Page sizes in points, portrait
+PAGE_SIZES = {
+    'a3': (841.89, 1190.55),
+    'a4': (595.28, 841.89),
+    'a5': (419.53, 595.28),
+    'letter': (612, 792),
+    'legal': (612, 1008),
+}
+PAGE_FITS = ('contain', 'cover', 'stretch')
+# Formats whose bytes PDF can embed as they are
+PASSTHROUGH = {'JPEG': '/DCTDecode', 'JPEG2000': '/JPXDecode'}
+COLOR_SPACES = {'L': '/DeviceGray', 'RGB': '/DeviceRGB', 'CMYK': '/DeviceCMYK'}
+
+
+class _PdfFile:
+    """Writes numbered PDF objects straight to a file, remembering only
+    their offsets for the cross-reference table."""
+
+    def __init__(self, f, version='1.5'):
+        self.f = f
+        self.offsets = {}
+        self.count = 0
+        f.write(f'%PDF-{version}\n'.encode() + b'%\xe2\xe3\xcf\xd3\n')
+
+    def reserve(self):
+        self.count += 1
+        return self.count
+
+    def write(self, num, body):
+        self.offsets[num] = self.f.tell()
+        self.f.write(f'{num} 0 obj\n{body}\nendobj\n'.encode('latin-1'))
+
+    def write_stream(self, num, info, length, data=None, source=None):
+        """A stream object whose data is bytes, or is copied from the open file source."""
+        self.offsets[num] = self.f.tell()
+        self.f.write(f'{num} 0 obj\n<< {info} /Length {length} >>\nstream\n'.encode('latin-1'))
+        if source is not None:
+            shutil.copyfileobj(source, self.f, 1024 * 1024)
+        else:
+            self.f.write(data)
+        self.f.write(b'\nendstream\nendobj\n')
+
+    def close(self, root):
+        xref = self.f.tell()
+        self.f.write(f'xref\n0 {self.count + 1}\n0000000000 65535 f \n'.encode())
+        for num in range(1, self.count + 1):
+            self.f.write(f'{self.offsets[num]:010d} 00000 n \n'.encode())
+        self.f.write(f'trailer\n<< /Size {self.count + 1} /Root {root} 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+
+
+def _orientation(image):
+    try:
+        return image.getexif().get(0x0112, 1)
+    except Exception:
+        return 1
+
+
+# EXIF orientations that swap the image's width and height
+TRANSPOSED = (5, 6, 7, 8)
+
+
+def _placement(width, height, orientation, x, y):
+    """cm matrix drawing the unit-square image into width x height at (x, y),
+    turned and mirrored upright for EXIF orientations 2 to 8."""
+    return {
+        2: [-width, 0, 0, height, x + width, y],
+        3: [-width, 0, 0, -height, x + width, y + height],
+        4: [width, 0, 0, -height, x, y + height],
+        5: [0, -height, -width, 0, x + width, y + height],
+        6: [0, -height, width, 0, x, y + height],
+        7: [0, height, width, 0, x, y],
+        8: [0, height, -width, 0, x + width, y],
+    }.get(orientation, [width, 0, 0, height, x, y])
+
+
+def _layout(size, page_size, orientation, fit, margin):
+    """(page width, page height, image box) in points for an image of size points."""
+    if page_size == 'image':
+        return size[0] + 2 * margin, size[1] + 2 * margin, (margin, margin, size[0], size[1])
+    page_w, page_h = PAGE_SIZES[page_size]
+    if orientation == 'landscape' or (orientation == 'auto' and size[0] > size[1]):
+        page_w, page_h = page_h, page_w
+    box_w, box_h = page_w - 2 * margin, page_h - 2 * margin
+    if fit == 'stretch':
+        return page_w, page_h, (margin, margin, box_w, box_h)
+    scale = (max if fit == 'cover' else min)(box_w / size[0], box_h / size[1])
+    w, h = size[0] * scale, size[1] * scale
+    return page_w, page_h, (margin + (box_w - w) / 2, margin + (box_h - h) / 2, w, h)
+
+
+def _num(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.')
+
+
+def _write_image(pdf, path):
+    """Write path as an image XObject; returns (object number, pixel size, dpi, orientation)."""
+    num = pdf.reserve()
+    with Image.open(path) as image:
+        orientation = _orientation(image)
+        dpi = image.info.get('dpi', (72, 72))
+        size = image.size
+        if image.format in PASSTHROUGH and (image.format == 'JPEG2000' or image.mode in COLOR_SPACES):
+            # Compressed data goes in untouched: no decode, no quality loss
+            info = f'/Type /XObject /Subtype /Image /Width {size[0]} /Height {size[1]} /Filter {PASSTHROUGH[image.format]}'
+            if image.format == 'JPEG':
+                info += f' /ColorSpace {COLOR_SPACES[image.mode]} /BitsPerComponent 8'
+                if image.mode == 'CMYK' and 'adobe' in image.info:
+                    # Only Adobe (APP14) CMYK JPEGs store inverted values
+                    info += ' /Decode [1 0 1 0 1 0 1 0]'
+            with open(path, 'rb') as f:
+                pdf.write_stream(num, info, os.path.getsize(path), source=f)
+            return num, size, dpi, orientation
+
+        if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+            rgba = image.convert('RGBA')
+            flat = Image.new('RGB', size, 'white')
+            flat.paste(rgba, mask=rgba.getchannel('A'))
+            image = flat
+        elif image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        data = zlib.compress(image.tobytes(), 6)
+    info = (f'/Type /XObject /Subtype /Image /Width {size[0]} /Height {size[1]} '
+            f'/ColorSpace {COLOR_SPACES[image.mode]} /BitsPerComponent 8 /Filter /FlateDecode')
+    pdf.write_stream(num, info, len(data), data=data)
+    return num, size, dpi, orientation
+
+
+def images_to_pdf(image_paths, out_pdf, page_size='image', orientation='auto', fit='contain', margin=0):
+    """One page per image. page_size is 'image' (the page matches the image at
+    its own dpi) or a PAGE_SIZES name, on which the image is placed by fit.
+
+    Objects are written to out_pdf as each image is processed, so memory
+    holds at most one decoded image. JPEG and JPEG 2000 files are embedded
+    byte for byte, and EXIF rotation and mirroring are applied on the page
+    instead.
+    """
+    if page_size != 'image' and page_size not in PAGE_SIZES:
+        raise ValueError(f"Unknown page size '{page_size}'. Choose from: image, {', '.join(PAGE_SIZES)}")
+    if fit not in PAGE_FITS:
+        raise ValueError(f"Unknown fit '{fit}'. Choose from: {', '.join(PAGE_FITS)}")
+    if orientation not in ('auto', 'portrait', 'landscape'):
+        raise ValueError("Orientation must be auto, portrait or landscape")
+    if not math.isfinite(margin) or margin < 0 or (page_size != 'image' and 2 * margin >= min(PAGE_SIZES[page_size])):
+        raise ValueError('Margin does not fit on the page')
+    image_paths = list(image_paths)
+    if not image_paths:
+        raise ValueError('No images to convert')
+
+    try:
+        with open(out_pdf, 'wb') as f:
+            pdf = _PdfFile(f)
+            catalog, pages = pdf.reserve(), pdf.reserve()
+            kids = []
+            for path in image_paths:
+                image, pixels, dpi, turn = _write_image(pdf, path)
+                points = [pixels[i] * 72 / (dpi[i] or 72) for i in (0, 1)]
+                if turn in TRANSPOSED:
+                    points.reverse()
+                page_w, page_h, (x, y, w, h) = _layout(points, page_size, orientation, fit, margin)
+
+                content = ''
+                if fit == 'cover':
+                    content += f'{_num(margin)} {_num(margin)} {_num(page_w - 2 * margin)} {_num(page_h - 2 * margin)} re W n\n'
+                matrix = ' '.join(_num(v) for v in _placement(w, h, turn, x, y))
+                content = f'q\n{content}{matrix} cm\n/Im0 Do\nQ\n'.encode()
+                content_num = pdf.reserve()
+                pdf.write_stream(content_num, '', len(content), data=content)
+
+                page = pdf.reserve()
+                pdf.write(page, f'<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {_num(page_w)} {_num(page_h)}] '
+                                f'/Resources << /XObject << /Im0 {image} 0 R >> >> /Contents {content_num} 0 R >>')
+                kids.append(page)
+
+            pdf.write(pages, f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>")
+            pdf.write(catalog, f'<< /Type /Catalog /Pages {pages} 0 R >>')
+            pdf.close(catalog)
+    except BaseException:
+        # A half-written PDF is worse than none
+        if os.path.exists(out_pdf):
+            os.remove(out_pdf)
+        raise
     return out_pdf
@@ -1,19 +1,15 @@
 
-import os
-import subprocess
-import shutil
+from utils.lo_pool import libreoffice_path, convert as lo_convert
 
 def has_libreoffice():
     """Check if LibreOffice is available"""
-    return shutil.which('soffice') is not None
+    return libreoffice_path() is not None
 
 def convert_presentation(in_path, out_path, out_format):
     """Convert presentations using LibreOffice Impress"""
     if not has_libreoffice():
         raise RuntimeError('LibreOffice not found. Install with: nix-env -iA nixpkgs.libreoffice')
     
-    out_dir = os.path.dirname(out_path)
-    
     # Map format extensions to LibreOffice format names
     format_map = {
         'pdf': 'pdf',
@@ -25,10 +21,4 @@ def convert_presentation(in_path, out_path, out_format):
     
     lo_format = format_map.get(out_format.lower(), out_format)
     
-    cmd = ['soffice', '--headless', '--convert-to', lo_format, '--outdir', out_dir, in_path]
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise RuntimeError(f'Presentation conversion failed: {result.stderr}')
-    
-    return out_path
+    return lo_convert(in_path, out_path, lo_format)
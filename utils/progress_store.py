@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import glob
+import socket
+import sqlite3
+import tempfile
+import threading
+
+PROGRESS_BACKEND = os.getenv('PROGRESS_BACKEND', 'sqlite').lower()
+PROGRESS_DIR = os.getenv('PROGRESS_DIR', os.path.join(tempfile.gettempdir(), 'pptools_progress'))
+PROGRESS_TTL = int(os.getenv('PROGRESS_TTL', '3600'))
+PURGE_INTERVAL = 30
+
+TERMINAL_STATUSES = ('complete', 'error', 'cancelled')
+
+
+class MemoryProgressStore:
+    """Progress entries in a dict; only visible to the current process."""
+
+    def __init__(self, ttl=PROGRESS_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._cond = threading.Condition()
+        self._last_purge = time.monotonic()
+
+    def set(self, channel, task_id, data, ttl=None):
+        key = (channel, task_id)
+        with self._cond:
+            version = self._entries.get(key, (0,))[0] + 1
+            self._entries[key] = (version, data, time.time() + (ttl or self.ttl))
+            self._purge()
+            self._cond.notify_all()
+
+    def get(self, channel, task_id):
+        """Return (version, data) or None."""
+        with self._cond:
+            return self._get((channel, task_id))
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[2] < time.time():
+            return None
+        return entry[0], entry[1]
+
+    def wait(self, channel, task_id, after_version=0, timeout=None):
+        """Block until the entry is newer than after_version; None on timeout."""
+        key = (channel, task_id)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                entry = self._get(key)
+                if entry and entry[0] > after_version:
+                    return entry
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def expire(self, channel, task_id, delay):
+        """Drop the entry delay seconds from now."""
+        key = (channel, task_id)
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries[key] = (entry[0], entry[1], time.time() + delay)
+
+    def _purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        cutoff = time.time()
+        for key in [k for k, e in self._entries.items() if e[2] < cutoff]:
+            del self._entries[key]
+
+
+class SQLiteProgressStore:
+    """Progress entries in a shared SQLite file, visible to every worker process.
+
+    Writers wake waiters in other processes by sending the changed key to
+    each process's Unix datagram socket in PROGRESS_DIR/notify.
+    """
+
+    def __init__(self, directory=PROGRESS_DIR, ttl=PROGRESS_TTL):
+        self.ttl = ttl
+        self.db_path = os.path.join(directory, 'progress.sqlite3')
+        self.notify_dir = os.path.join(directory, 'notify')
+        os.makedirs(self.notify_dir, exist_ok=True)
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._bumps = {}
+        self._listener_pid = None
+        self._last_purge = 0
+        self._init_db()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_db(self):
+        self._conn().execute('''
+            CREATE TABLE IF NOT EXISTS progress (
+                channel TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (channel, task_id)
+            )
+        ''')
+
+    def set(self, channel, task_id, data, ttl=None):
+        conn = self._conn()
+        conn.execute(
+            'INSERT INTO progress (channel, task_id, version, data, expires_at) VALUES (?, ?, 1, ?, ?) '
+            'ON CONFLICT (channel, task_id) DO UPDATE SET version = version + 1, '
+            'data = excluded.data, expires_at = excluded.expires_at',
+            (channel, task_id, json.dumps(data), time.time() + (ttl or self.ttl))
+        )
+        self._purge(conn)
+        self._notify(channel, task_id)
+
+    def get(self, channel, task_id):
+        """Return (version, data) or None."""
+        row = self._conn().execute(
+            'SELECT version, data FROM progress WHERE channel = ? AND task_id = ? AND expires_at >= ?',
+            (channel, task_id, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def wait(self, channel, task_id, after_version=0, timeout=None):
+        """Block until the entry is newer than after_version; None on timeout."""
+        self._ensure_listener()
+        key = f'{channel}/{task_id}'
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                seen = self._bumps.get(key, 0)
+                entry = self.get(channel, task_id)
+                if entry and entry[0] > after_version:
+                    return entry
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                # Re-read at least every few seconds in case a datagram was dropped
+                self._cond.wait_for(
+                    lambda: self._bumps.get(key, 0) != seen,
+                    5 if remaining is None else min(remaining, 5)
+                )
+
+    def expire(self, channel, task_id, delay):
+        """Drop the entry delay seconds from now."""
+        self._conn().execute(
+            'UPDATE progress SET expires_at = ? WHERE channel = ? AND task_id = ?',
+            (time.time() + delay, channel, task_id)
+        )
+
+    def _purge(self, conn):
+        now = time.monotonic()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        conn.execute('DELETE FROM progress WHERE expires_at < ?', (time.time(),))
+
+    def _socket_path(self, pid):
+        return os.path.join(self.notify_dir, f'{pid}.sock')
+
+    def _ensure_listener(self):
+        pid = os.getpid()
+        with self._cond:
+            if self._listener_pid == pid:
+                return
+            path = self._socket_path(pid)
+            if os.path.exists(path):
+                os.remove(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+            self._listener_pid = pid
+        threading.Thread(target=self._listen, args=(sock,), daemon=True).start()
+
+    def _listen(self, sock):
+        while True:
+            key = sock.recv(1024).decode('utf-8', 'replace')
+            with self._cond:
+                if len(self._bumps) > 10000:
+                    self._bumps.clear()
+                self._bumps[key] = self._bumps.get(key, 0) + 1
+                self._cond.notify_all()
+
+    def _notify(self, channel, task_id):
+        payload = f'{channel}/{task_id}'.encode('utf-8')[:1024]
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for path in glob.glob(os.path.join(self.notify_dir, '*.sock')):
+                try:
+                    sock.sendto(payload, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Nobody is bound there any more: the process has exited
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                except OSError:
+                    pass
+        finally:
+            sock.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the configured progress store (PROGRESS_BACKEND=sqlite|memory)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if PROGRESS_BACKEND == 'memory':
+                _store = MemoryProgressStore()
+            else:
+                _store = SQLiteProgressStore()
+        return _store
+
+
+def update_progress(task_id, progress, status='processing', message='', channel='conversion'):
+    """Update progress for a task"""
+    get_store().set(channel, task_id, {
+        'progress': progress,
+        'status': status,
+        'message': message
+    })
+
+
+def cleanup_progress(task_id, delay=5):
+    """Expire progress data for a task after a delay"""
+    if not task_id:
+        return
+    store = get_store()
+    store.expire('conversion', task_id, delay)
+    store.expire('download', task_id, delay)
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import uuid
+import tempfile
+import threading
+
+CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+CACHE_DIR = os.getenv('RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pptools_cache'))
+CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+HASH_CHUNK = 1024 * 1024
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def normalize_params(params):
+    """Canonical form of conversion options so equivalent requests share a key."""
+    out = {}
+    for name, value in params.items():
+        if value is None or value == '':
+            continue
+        if isinstance(value, (tuple, list)):
+            value = [normalize_params({'v': v}).get('v') for v in value]
+        elif isinstance(value, str):
+            value = value.strip().lower()
+            if value.isdigit():
+                value = int(value)
+        out[name] = value
+    return out
+
+
+def cache_key(tool, input_hash, params):
+    payload = json.dumps(
+        {'tool': tool, 'input': input_hash, 'params': normalize_params(params)},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _link_or_copy(src, dest):
+    try:
+        os.link(src, dest)
+    except OSError:
+        # Different filesystem or no link support; a missing src fails here too
+        shutil.copyfile(src, dest)
+
+
+class ResultCache:
+    """Disk-backed, size-bounded LRU cache of conversion outputs."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, 'data'), exist_ok=True)
+        self.db_path = os.path.join(directory, 'index.sqlite3')
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)')
+        conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _path(self, filename):
+        return os.path.join(self.directory, 'data', filename)
+
+    def _count(self, name, n=1):
+        self._conn().execute(
+            'INSERT INTO counters (name, value) VALUES (?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+            (name, n)
+        )
+
+    def get(self, key, dest_dir):
+        """Link (or copy) the cached file for key into dest_dir and return the
+        new path, or None on a miss. The caller owns the returned file, so a
+        later eviction cannot pull it away before it is sent."""
+        conn = self._conn()
+        row = conn.execute('SELECT filename FROM entries WHERE key = ?', (key,)).fetchone()
+        if row:
+            dest = os.path.join(dest_dir, f'cached_{uuid.uuid4().hex}{os.path.splitext(row[0])[1]}')
+            try:
+                _link_or_copy(self._path(row[0]), dest)
+            except FileNotFoundError:
+                # Evicted by another worker since the lookup
+                conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            else:
+                conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+                self._count('hits')
+                return dest
+        self._count('misses')
+        return None
+
+    def put(self, key, src_path):
+        """Store a copy of src_path under key. Returns False, storing nothing,
+        when the file alone is larger than the cache."""
+        size = os.path.getsize(src_path)
+        if size > self.max_bytes:
+            return False
+        filename = key + os.path.splitext(src_path)[1].lower()
+        final = self._path(filename)
+
+        # Write beside the target, then rename: readers never see partial files
+        tmp = self._path(f'.tmp_{uuid.uuid4().hex}')
+        try:
+            _link_or_copy(src_path, tmp)
+            os.replace(tmp, final)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        self._conn().execute(
+            'INSERT OR REPLACE INTO entries (key, filename, size, last_access) VALUES (?, ?, ?, ?)',
+            (key, filename, size, time.time())
+        )
+        self._evict()
+        return True
+
+    def _evict(self):
+        conn = self._conn()
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, filename, size in conn.execute(
+            'SELECT key, filename, size FROM entries ORDER BY last_access'
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(filename))
+            except FileNotFoundError:
+                pass
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+        self._count('evictions', evicted)
+
+    def stats(self):
+        conn = self._conn()
+        counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+        entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'evictions': counters.get('evictions', 0),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
+
+
+def cached_result(tool, in_path, params, produce, input_hash=None):
+    """Return produce()'s output path, served from the cache when an identical
+    conversion (same input bytes, tool and options) has been done before.
+
+    Hits are linked in beside in_path, which lives in the request's
+    workspace, so the returned file always belongs to the caller."""
+    if not CACHE_ENABLED:
+        return produce()
+
+    cache = get_cache()
+    key = cache_key(tool, input_hash or file_sha256(in_path), params)
+    hit = cache.get(key, os.path.dirname(os.path.abspath(in_path)))
+    if hit:
+        return hit
+
+    result = produce()
+    try:
+        cache.put(key, result)
+    except OSError as e:
+        print(f"Result cache write failed: {e}")
+    return result
@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import threading
+from utils.progress_store import TERMINAL_STATUSES
+
+SSE_HEARTBEAT = float(os.getenv('SSE_HEARTBEAT', '15'))
+SSE_MAX_IDLE = float(os.getenv('SSE_MAX_IDLE', '300'))
+SSE_UNKNOWN_TASK_TIMEOUT = float(os.getenv('SSE_UNKNOWN_TASK_TIMEOUT', '120'))
+SSE_MAX_CONNECTIONS = int(os.getenv('SSE_MAX_CONNECTIONS', '16'))
+SSE_RETRY_MS = 3000
+# Event id of a stream's last event. EventSource reconnects after any close
+# and sends it back as Last-Event-ID, which is answered with 204 to stop it
+SSE_FINAL_ID = 'end'
+
+
+class ConnectionCounter:
+    """Counts open SSE streams in this process and enforces a cap."""
+
+    def __init__(self, limit=SSE_MAX_CONNECTIONS):
+        self.limit = limit
+        self.open = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.open >= self.limit:
+                self.rejected += 1
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+    def stats(self):
+        return {'open': self.open, 'limit': self.limit, 'rejected': self.rejected}
+
+
+connections = ConnectionCounter()
+
+
+def progress_stream(store, channel, task_id):
+    """Yield SSE frames for a task: one event per state change, keepalive comments
+    in between, ending on a terminal status or, after too long without changes,
+    on an 'expired' one. The last event carries SSE_FINAL_ID."""
+    version = 0
+    seen = False
+    last_change = time.monotonic()
+
+    yield f'retry: {SSE_RETRY_MS}\n\n'
+    while True:
+        idle_limit = SSE_MAX_IDLE if seen else SSE_UNKNOWN_TASK_TIMEOUT
+        idle = time.monotonic() - last_change
+        if idle >= idle_limit:
+            data = {'progress': 0, 'status': 'expired', 'message': 'No progress reported'}
+            yield f"id: {SSE_FINAL_ID}\ndata: {json.dumps(data)}\n\n"
+            return
+
+        entry = store.wait(channel, task_id, version, timeout=min(SSE_HEARTBEAT, idle_limit - idle))
+        if entry is None:
+            yield ': keepalive\n\n'
+            continue
+
+        version, data = entry
+        seen = True
+        last_change = time.monotonic()
+        if data.get('status') in TERMINAL_STATUSES:
+            yield f"id: {SSE_FINAL_ID}\ndata: {json.dumps(data)}\n\n"
+            return
+        yield f"data: {json.dumps(data)}\n\n"
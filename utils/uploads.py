@@ -0,0 +1,184 @@
+import os
+import uuid
+import hashlib
+from flask import Request
+from werkzeug.utils import secure_filename
+from utils.workspace import Workspace
+
+MB = 1024 * 1024
+DEFAULT_UPLOAD_LIMIT = int(os.getenv('MAX_UPLOAD_BYTES', str(512 * MB)))
+
+# Per-tool upload limits, keyed by the first path segment after /api/
+TOOL_UPLOAD_LIMITS = {
+    'video': 4096 * MB,
+    'audio': 1024 * MB,
+    'archive': 2048 * MB,
+    'image': 256 * MB,
+    'pdf': 512 * MB,
+    'ocr': 256 * MB,
+    'office': 256 * MB,
+    'presentation': 256 * MB,
+    'spreadsheet': 256 * MB,
+    'ebook': 256 * MB,
+    'vector': 128 * MB,
+    'cad': 256 * MB,
+    'font': 32 * MB,
+    'qr': 32 * MB,
+    'optimize': 512 * MB,
+    'history': 512 * MB,
+}
+
+SNIFF_BYTES = 2048
+
+
+def upload_limit(path):
+    """Byte limit for a request path; UPLOAD_LIMIT_<TOOL> overrides the default."""
+    parts = path.strip('/').split('/')
+    tool = parts[1] if len(parts) > 1 and parts[0] == 'api' else ''
+    env = os.getenv(f'UPLOAD_LIMIT_{tool.upper()}')
+    if env:
+        return int(env)
+    return TOOL_UPLOAD_LIMITS.get(tool, DEFAULT_UPLOAD_LIMIT)
+
+
+def sniff_format(head):
+    """Guess a file format from its first bytes; None when unknown."""
+    if b'%PDF-' in head[:1024]:
+        return 'pdf'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head.startswith(b'RIFF') and len(head) >= 12:
+        return {b'WEBP': 'webp', b'WAVE': 'wav', b'AVI ': 'avi'}.get(head[8:12])
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand in (b'heic', b'heix', b'mif1', b'msf1'):
+            return 'heic'
+        if brand == b'avif':
+            return 'avif'
+        if brand in (b'M4A ', b'M4B '):
+            return 'm4a'
+        if brand == b'qt  ':
+            return 'mov'
+        if brand in (b'jp2 ', b'jpx '):
+            return 'jp2'
+        return 'mp4'
+    if head.startswith(b'\x00\x00\x00\x0cjP  \r\n\x87\n'):
+        return 'jp2'
+    if head.startswith(b'\x1aE\xdf\xa3'):
+        return 'webm' if b'webm' in head[:64] else 'mkv'
+    if head.startswith(b'ID3') or head[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+        return 'mp3'
+    if head.startswith(b'OggS'):
+        return 'ogg'
+    if head.startswith(b'fLaC'):
+        return 'flac'
+    if head.startswith(b'PK\x03\x04') or head.startswith(b'PK\x05\x06'):
+        return 'zip'
+    if head.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        return 'ole'
+    if head.startswith(b'7z\xbc\xaf\x27\x1c'):
+        return '7z'
+    if head.startswith(b'Rar!'):
+        return 'rar'
+    if head.startswith(b'\x1f\x8b'):
+        return 'gz'
+    if head.startswith(b'BZh'):
+        return 'bz2'
+    if head.startswith(b'\xfd7zXZ\x00'):
+        return 'xz'
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'tiff'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head.startswith(b'8BPS'):
+        return 'psd'
+    if head.startswith(b'\x00\x00\x01\x00'):
+        return 'ico'
+    if head.startswith(b'wOFF'):
+        return 'woff'
+    if head.startswith(b'wOF2'):
+        return 'woff2'
+    if head.startswith(b'OTTO'):
+        return 'otf'
+    if head.startswith(b'\x00\x01\x00\x00'):
+        return 'ttf'
+    if head.startswith(b'%!PS'):
+        return 'ps'
+    if head.startswith(b'{\\rtf'):
+        return 'rtf'
+    if head.lstrip().startswith(b'<svg') or (head.lstrip().startswith(b'<?xml') and b'<svg' in head):
+        return 'svg'
+    return None
+
+
+class IngestedFile:
+    """Upload target that hashes and sniffs bytes while Werkzeug writes them."""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._head = b''
+        self._file = open(path, 'w+b')
+
+    def write(self, data):
+        self._hash.update(data)
+        if len(self._head) < SNIFF_BYTES:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    @property
+    def kind(self):
+        return sniff_format(self._head)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class IngestRequest(Request):
+    """Request whose multipart file parts stream straight into its workspace."""
+
+    _workspace = None
+
+    @property
+    def workspace(self):
+        """The request's Workspace, created on first use."""
+        if self._workspace is None:
+            self._workspace = Workspace()
+        return self._workspace
+
+    @property
+    def has_workspace(self):
+        return self._workspace is not None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        safe_name = secure_filename(filename or '') or 'upload'
+        return IngestedFile(self.workspace.file(f"{uuid.uuid4()}_{safe_name}"))
+
+
+def ingested(file):
+    """The IngestedFile behind a FileStorage, or None."""
+    stream = getattr(file, 'stream', None)
+    return stream if isinstance(stream, IngestedFile) else None
+
+
+def upload_sha256(file):
+    stream = ingested(file)
+    return stream.sha256 if stream else None
+
+
+def upload_kind(file):
+    stream = ingested(file)
+    return stream.kind if stream else None
@@ -0,0 +1,264 @@
+import os
+import time
+import codecs
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+URL_METADATA_TTL = int(os.getenv('URL_METADATA_TTL', '3600'))
+URL_METADATA_CACHE_SIZE = int(os.getenv('URL_METADATA_CACHE_SIZE', '2048'))
+URL_METADATA_WORKERS = int(os.getenv('URL_METADATA_WORKERS', '16'))
+URL_METADATA_TIMEOUT = float(os.getenv('URL_METADATA_TIMEOUT', '10'))
+# Stop reading a page after this many bytes even if </head> never came
+URL_METADATA_MAX_BYTES = int(os.getenv('URL_METADATA_MAX_BYTES', str(512 * 1024)))
+# After </head>, read up to this much more so the connection can go back to
+# the pool; a longer page costs its connection instead
+URL_METADATA_DRAIN_BYTES = int(os.getenv('URL_METADATA_DRAIN_BYTES', str(64 * 1024)))
+CHUNK_SIZE = 16 * 1024
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+TITLE_KEYS = ('og:title',)
+AUTHOR_KEYS = ('author', 'article:author', 'citation_author')
+DATE_KEYS = ('article:published_time', 'publication_date', 'date', 'og:updated_time')
+
+
+def normalize_url(url):
+    """Canonical form of a user-entered URL (scheme added, host lowercased,
+    default port and fragment dropped); ValueError if it is not a website URL."""
+    url = (url or '').strip()
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if not host or '.' not in host:
+        raise ValueError('Invalid URL format. Please enter a valid website URL.')
+    netloc = host
+    if parts.port and parts.port != {'http': 80, 'https': 443}[parts.scheme]:
+        netloc = f'{host}:{parts.port}'
+    return urlunsplit((parts.scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+class HeadParser(HTMLParser):
+    """Collects <title> and <meta> tags, stopping at the end of <head>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.title = None
+        self.done = False
+        self._in_title = False
+        self._title_parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'body':
+            self.done = True
+        elif tag == 'title' and self.title is None:
+            self._in_title = True
+        elif tag == 'meta':
+            attrs = dict(attrs)
+            key = attrs.get('property') or attrs.get('name')
+            if key and attrs.get('content') and key.lower() not in self.meta:
+                self.meta[key.lower()] = attrs['content'].strip()
+
+    def handle_endtag(self, tag):
+        if tag == 'title' and self._in_title:
+            self._in_title = False
+            self.title = ''.join(self._title_parts).strip()
+        elif tag == 'head':
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+
+    def first(self, keys):
+        for key in keys:
+            if self.meta.get(key):
+                return self.meta[key]
+        return None
+
+
+def parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+    except ValueError:
+        return value
+
+
+def read_head(response):
+    """Feed the response to a HeadParser until </head>, reading no further."""
+    parser = HeadParser()
+    encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '') else 'utf-8'
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    read = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        read += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.done or read >= URL_METADATA_MAX_BYTES:
+            break
+    return parser
+
+
+def drain(response, limit=URL_METADATA_DRAIN_BYTES):
+    """Read the rest of response if it is short. Only a fully read response
+    releases its connection to the pool; closing it early drops it."""
+    read = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        read += len(chunk)
+        if read > limit:
+            return
+
+
+class MetadataCache:
+    """LRU of url -> (metadata, etag, last_modified, expires)."""
+
+    def __init__(self, size=URL_METADATA_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url, metadata, etag, last_modified, ttl=URL_METADATA_TTL):
+        with self._lock:
+            self._entries[url] = (metadata, etag, last_modified, time.monotonic() + ttl)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+            }
+
+
+class MetadataFetcher:
+    """Fetches page metadata over one pooled session, through a TTL cache."""
+
+    def __init__(self, workers=URL_METADATA_WORKERS):
+        self.workers = workers
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.cache = MetadataCache()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='url-metadata')
+
+    def fetch(self, url):
+        """Metadata for url, from cache while fresh. Stale entries are
+        revalidated with If-None-Match/If-Modified-Since when the server gave
+        validators. Raises ValueError or requests.RequestException."""
+        url = normalize_url(url)
+        entry = self.cache.get(url)
+        if entry is not None and entry[3] > time.monotonic():
+            self.cache.count('hits')
+            return self._result(entry[0])
+
+        headers = {}
+        if entry is not None:
+            if entry[1]:
+                headers['If-None-Match'] = entry[1]
+            if entry[2]:
+                headers['If-Modified-Since'] = entry[2]
+
+        with self.session.get(url, headers=headers, timeout=URL_METADATA_TIMEOUT, stream=True) as response:
+            if response.status_code == 304 and entry is not None:
+                self.cache.count('revalidated')
+                metadata = entry[0]
+            else:
+                response.raise_for_status()
+                self.cache.count('misses')
+                parser = read_head(response)
+                drain(response)
+                metadata = {
+                    'url': url,
+                    'title': parser.first(TITLE_KEYS) or parser.title,
+                    'author': parser.first(AUTHOR_KEYS),
+                    'publishDate': parse_date(parser.first(DATE_KEYS)),
+                }
+            self.cache.put(url, metadata, response.headers.get('ETag') or (entry and entry[1]),
+                           response.headers.get('Last-Modified') or (entry and entry[2]))
+        return self._result(metadata)
+
+    def _result(self, metadata):
+        # accessDate is the day of the lookup, not of the cached fetch
+        return dict(metadata, accessDate=datetime.now().strftime('%Y-%m-%d'))
+
+    def fetch_many(self, urls):
+        """[{'url', 'metadata'} or {'url', 'error'}] in the order of urls,
+        fetching distinct URLs in parallel."""
+        futures = {}
+        keys = []
+        for url in urls:
+            try:
+                key = normalize_url(url)
+            except ValueError as e:
+                key = e
+            else:
+                if key not in futures:
+                    futures[key] = self._executor.submit(self.fetch, key)
+            keys.append(key)
+        results = []
+        for url, key in zip(urls, keys):
+            try:
+                if isinstance(key, ValueError):
+                    raise key
+                results.append({'url': url, 'metadata': futures[key].result()})
+            except ValueError as e:
+                results.append({'url': url, 'error': str(e)})
+            except requests.RequestException as e:
+                results.append({'url': url, 'error': f'Failed to fetch URL: {e}'})
+        return results
+
+    def stats(self):
+        return dict(self.cache.stats(), workers=self.workers)
+
+
+_fetcher = None
+_fetcher_pid = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """The fetcher for this process; sessions and threads do not survive fork."""
+    global _fetcher, _fetcher_pid
+    with _fetcher_lock:
+        if _fetcher is None or _fetcher_pid != os.getpid():
+            _fetcher = MetadataFetcher()
+            _fetcher_pid = os.getpid()
+        return _fetcher
+
+
+def fetcher_stats():
+    """Cache metrics, or None before this process has fetched anything."""
+    fetcher = _fetcher
+    if fetcher is None or _fetcher_pid != os.getpid():
+        return None
+    return fetcher.stats()
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import tempfile
+import threading
+
+WORKSPACE_ROOT = os.getenv('WORKSPACE_ROOT', os.path.join(tempfile.gettempdir(), 'pptools_work'))
+# Orphaned workspaces (owner gone) older than this are removed
+WORKSPACE_MAX_AGE = int(os.getenv('WORKSPACE_MAX_AGE', '600'))
+# Workspaces older than this are removed even if a request still holds them
+WORKSPACE_HARD_MAX_AGE = int(os.getenv('WORKSPACE_HARD_MAX_AGE', '21600'))
+JANITOR_INTERVAL = int(os.getenv('JANITOR_INTERVAL', '60'))
+# Fraction of the disk in use above which orphans are removed regardless of age
+DISK_HIGH_WATER = float(os.getenv('DISK_HIGH_WATER', '0.85'))
+DISK_LOW_WATER = float(os.getenv('DISK_LOW_WATER', '0.75'))
+ORPHAN_GRACE = 5
+LOCK_NAME = '.lock'
+
+
+def dir_size(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def disk_usage(path=WORKSPACE_ROOT):
+    """Fraction of the filesystem holding path that is in use."""
+    usage = shutil.disk_usage(path)
+    return (usage.total - usage.free) / usage.total if usage.total else 0.0
+
+
+class Workspace:
+    """A private directory owning every file a request creates.
+
+    The directory holds a shared flock for as long as it is open, so the
+    janitor can tell live workspaces from ones whose process died.
+    """
+
+    def __init__(self, root=WORKSPACE_ROOT):
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, uuid.uuid4().hex)
+        os.mkdir(self.path)
+        self._lock = open(os.path.join(self.path, LOCK_NAME), 'w')
+        fcntl.flock(self._lock, fcntl.LOCK_SH)
+        self.closed = False
+
+    def file(self, name):
+        """Path for a new file called name inside the workspace."""
+        if self.closed:
+            raise RuntimeError('Workspace is closed')
+        return os.path.join(self.path, name)
+
+    def mkdtemp(self, prefix=''):
+        return tempfile.mkdtemp(dir=self.file(''), prefix=prefix)
+
+    def _release(self):
+        self.closed = True
+        if not self._lock.closed:
+            self._lock.close()
+
+    def cleanup(self):
+        """Delete the workspace and everything in it."""
+        if self.closed:
+            return
+        self._release()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def transfer(self, dest, values):
+        """Move the workspace to dest (which must not exist) for an owner that
+        outlives the request, returning values with paths rewritten to match."""
+        if self.closed:
+            raise RuntimeError('Workspace is closed')
+        self._release()
+        os.remove(os.path.join(self.path, LOCK_NAME))
+        shutil.move(self.path, dest)
+
+        prefix = self.path + os.sep
+
+        def rewrite(value):
+            if isinstance(value, str) and value.startswith(prefix):
+                return os.path.join(dest, value[len(prefix):])
+            if isinstance(value, (list, tuple)):
+                return type(value)(rewrite(v) for v in value)
+            return value
+
+        return {name: rewrite(value) for name, value in values.items()}
+
+
+def _in_use(path):
+    """True while some process holds the workspace's lock."""
+    try:
+        fd = os.open(os.path.join(path, LOCK_NAME), os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+
+class Janitor:
+    """Periodically removes orphaned workspaces under root.
+
+    Every process runs one; a lock file makes sure only one sweeps at a time,
+    and totals are kept in janitor.json so any process can report them.
+    """
+
+    def __init__(self, root=WORKSPACE_ROOT, interval=JANITOR_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.stats_path = os.path.join(root, 'janitor.json')
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Workspace janitor error: {e}")
+
+    def _workspaces(self):
+        entries = []
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    try:
+                        entries.append((entry.stat(follow_symlinks=False).st_mtime, entry.path))
+                    except FileNotFoundError:
+                        pass
+        return sorted(entries)
+
+    def sweep(self):
+        """Remove stale workspaces; returns (removed, bytes_reclaimed) or None
+        when another process is already sweeping."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, 'janitor.lock'), 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+
+            now = time.time()
+            pressure = disk_usage(self.root) >= DISK_HIGH_WATER
+            removed = reclaimed = 0
+
+            # Oldest first, so under disk pressure the longest-abandoned go first
+            for mtime, path in self._workspaces():
+                age = now - mtime
+                if age < ORPHAN_GRACE:
+                    continue
+                if age < WORKSPACE_HARD_MAX_AGE:
+                    if _in_use(path):
+                        continue
+                    if age < WORKSPACE_MAX_AGE and not pressure:
+                        continue
+                size = dir_size(path)
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+                reclaimed += size
+                if pressure and disk_usage(self.root) < DISK_LOW_WATER:
+                    pressure = False
+
+            self._record(removed, reclaimed, now)
+            return removed, reclaimed
+
+    def _record(self, removed, reclaimed, now):
+        totals = self._load()
+        totals['sweeps'] = totals.get('sweeps', 0) + 1
+        totals['removed'] = totals.get('removed', 0) + removed
+        totals['bytes_reclaimed'] = totals.get('bytes_reclaimed', 0) + reclaimed
+        totals['last_sweep'] = now
+        totals['last_bytes_reclaimed'] = reclaimed
+        tmp = f'{self.stats_path}.{os.getpid()}'
+        with open(tmp, 'w') as f:
+            json.dump(totals, f)
+        os.replace(tmp, self.stats_path)
+
+    def _load(self):
+        try:
+            with open(self.stats_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def stats(self):
+        totals = self._load()
+        os.makedirs(self.root, exist_ok=True)
+        return {
+            'workspaces': len(self._workspaces()),
+            'disk_used': round(disk_usage(self.root), 4),
+            'disk_high_water': DISK_HIGH_WATER,
+            'sweeps': totals.get('sweeps', 0),
+            'removed': totals.get('removed', 0),
+            'bytes_reclaimed': totals.get('bytes_reclaimed', 0),
+            'last_sweep': totals.get('last_sweep'),
+            'last_bytes_reclaimed': totals.get('last_bytes_reclaimed', 0),
+        }
+
+
+janitor = Janitor()
@@ -0,0 +1,132 @@
+import os
+import yt_dlp
+
+CLIENT_PROFILES = [
+    {
+        'http_headers': {
+            'User-Agent': 'com.google.android.youtube/18.17.36 (Linux; U; Android 13; en_US) gzip',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'X-YouTube-Client-Name': '3',
+            'X-YouTube-Client-Version': '18.17.36',
+        },
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['android'],
+                'skip': ['dash', 'configs']
+            }
+        }
+    },
+    {
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept-Language': 'en-US,en;q=0.9',
+        },
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['web']
+            }
+        }
+    },
+    {
+        'http_headers': {
+            'User-Agent': 'YouTube/18.15.1 CFNetwork/1240.0.4 Darwin/20.6.0',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'X-YouTube-Client-Name': '5',
+            'X-YouTube-Client-Version': '18.15.1',
+        },
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['ios'],
+                'skip': ['dash', 'configs']
+            }
+        }
+    }
+]
+
+DOWNLOAD_EXTENSIONS = ['.mp4', '.mkv', '.webm', '.mp3', '.m4a']
+
+
+def download_youtube(url, output_path, format_type='mp4', progress=None):
+    """Download a YouTube video to output_path(.ext).
+
+    progress(progress, status, message) is called from yt-dlp's hooks.
+    Returns (final_path, download_name).
+    """
+
+    def progress_hook(d):
+        if not progress:
+            return
+        if d['status'] == 'downloading':
+            try:
+                percent = d.get('_percent_str', '0%').strip().replace('%', '')
+                pct = float(percent)
+                progress(pct, 'downloading', f'Downloading... {int(pct)}%')
+            except Exception as e:
+                print(f"Error in progress hook: {e}")
+                progress(0, 'error', f'Progress tracking failed: {str(e)}')
+        elif d['status'] == 'finished':
+            progress(95, 'processing', 'Processing...')
+
+    base_opts = {
+        'format': 'bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best',
+        'outtmpl': output_path,
+        'merge_output_format': 'mp4',
+        'concurrent_fragment_downloads': 8,
+        'http_chunk_size': 10485760,
+        'retries': 10,
+        'fragment_retries': 10,
+        'progress_hooks': [progress_hook] if progress else [],
+        'quiet': True,
+        'no_warnings': True,
+        'sleep_interval': 2,
+        'max_sleep_interval': 5
+    }
+
+    info = None
+    last_error = None
+
+    for profile in CLIENT_PROFILES:
+        try:
+            ydl_opts = {**base_opts, 'http_headers': profile['http_headers'], 'extractor_args': profile['extractor_args']}
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=True)
+            break
+        except yt_dlp.utils.DownloadError as profile_error:
+            last_error = profile_error
+            error_message = str(profile_error).lower()
+            if 'sign in to confirm you' not in error_message and 'please sign in' not in error_message:
+                break
+
+    if info is None and last_error:
+        raise last_error
+
+    title = info.get('title', 'download')
+
+    safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).strip()
+    safe_title = safe_title[:50] if len(safe_title) > 50 else safe_title
+
+    if format_type == 'mp3':
+        filename = f"{safe_title}.mp3"
+        final_path = output_path + '.mp3'
+    else:
+        filename = f"{safe_title}.mp4"
+        final_path = output_path + '.mp4'
+
+    # Try to find the actual downloaded file
+    actual_file_found = False
+    for ext in DOWNLOAD_EXTENSIONS:
+        potential_path = f"{output_path}{ext}"
+        if os.path.exists(potential_path):
+            final_path = potential_path
+            actual_file_found = True
+            break
+
+    if not actual_file_found:
+        # Fallback if the exact extension wasn't found but download should be complete
+        if os.path.exists(output_path):
+            final_path = output_path
+        else:
+            raise Exception("Output file not found after download.")
+
+    return final_path, filename
+
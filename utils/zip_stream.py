@@ -0,0 +1,77 @@
+import os
+import time
+import zipfile
+
+CHUNK_SIZE = 256 * 1024
+
+# Outputs that are already compressed; deflating them again only costs CPU
+STORED_EXTENSIONS = {
+    'jpg', 'jpeg', 'jfif', 'png', 'gif', 'webp', 'avif', 'heic', 'heif', 'jp2',
+    'mp4', 'm4v', 'mov', 'mkv', 'webm', 'avi', 'mp3', 'm4a', 'aac', 'ogg', 'opus', 'flac',
+    'pdf', 'zip', 'gz', 'tgz', 'bz2', 'xz', '7z', 'rar',
+    'docx', 'xlsx', 'pptx', 'odt', 'ods', 'odp', 'odg', 'epub', 'woff', 'woff2',
+}
+
+
+def compression_for(name):
+    ext = os.path.splitext(name)[1].lstrip('.').lower()
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+class _Sink:
+    """Write-only, unseekable buffer that ZipFile writes into and we drain."""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE):
+    """Yield a ZIP archive of entries as it is built.
+
+    entries is an iterable of (source, arcname) where source is a file path or
+    bytes; it is consumed lazily, so entries can be produced while the archive
+    streams. Sizes are written in data descriptors, ZIP64 where needed.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as zf:
+        for source, arcname in entries:
+            compress_type = compression_for(arcname)
+            if isinstance(source, bytes):
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+                info.compress_type = compress_type
+                zf.writestr(info, source)
+            else:
+                info = zipfile.ZipInfo.from_file(source, arcname)
+                info.compress_type = compress_type
+                with open(source, 'rb') as src, zf.open(info, 'w') as dest:
+                    for chunk in iter(lambda: src.read(chunk_size), b''):
+                        dest.write(chunk)
+                        if sink.size >= chunk_size:
+                            yield sink.drain()
+            if sink.size:
+                yield sink.drain()
+    # Central directory
+    yield sink.drain()
+
+
+def walk_entries(folder):
+    """(path, arcname) for every file under folder, lazily."""
+    for root, dirs, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            yield path, os.path.relpath(path, folder)